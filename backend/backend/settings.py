@@ -24,6 +24,8 @@ from datetime import timedelta
 from pathlib import Path
 import os
 AUTH_USER_MODEL = 'users.User'
+# Username or email login with one user query and one password hash per attempt
+AUTHENTICATION_BACKENDS = ['users.backends.UsernameOrEmailBackend']
 from dotenv import load_dotenv
 import dj_database_url
 load_dotenv()
@@ -60,17 +62,103 @@ INSTALLED_APPS = [
     'orders',
     'wishlist',
     'payments',
+    'reports',
+    'jobs',
+    'mailer',
     'corsheaders',
 ]
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'users.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'order_tracking': os.getenv('ORDER_TRACKING_RATE', '60/min'),
+        # Failed logins only (users.throttling)
+        'login_ip': os.getenv('LOGIN_IP_RATE', '30/hour'),
+        'login_account': os.getenv('LOGIN_ACCOUNT_RATE', '10/hour'),
+    },
+    # Reverse proxies in front of the app. Throttles take the client IP from
+    # X-Forwarded-For only this many hops deep; 0 means REMOTE_ADDR, so clients
+    # cannot dodge per-IP limits by sending their own header.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
 }
+# Cache for order tracking projections and throttles.
+# Set REDIS_URL in production (needs the redis package) so all workers share it;
+# otherwise each process keeps its own in-memory cache.
+# The 'tokens' alias holds JWT revocations and authenticated users
+# (users.revocation, users.authentication). It must be shared by every worker,
+# so without Redis it is a database table: run `manage.py createcachetable`.
+# That fallback is correct but still costs one SELECT per authenticated request
+# (on the cache table instead of the users table), so the user cache only saves
+# database load with Redis: set REDIS_URL in production.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+        'tokens': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'KEY_PREFIX': 'tokens',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'tokens': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'auth_token_cache',
+        },
+    }
+AUTH_TOKEN_CACHE = 'tokens'
+ORDER_TRACKING_CACHE_TTL = 300
+# Live order updates (orders.live), streamed as server-sent events under ASGI.
+# The in-memory broker only delivers changes made by the process serving the
+# stream: updates saved by another process (a second ASGI/WSGI worker, run_worker,
+# management commands) are never pushed. Serve all traffic from one ASGI process,
+# or point this at a shared broker class (e.g. Redis pub/sub) otherwise.
+LIVE_UPDATES_BROKER = os.getenv('LIVE_UPDATES_BROKER', 'orders.live.InMemoryBroker')
+LIVE_UPDATES_HEARTBEAT = 15  # seconds between keep-alive comments
+LIVE_UPDATES_QUEUE_SIZE = 20  # undelivered events kept per stream
+LIVE_UPDATES_TICKET_TTL = 30  # seconds a single-use /api/orders/events/ ticket stays valid
+# How long CachedJWTAuthentication keeps a request's user before re-reading the row
+AUTH_USER_CACHE_TTL = 60
+# Clients renew access tokens at /api/auth/token/refresh/ (rotating the refresh
+# token) and revoke both at /api/auth/logout/ (users.revocation)
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
-    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv('JWT_ACCESS_MINUTES', str(24 * 60)))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.getenv('JWT_REFRESH_DAYS', '7'))),
 }
+# How long a stored Idempotency-Key response is replayed before the key can be reused
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# Background jobs (jobs app, consumed by `manage.py run_worker`).
+# JOBS_RUN_EAGERLY runs each job in-process right after its transaction commits,
+# for tests and development without a worker running.
+JOBS_RUN_EAGERLY = os.getenv('JOBS_RUN_EAGERLY', 'False').lower() in ('1', 'true', 'yes')
+JOBS_RETRY_BASE = timedelta(seconds=10)
+JOBS_RETRY_MAX = timedelta(hours=1)
+JOBS_STALE_AFTER = timedelta(minutes=15)
+# How often the worker drains the order outbox (orders.tasks.drain_outbox)
+OUTBOX_DRAIN_INTERVAL = timedelta(seconds=2)
+
+# Outgoing email (see EMAIL_SETUP.md). Mail is queued by mailer.sending.queue_email()
+# and sent by the worker; set EMAIL_BACKEND to the file backend, or point EMAIL_HOST
+# at a local SMTP sink, to test without a real mail server.
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True').lower() in ('1', 'true', 'yes')
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', 'itsmenzwardrobe@gmail.com')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_TIMEOUT = 30
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', str(BASE_DIR / 'sent_emails'))
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
+MAILER_BATCH_SIZE = 50
+MAILER_RATE_PER_MINUTE = int(os.getenv('MAILER_RATE_PER_MINUTE', '60'))
+MAILER_MAX_ATTEMPTS = 5
 CORS_ALLOW_ALL_ORIGINS = True  
 CORS_ALLOW_CREDENTIALS = True
 
@@ -166,6 +254,16 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Payment screenshots: uploads over the cap are refused while streaming; accepted
+# ones are recompressed by the job worker (payments.screenshots)
+PAYMENT_SCREENSHOT_MAX_BYTES = 10 * 1024 * 1024
+PAYMENT_SCREENSHOT_MAX_DIMENSION = 1600
+PAYMENT_SCREENSHOT_THUMBNAIL = 240
+# Max differing bits (of 64) for two screenshot hashes to count as the same image; capped at 3 (payments.phash)
+PAYMENT_SCREENSHOT_DUPLICATE_DISTANCE = 3
+# How long a reviewer's claim on a queued payment lasts (payments.queue)
+PAYMENT_CLAIM_TTL = timedelta(minutes=15)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -27,6 +27,7 @@ urlpatterns = [
     path('api/wishlist/', include('wishlist.urls')),
     path('api/orders/', include('orders.urls')),
     path("api/payments/", include("payments.urls")),
+    path('api/reports/', include('reports.urls')),
 
 ]
 
@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from .models import Job
+from .queue import retry_dead
+
+
+def retry_selected_jobs(modeladmin, request, queryset):
+    """Admin action: re-queue dead-lettered jobs with a fresh attempt budget"""
+    count = retry_dead(list(queryset.values_list('pk', flat=True)))
+    modeladmin.message_user(request, f"{count} dead job(s) re-queued.")
+
+retry_selected_jobs.short_description = "Retry selected dead jobs"
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'queue', 'status', 'attempts', 'max_attempts', 'run_after', 'finished_at')
+    list_filter = ('status', 'queue', 'task')
+    search_fields = ('task', 'last_error')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'locked_by', 'last_error')
+    show_full_result_count = False
+    actions = [retry_selected_jobs]
@@ -0,0 +1,73 @@
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import claim_jobs, requeue_stale, run_job, schedule_periodic
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue (no external broker needed).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Worker threads, each with its own DB connection')
+        parser.add_argument('--queue', action='append', dest='queues', help='Queue to consume (repeatable; default "default")')
+        parser.add_argument('--batch-size', type=int, default=5, help='Jobs claimed per poll by each thread')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit when no runnable jobs are left')
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or ['default']
+        concurrency = max(1, options['concurrency'])
+        stop = threading.Event()
+        counts = {'done': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def shutdown(signum, frame):
+            self.stdout.write('Stopping after the current jobs...')
+            stop.set()
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, shutdown)
+            signal.signal(signal.SIGINT, shutdown)
+
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f'Re-queued {requeued} job(s) left running by a stopped worker.')
+        schedule_periodic()
+
+        def work(index):
+            name = f'{socket.gethostname()}:{os.getpid()}:{index}'
+            try:
+                while not stop.is_set():
+                    if concurrency > 1:
+                        close_old_connections()
+                    jobs = claim_jobs(options['batch_size'], worker=name, queues=queues)
+                    if not jobs:
+                        if options['once']:
+                            return
+                        stop.wait(options['interval'])
+                        continue
+                    for job in jobs:
+                        ok = run_job(job)
+                        with lock:
+                            counts['done' if ok else 'failed'] += 1
+            finally:
+                if concurrency > 1:
+                    close_old_connections()
+
+        if concurrency == 1:
+            work(0)
+        else:
+            threads = [threading.Thread(target=work, args=(i,), name=f'job-worker-{i}') for i in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Worker finished: {counts['done']} job(s) done, {counts['failed']} failed."
+        ))
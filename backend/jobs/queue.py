@@ -0,0 +1,183 @@
+import logging
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+_periodic = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(name, max_attempts=5, queue='default', atomic=True, every=None):
+    """
+    Decorator registering a function as a background task under `name`.
+    Adds `.enqueue(**kwargs)` to the function; kwargs must be JSON-serializable.
+    Put tasks in an app's tasks.py so the worker finds them at startup.
+
+    Tasks run inside one transaction unless `atomic=False`, for tasks that
+    commit their own progress (e.g. claim rows, then mark each one done).
+
+    With `every` (a timedelta) the task is periodic: run_worker makes sure one
+    job for it is waiting, and each run enqueues the next one `every` later.
+    """
+    def decorator(func):
+        _tasks[name] = func
+
+        def enqueue_task(delay=None, **kwargs):
+            return enqueue(name, kwargs, delay=delay, max_attempts=max_attempts, queue=queue)
+
+        func.task_name = name
+        func.atomic = atomic
+        func.every = every
+        func.enqueue = enqueue_task
+        if every is not None:
+            _periodic[name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise UnknownTask(f'No task registered as {name!r}.')
+
+
+def enqueue(name, kwargs=None, delay=None, max_attempts=5, queue='default'):
+    """
+    Insert a job for task `name`. The row is written in the caller's transaction,
+    so it only becomes visible to workers when that transaction commits and is
+    discarded if it rolls back.
+
+    With settings.JOBS_RUN_EAGERLY the job is also run in-process from an
+    on_commit hook, which is how tests and worker-less dev setups use it.
+    """
+    get_task(name)
+    job = Job.objects.create(
+        task=name,
+        kwargs=kwargs or {},
+        queue=queue,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + (delay or timedelta()),
+    )
+    if getattr(settings, 'JOBS_RUN_EAGERLY', False):
+        transaction.on_commit(lambda: run_eagerly(job.pk))
+    return job
+
+
+def run_eagerly(job_id):
+    claimed = claim_jobs(1, worker='eager', job_ids=[job_id])
+    if claimed:
+        run_job(claimed[0])
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`: exponential from JOBS_RETRY_BASE, capped at JOBS_RETRY_MAX."""
+    base = getattr(settings, 'JOBS_RETRY_BASE', timedelta(seconds=10))
+    cap = getattr(settings, 'JOBS_RETRY_MAX', timedelta(hours=1))
+    return min(base * (2 ** max(attempts - 1, 0)), cap)
+
+
+def claim_jobs(limit, worker='', queues=('default',), job_ids=None):
+    """
+    Mark up to `limit` runnable jobs as running and return them.
+
+    SKIP LOCKED lets any number of workers poll the same table: rows another
+    worker is claiming are skipped instead of waited on, and the claim commits
+    immediately so the lock is held for milliseconds, not for the job's runtime.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = Job.objects.select_for_update(skip_locked=True).filter(status='queued', run_after__lte=now)
+        if job_ids is not None:
+            jobs = jobs.filter(pk__in=job_ids)
+        else:
+            jobs = jobs.filter(queue__in=queues)
+        jobs = list(jobs.order_by('run_after', 'id')[:limit])
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status='running', locked_by=worker, started_at=now, attempts=F('attempts') + 1
+            )
+            for job in jobs:
+                job.status, job.locked_by, job.started_at = 'running', worker, now
+                job.attempts += 1
+    return jobs
+
+
+def run_job(job):
+    """
+    Run a claimed job in its own transaction (unless its task opted out with
+    atomic=False). On failure it is re-queued after backoff(), or marked dead
+    once it has used max_attempts. Returns True on success.
+    """
+    func = None
+    try:
+        func = get_task(job.task)
+        with transaction.atomic() if getattr(func, 'atomic', True) else nullcontext():
+            func(**job.kwargs)
+    except Exception as e:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.task, job.attempts)
+        job.last_error = f'{type(e).__name__}: {e}'
+        if job.attempts >= job.max_attempts:
+            job.status = 'dead'
+            job.finished_at = timezone.now()
+        else:
+            job.status = 'queued'
+            job.run_after = timezone.now() + backoff(job.attempts)
+        job.locked_by = ''
+        job.save(update_fields=['status', 'last_error', 'finished_at', 'run_after', 'locked_by'])
+        if job.status == 'dead':
+            _schedule_next_run(func)
+        return False
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.last_error = ''
+    job.save(update_fields=['status', 'finished_at', 'last_error'])
+    _schedule_next_run(func)
+    return True
+
+
+def _schedule_next_run(func):
+    """Keep a periodic task's chain going; one waiting job is enough."""
+    if getattr(func, 'every', None) is None:
+        return
+    if not Job.objects.filter(task=func.task_name, status='queued').exists():
+        func.enqueue(delay=func.every)
+
+
+def schedule_periodic():
+    """
+    Enqueue a run of every periodic task that has no job queued or running, e.g.
+    on a fresh database or after its chain died. Called by run_worker at startup.
+    """
+    scheduled = []
+    for name, func in _periodic.items():
+        if not Job.objects.filter(task=name, status__in=('queued', 'running')).exists():
+            scheduled.append(func.enqueue())
+    return scheduled
+
+
+def requeue_stale(timeout=None):
+    """Put back jobs left 'running' by a worker that died; they count the attempt already made."""
+    timeout = timeout or getattr(settings, 'JOBS_STALE_AFTER', timedelta(minutes=15))
+    return Job.objects.filter(status='running', started_at__lt=timezone.now() - timeout).update(
+        status='queued', locked_by='', last_error='Worker stopped while running the job.'
+    )
+
+
+def retry_dead(job_ids):
+    """Send dead-lettered jobs back to the queue with a fresh attempt budget."""
+    return Job.objects.filter(pk__in=job_ids, status='dead').update(
+        status='queued', attempts=0, run_after=timezone.now(), finished_at=None
+    )
@@ -0,0 +1,76 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim_jobs, enqueue, requeue_stale, retry_dead, run_job, task
+
+calls = []
+
+
+@task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_runs_queued_jobs(self):
+        record.enqueue(value=1)
+        record.enqueue(value=2)
+        record.enqueue(value=3, delay=timedelta(hours=1))
+
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+
+        self.assertEqual(calls, [1, 2])
+        jobs = Job.objects.filter(task='tests.record')
+        self.assertEqual(jobs.filter(status='done').count(), 2)
+        self.assertEqual(jobs.get(status='queued').kwargs, {'value': 3})
+
+    def test_failures_back_off_then_dead_letter(self):
+        job = explode.enqueue()
+        self.assertFalse(run_job(claim_jobs(1)[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        # Not runnable until the backoff passes
+        self.assertEqual(claim_jobs(1), [])
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertFalse(run_job(claim_jobs(1)[0]))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'dead')
+
+        retry_dead([job.pk])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 0))
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        record.enqueue(value=1)
+        self.assertEqual(len(claim_jobs(5, worker='a')), 1)
+        self.assertEqual(claim_jobs(5, worker='b'), [])
+
+    def test_stale_running_jobs_are_requeued(self):
+        record.enqueue(value=1)
+        claim_jobs(1)
+        Job.objects.update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Job.objects.get().status, 'queued')
+
+    def test_enqueue_is_part_of_the_callers_transaction(self):
+        with override_settings(JOBS_RUN_EAGERLY=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue('tests.record', {'value': 'eager'})
+        self.assertEqual(calls, ['eager'])
+        self.assertEqual(Job.objects.get().status, 'done')
@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import OutgoingEmail
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'to', 'template', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'template')
+    search_fields = ('to',)
+    readonly_fields = ('created_at', 'claimed_at', 'sent_at', 'last_error')
+    show_full_result_count = False
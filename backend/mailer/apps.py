@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MailerConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'mailer'
+
+    def ready(self):
+        # Register outbox handlers that queue customer emails
+        from . import handlers  # noqa: F401
@@ -0,0 +1,22 @@
+from .sending import queue_email
+from orders.models import Order
+from orders.outbox import register
+
+
+@register('order.placed')
+def queue_order_confirmation(message):
+    order = (
+        Order.objects.select_related('user')
+        .filter(pk=message.payload['order_id'])
+        .only('id', 'total_amount', 'items_summary', 'loyalty_points_earned', 'user__email', 'user__username')
+        .first()
+    )
+    if order is None:
+        return
+    queue_email('order_confirmation', order.user.email, {
+        'order_id': order.id,
+        'username': order.user.username,
+        'total': str(order.total_amount),
+        'items_summary': order.items_summary,
+        'loyalty_points': order.loyalty_points_earned,
+    })
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SendSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_send_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
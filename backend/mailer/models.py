@@ -0,0 +1,46 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutgoingEmail(models.Model):
+    """
+    An email waiting to be sent by mailer.sending.send_batch(). Only the template
+    name and its context are stored; rendering happens in the worker.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    to = models.EmailField()
+    template = models.CharField(max_length=100)
+    context = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    send_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['send_after', 'id'], name='email_sendable_idx', condition=models.Q(status='queued')),
+        ]
+
+    def __str__(self):
+        return f"{self.template} to {self.to} ({self.status})"
+
+
+class SendSlot(models.Model):
+    """
+    Single row shared by every worker: the earliest time the next email may be
+    sent. Reserving a slot moves it on by one send interval, so
+    MAILER_RATE_PER_MINUTE holds across all workers, not per worker.
+    """
+    next_send_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Next email slot at {self.next_send_at}"
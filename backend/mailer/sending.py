@@ -0,0 +1,159 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template import TemplateDoesNotExist
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import OutgoingEmail, SendSlot
+from jobs.models import Job
+from jobs.queue import backoff, enqueue
+
+logger = logging.getLogger(__name__)
+
+SEND_BATCH_TASK = 'mailer.send_batch'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def queue_email(template, to, context=None):
+    """Queue one templated email. See queue_emails()."""
+    return queue_emails(template, [(to, context or {})])[0]
+
+
+def queue_emails(template, messages):
+    """
+    Queue `messages`, a list of (to, context), for `template` with one INSERT and
+    make sure a send job will pick them up. Nothing is rendered or sent here, so
+    this is cheap enough to call inside a request's transaction.
+    """
+    emails = OutgoingEmail.objects.bulk_create([
+        OutgoingEmail(to=to, template=template, context=context)
+        for to, context in messages
+        if to
+    ])
+    if emails:
+        schedule_send_batch()
+    return emails
+
+
+def schedule_send_batch(delay=None):
+    """
+    Enqueue a send job unless one will already run within `delay`; one job
+    drains many emails. A job held back by retry backoff does not count, so
+    new mail is not left waiting behind it.
+    """
+    due = timezone.now() + (delay or timedelta())
+    if not Job.objects.filter(task=SEND_BATCH_TASK, status='queued', run_after__lte=due).exists():
+        enqueue(SEND_BATCH_TASK, delay=delay)
+
+
+def reserve_send_slot(interval):
+    """
+    Claim the next free send slot from the shared SendSlot row and return how
+    many seconds to wait for it. The row is locked for one short UPDATE.
+    """
+    with transaction.atomic():
+        slot, _ = SendSlot.objects.select_for_update().get_or_create(pk=1)
+        now = timezone.now()
+        start = max(now, slot.next_send_at)
+        slot.next_send_at = start + timedelta(seconds=interval)
+        slot.save(update_fields=['next_send_at'])
+    return (start - now).total_seconds()
+
+
+def render_email(email):
+    """Build the message for `email` from mailer/<template>/subject.txt, body.txt and optional body.html."""
+    context = dict(email.context, site_name=_setting('MAILER_SITE_NAME', 'Menz'))
+    prefix = f'mailer/{email.template}'
+    subject = ' '.join(render_to_string(f'{prefix}/subject.txt', context).split())
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=render_to_string(f'{prefix}/body.txt', context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email.to],
+    )
+    try:
+        message.attach_alternative(render_to_string(f'{prefix}/body.html', context), 'text/html')
+    except TemplateDoesNotExist:
+        pass
+    return message
+
+
+def claim_emails(limit):
+    """Mark up to `limit` due emails as sending; SKIP LOCKED lets several workers share the queue."""
+    now = timezone.now()
+    with transaction.atomic():
+        # Emails left 'sending' by a worker that died go back in the queue
+        OutgoingEmail.objects.filter(
+            status='sending', claimed_at__lt=now - _setting('MAILER_STALE_AFTER', timedelta(minutes=15))
+        ).update(status='queued')
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', send_after__lte=now)
+            .order_by('send_after', 'id')[:limit]
+        )
+        if emails:
+            OutgoingEmail.objects.filter(pk__in=[email.pk for email in emails]).update(status='sending', claimed_at=now)
+    return emails
+
+
+def send_batch(limit=None, sleep=time.sleep):
+    """
+    Send up to `limit` (MAILER_BATCH_SIZE) queued emails over one SMTP connection,
+    at most MAILER_RATE_PER_MINUTE of them per minute across all workers (see
+    SendSlot). A failed email is retried with backoff until MAILER_MAX_ATTEMPTS,
+    then left as 'failed'.
+    Returns (sent, failed).
+    """
+    emails = claim_emails(limit or _setting('MAILER_BATCH_SIZE', 50))
+    if not emails:
+        return 0, 0
+
+    interval = 60.0 / max(1, _setting('MAILER_RATE_PER_MINUTE', 60))
+    max_attempts = _setting('MAILER_MAX_ATTEMPTS', 5)
+    sent = failed = 0
+    # Opened once and reused: send_messages() only opens (and closes) a connection per call if none is open
+    connection = get_connection()
+    connection.open()
+    try:
+        for email in emails:
+            wait = reserve_send_slot(interval)
+            if wait > 0:
+                sleep(wait)
+
+            email.attempts += 1
+            try:
+                message = render_email(email)
+                message.connection = connection
+                message.send()
+            except Exception as e:
+                logger.exception('Email %s (%s) failed on attempt %s', email.pk, email.template, email.attempts)
+                failed += 1
+                email.last_error = f'{type(e).__name__}: {e}'
+                if email.attempts >= max_attempts:
+                    email.status = 'failed'
+                else:
+                    email.status = 'queued'
+                    email.send_after = timezone.now() + backoff(email.attempts)
+                email.save(update_fields=['status', 'attempts', 'last_error', 'send_after'])
+                # The connection may be broken; start a fresh one for the rest of the batch
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    logger.exception('Could not reopen the email connection')
+                continue
+            sent += 1
+            email.status = 'sent'
+            email.sent_at = timezone.now()
+            email.save(update_fields=['status', 'attempts', 'sent_at'])
+    finally:
+        connection.close()
+    return sent, failed
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.db.models import Min
+from django.utils import timezone
+
+from jobs.queue import task
+
+from .models import OutgoingEmail
+from .sending import SEND_BATCH_TASK, schedule_send_batch, send_batch
+
+
+@task(SEND_BATCH_TASK, atomic=False)
+def send_queued_email():
+    # Not atomic: the claim and each email's status must commit as they happen,
+    # so a worker dying mid-batch leaves sent mail 'sent' and the rest 'sending'
+    # for claim_emails() to recover after MAILER_STALE_AFTER
+    send_batch()
+    # Keep draining in follow-up jobs rather than one long-running job; emails
+    # waiting out a retry backoff get a job scheduled for when they are due
+    next_due = OutgoingEmail.objects.filter(status='queued').aggregate(due=Min('send_after'))['due']
+    if next_due is not None:
+        schedule_send_batch(delay=max(next_due - timezone.now(), timedelta(0)))
@@ -0,0 +1,131 @@
+import smtplib
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import OutgoingEmail
+from .sending import SEND_BATCH_TASK, queue_email, schedule_send_batch, send_batch
+from jobs.models import Job
+from jobs.queue import claim_jobs, run_job
+from orders.outbox import process_batch
+from orders.services import place_order_items
+from payments.models import Payment
+from payments.services import review_payment
+from product.models import ClothingProduct
+from users.models import User
+
+
+class FlakyBackend(LocmemBackend):
+    """Fails every message sent to fail@example.com."""
+
+    def send_messages(self, messages):
+        if any('fail@example.com' in message.to for message in messages):
+            raise smtplib.SMTPRecipientsRefused({'fail@example.com': (550, b'no')})
+        return super().send_messages(messages)
+
+
+class CountingBackend(LocmemBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class DyingBackend(LocmemBackend):
+    """Simulates the worker being killed while sending to die@example.com."""
+
+    def send_messages(self, messages):
+        if any('die@example.com' in message.to for message in messages):
+            raise SystemExit('worker killed')
+        return super().send_messages(messages)
+
+
+class MailQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        product = ClothingProduct.objects.create(name='Shirt', description='-', price='250.00', stock=10, category='shirt')
+        self.order = place_order_items(self.user, [(product.id, 1)])
+
+    def test_order_confirmation_is_queued_not_sent(self):
+        process_batch()
+        email = OutgoingEmail.objects.get(template='order_confirmation')
+        self.assertEqual((email.to, email.status), ('buyer@example.com', 'queued'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(Job.objects.filter(task='mailer.send_batch', status='queued').exists())
+
+        self.assertEqual(send_batch(), (1, 0))
+        self.assertEqual(mail.outbox[0].subject, f'Menz: order #{self.order.id} received')
+        self.assertIn('Shirt x 1', mail.outbox[0].body)
+
+    def test_payment_review_queues_status_email(self):
+        payment = Payment.objects.create(order=self.order, user=self.user, screenshot='payments/proof.png')
+        review_payment(payment, 'rejected')
+        send_batch()
+        self.assertIn('could not be verified', mail.outbox[0].body)
+
+    @override_settings(EMAIL_BACKEND='mailer.tests.CountingBackend', MAILER_RATE_PER_MINUTE=600)
+    def test_batch_uses_one_connection_and_is_rate_limited(self):
+        for i in range(3):
+            queue_email('payment_status', f'user{i}@example.com', {'order_id': i, 'decision': 'approved'})
+        CountingBackend.opened = 0
+        waits = []
+        self.assertEqual(send_batch(sleep=waits.append), (3, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+        # The fake sleep returns at once, so each slot is one interval further out
+        self.assertEqual(len(waits), 2)
+        for i, wait in enumerate(waits, start=1):
+            self.assertAlmostEqual(wait, 0.1 * i, delta=0.05)
+
+    @override_settings(EMAIL_BACKEND='mailer.tests.CountingBackend', MAILER_RATE_PER_MINUTE=600)
+    def test_rate_is_shared_between_workers(self):
+        queue_email('payment_status', 'a@example.com', {'order_id': 1, 'decision': 'approved'})
+        self.assertEqual(send_batch(sleep=lambda s: None), (1, 0))
+        # A second worker's batch waits for the slot after the first worker's send
+        queue_email('payment_status', 'b@example.com', {'order_id': 2, 'decision': 'approved'})
+        waits = []
+        self.assertEqual(send_batch(sleep=waits.append), (1, 0))
+        self.assertEqual(len(waits), 1)
+        self.assertAlmostEqual(waits[0], 0.1, delta=0.05)
+
+    def test_delayed_send_job_does_not_hold_back_new_mail(self):
+        Job.objects.filter(task=SEND_BATCH_TASK).delete()
+        schedule_send_batch(delay=timedelta(minutes=5))
+        schedule_send_batch()
+        self.assertEqual(Job.objects.filter(task=SEND_BATCH_TASK, status='queued').count(), 2)
+        # A job that will run now already covers new mail
+        schedule_send_batch()
+        self.assertEqual(Job.objects.filter(task=SEND_BATCH_TASK, status='queued').count(), 2)
+
+    @override_settings(EMAIL_BACKEND='mailer.tests.FlakyBackend', MAILER_MAX_ATTEMPTS=2)
+    def test_failures_retry_then_give_up(self):
+        bad = queue_email('payment_status', 'fail@example.com', {'order_id': 1, 'decision': 'approved'})
+        queue_email('payment_status', 'ok@example.com', {'order_id': 2, 'decision': 'approved'})
+        self.assertEqual(send_batch(sleep=lambda s: None), (1, 1))
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), ('queued', 1))
+        self.assertIn('SMTPRecipientsRefused', bad.last_error)
+
+        OutgoingEmail.objects.filter(pk=bad.pk).update(send_after=timezone.now())
+        self.assertEqual(send_batch(sleep=lambda s: None), (0, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, 'failed')
+
+
+@override_settings(EMAIL_BACKEND='mailer.tests.DyingBackend', MAILER_RATE_PER_MINUTE=6000)
+class SendJobTransactionTests(TransactionTestCase):
+    def test_statuses_commit_as_the_batch_goes(self):
+        sent = queue_email('payment_status', 'ok@example.com', {'order_id': 1, 'decision': 'approved'})
+        dying = queue_email('payment_status', 'die@example.com', {'order_id': 2, 'decision': 'approved'})
+        job = claim_jobs(1)[0]
+        self.assertEqual(job.task, 'mailer.send_batch')
+        with self.assertRaises(SystemExit):
+            run_job(job)
+        # Nothing rolled back: the delivered email is not sent again, and the
+        # claimed one is left for the stale-claim recovery
+        sent.refresh_from_db()
+        dying.refresh_from_db()
+        self.assertEqual((sent.status, dying.status), ('sent', 'sending'))
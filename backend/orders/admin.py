@@ -1,6 +1,19 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from django.utils.safestring import mark_safe
-from .models import Order, OrderItem, RefundRequest
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderEvent, OrderItem, RefundRequest
+from .services import ORDER_TRANSITIONS, cancel_orders, process_refund_requests, transition_order
+
+
+def cancel_selected_orders(modeladmin, request, queryset):
+    """Admin action: cancel the selected orders and restore their stock in one transaction"""
+    cancelled_ids, skipped = cancel_orders(list(queryset.values_list('pk', flat=True)), actor=request.user, note='Cancelled in admin')
+    modeladmin.message_user(request, f"{len(cancelled_ids)} order(s) cancelled and stock restored.")
+    if skipped:
+        detail = ", ".join(f"#{pk} ({order_status})" for pk, order_status in sorted(skipped.items()))
+        modeladmin.message_user(request, f"Skipped {len(skipped)} order(s) that cannot be cancelled: {detail}", level=messages.WARNING)
+
+cancel_selected_orders.short_description = "Cancel selected orders and restore stock"
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -10,19 +23,51 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
 
     def get_subtotal(self, obj):
+        # The inline's blank "add another" row has no price yet
+        if obj.price_at_purchase is None:
+            return "-"
         return f"Rs {obj.calculate_subtotal():.2f}"
     get_subtotal.short_description = "Subtotal"
 
+class OrderEventInline(admin.TabularInline):
+    model = OrderEvent
+    fields = ('created_at', 'from_status', 'to_status', 'track_order_status', 'actor', 'note')
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class OrderAdminForm(forms.ModelForm):
+    class Meta:
+        model = Order
+        fields = '__all__'
+
+    def clean_status(self):
+        new_status = self.cleaned_data['status']
+        old_status = self.initial.get('status')
+        if self.instance.pk and new_status != old_status and new_status not in ORDER_TRANSITIONS.get(old_status, ()):
+            raise forms.ValidationError(f'Cannot change order from {old_status} to {new_status}.')
+        return new_status
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'get_user_email', 'order_date', 'status', 'track_order_status', 'total_amount', 'get_item_count')
+    form = OrderAdminForm
+    list_display = ('id', 'get_user_email', 'order_date', 'status', 'track_order_status', 'get_payment_status', 'total_amount', 'get_item_count')
     list_filter = ('status', 'track_order_status', 'order_date')
     search_fields = ('user__email', 'user__username')
-    inlines = [OrderItemInline]
-    readonly_fields = ('order_date', 'total_amount', 'get_order_items_summary', 'track_order_status')
+    # One query for the page: user and payment come in through joins, the item count is stored on the order
+    list_select_related = ('user', 'payment_record')
+    show_full_result_count = False
+    inlines = [OrderItemInline, OrderEventInline]
+    actions = [cancel_selected_orders]
+    readonly_fields = ('order_date', 'total_amount', 'item_count', 'items_summary', 'get_order_items_summary', 'track_order_status')
     fieldsets = (
         ('Order Information', {
-            'fields': ('user', 'order_date', 'status', 'track_order_status', 'total_amount', 'loyalty_points_earned')
+            'fields': ('user', 'order_date', 'status', 'track_order_status', 'total_amount', 'loyalty_points_earned', 'item_count')
         }),
         ('Shipping Details', {
             'fields': ('shipping_address',)
@@ -38,8 +83,31 @@ class OrderAdmin(admin.ModelAdmin):
     get_user_email.short_description = "User Email"
 
     def get_item_count(self, obj):
-        return obj.items.count()
+        return obj.item_count
     get_item_count.short_description = "Items"
+    get_item_count.admin_order_field = 'item_count'
+
+    def get_payment_status(self, obj):
+        payment = getattr(obj, 'payment_record', None)
+        return payment.status if payment else 'waiting'
+    get_payment_status.short_description = "Payment"
+    get_payment_status.admin_order_field = 'payment_record__status'
+
+    def save_model(self, request, obj, form, change):
+        # Status changes go through the state machine so they are logged like any other
+        if change and 'status' in form.changed_data:
+            new_status = obj.status
+            obj.status = form.initial['status']
+            super().save_model(request, obj, form, change)
+            transition_order(obj, new_status, actor=request.user, note='Changed in admin')
+        else:
+            super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Items may have been deleted through the inline; keep the stored summary and total in step
+        form.instance.refresh_item_summary()
+        form.instance.calculate_total()
 
     def get_order_items_summary(self, obj):
         items = obj.items.all()
@@ -52,7 +120,8 @@ class OrderAdmin(admin.ModelAdmin):
         for item in items:
             html += f'<tr style="border: 1px solid #ddd;"><td style="padding: 8px; border: 1px solid #ddd;">{item.product_name}</td><td style="padding: 8px; border: 1px solid #ddd;">Rs {item.price_at_purchase}</td><td style="padding: 8px; border: 1px solid #ddd;">{item.quantity}</td><td style="padding: 8px; border: 1px solid #ddd;">Rs {item.calculate_subtotal():.2f}</td></tr>'
         
-        html += f'<tr style="background-color: #f0f0f0; border: 1px solid #ddd; font-weight: bold;"><td colspan="3" style="padding: 8px; border: 1px solid #ddd;">Total:</td><td style="padding: 8px; border: 1px solid #ddd;">Rs {obj.calculate_total():.2f}</td></tr>'
+        # Read-only: show the stored total rather than recalculating (and saving) it on every view
+        html += f'<tr style="background-color: #f0f0f0; border: 1px solid #ddd; font-weight: bold;"><td colspan="3" style="padding: 8px; border: 1px solid #ddd;">Total:</td><td style="padding: 8px; border: 1px solid #ddd;">Rs {obj.total_amount:.2f}</td></tr>'
         html += '</table>'
         return mark_safe(html)
     get_order_items_summary.short_description = "Order Items"
@@ -62,13 +131,69 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('id', 'order', 'product_name', 'price_at_purchase', 'quantity', 'get_subtotal')
     list_filter = ('order__order_date', 'order__status')
     search_fields = ('product_name', 'order__id', 'order__user__email')
+    list_select_related = ('order__user',)
     readonly_fields = ('product_name', 'price_at_purchase', 'quantity', 'content_type', 'object_id')
 
     def get_subtotal(self, obj):
         return f"Rs {obj.calculate_subtotal():.2f}"
     get_subtotal.short_description = "Subtotal"
 
+def _process_selected_refunds(modeladmin, request, queryset, decision):
+    results = process_refund_requests(list(queryset.values_list('pk', flat=True)), decision, actor=request.user)
+    done = [result for result in results if result['outcome'] != 'skipped']
+    skipped = [result for result in results if result['outcome'] == 'skipped']
+    verb = 'refunded' if decision == 'approve' else 'rejected'
+    modeladmin.message_user(request, f"{len(done)} refund request(s) {verb}.")
+    if skipped:
+        detail = "; ".join(f"#{result['id']}: {result['detail']}" for result in skipped)
+        modeladmin.message_user(request, f"Skipped {len(skipped)} request(s): {detail}", level=messages.WARNING)
+
+def approve_selected_refunds(modeladmin, request, queryset):
+    """Admin action: refund the orders of the selected requests, restoring stock and revoking loyalty points"""
+    _process_selected_refunds(modeladmin, request, queryset, 'approve')
+
+approve_selected_refunds.short_description = "Approve selected refund requests and refund their orders"
+
+def reject_selected_refunds(modeladmin, request, queryset):
+    """Admin action: reject the selected pending refund requests"""
+    _process_selected_refunds(modeladmin, request, queryset, 'reject')
+
+reject_selected_refunds.short_description = "Reject selected refund requests"
+
 @admin.register(RefundRequest)
 class RefundRequestAdmin(admin.ModelAdmin):
-    list_display = ('id', 'order', 'user', 'status', 'created_at')
+    list_display = ('id', 'order', 'user', 'get_order_status', 'status', 'created_at')
     list_filter = ('status',)
+    list_select_related = ('order__user', 'user')
+    actions = [approve_selected_refunds, reject_selected_refunds]
+
+    def get_order_status(self, obj):
+        return obj.order.status
+    get_order_status.short_description = "Order Status"
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    fields = ('product_name', 'price_at_purchase', 'quantity')
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Read-only view of orders moved out by `manage.py archive_orders`."""
+    list_display = ('id', 'user', 'order_date', 'status', 'total_amount', 'payment_status', 'archived_at')
+    list_filter = ('status', 'order_date')
+    search_fields = ('id', 'user__email', 'user__username')
+    list_select_related = ('user',)
+    show_full_result_count = False
+    inlines = [ArchivedOrderItemInline]
+
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
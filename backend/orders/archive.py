@@ -0,0 +1,102 @@
+from django.db import connection, transaction
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from payments.phash import CHUNK_FIELDS
+
+# Payment fields copied onto the archived order for the screenshot reuse check
+PAYMENT_HASH_FIELDS = ('screenshot_hash', 'screenshot_dhash', *CHUNK_FIELDS)
+
+# Only orders that can no longer change are archived
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled', 'refunded')
+
+
+def archivable_orders(cutoff):
+    """Finished orders placed before `cutoff` with no refund request still open."""
+    return (
+        Order.objects.filter(order_date__lt=cutoff, status__in=ARCHIVABLE_STATUSES)
+        .exclude(refunds__status__in=('pending', 'approved'))
+    )
+
+
+def _snapshot(order):
+    payment = getattr(order, 'payment_record', None)
+    invoice = getattr(order, 'invoice', None)
+    hashes = {field: getattr(payment, field) for field in PAYMENT_HASH_FIELDS} if payment else {}
+    return ArchivedOrder(
+        id=order.id,
+        user_id=order.user_id,
+        order_date=order.order_date,
+        status=order.status,
+        total_amount=order.total_amount,
+        shipping_address=order.shipping_address,
+        loyalty_points_earned=order.loyalty_points_earned,
+        track_order_status=order.track_order_status,
+        item_count=order.item_count,
+        items_summary=order.items_summary,
+        payment_status=payment.status if payment else 'waiting',
+        payment_screenshot=payment.screenshot.name if payment and payment.screenshot else '',
+        **hashes,
+        invoice_data=invoice.data if invoice else None,
+        history=[
+            {
+                'from_status': event.from_status,
+                'to_status': event.to_status,
+                'track_order_status': event.track_order_status,
+                'actor_id': event.actor_id,
+                'note': event.note,
+                'created_at': event.created_at.isoformat(),
+            }
+            for event in order.events.all()
+        ],
+    )
+
+
+def archive_batch(cutoff, batch_size=500):
+    """
+    Move up to `batch_size` archivable orders into the archive tables in one short
+    transaction. Rows are claimed with SKIP LOCKED so the job never waits on (or
+    blocks) checkouts touching other orders. Returns the number of orders moved.
+    """
+    with transaction.atomic():
+        ids = list(
+            archivable_orders(cutoff).select_for_update(skip_locked=True, of=('self',))
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        orders = list(
+            Order.objects.filter(pk__in=ids)
+            .select_related('payment_record', 'invoice')
+            .prefetch_related('items', 'events')
+        )
+        ArchivedOrder.objects.bulk_create([_snapshot(order) for order in orders])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(
+                order_id=order.id,
+                content_type_id=item.content_type_id,
+                object_id=item.object_id,
+                product_name=item.product_name,
+                product_category=item.product_category,
+                price_at_purchase=item.price_at_purchase,
+                quantity=item.quantity,
+            )
+            for order in orders
+            for item in order.items.all()
+        ])
+        # Cascades to items, events, payment, invoice and closed refund requests
+        Order.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def hot_table_stats():
+    """Row counts of the live order tables, plus on-disk size in bytes on PostgreSQL."""
+    stats = {}
+    for model in (Order, OrderItem):
+        table = model._meta.db_table
+        stats[table] = {'rows': model.objects.count()}
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+                stats[table]['bytes'] = cursor.fetchone()[0]
+    return stats
+
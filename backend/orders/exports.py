@@ -0,0 +1,63 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .pagination import iterate_in_chunks
+
+EXPORT_CHUNK_SIZE = 500
+
+CSV_COLUMNS = [
+    'order_id', 'order_date', 'customer_email', 'status', 'track_order_status', 'payment_status',
+    'total_amount', 'loyalty_points_earned', 'item_count', 'items', 'shipping_address',
+]
+
+
+class _Echo:
+    """File-like object whose write() hands the line back, for csv.writer in a generator."""
+
+    def write(self, value):
+        return value
+
+
+def export_record(order):
+    payment = getattr(order, 'payment_record', None)
+    items = list(order.items.all())
+    return {
+        'order_id': order.id,
+        'order_date': order.order_date,
+        'customer_email': order.user.email,
+        'status': order.status,
+        'track_order_status': order.track_order_status,
+        'payment_status': payment.status if payment else 'waiting',
+        'total_amount': order.total_amount,
+        'loyalty_points_earned': order.loyalty_points_earned,
+        'item_count': len(items),
+        'items': [
+            {'product_name': item.product_name, 'unit_price': item.price_at_purchase, 'quantity': item.quantity}
+            for item in items
+        ],
+        'shipping_address': order.shipping_address,
+    }
+
+
+def export_records(orders):
+    """Walk `orders` in chunks, loading users, payments and items once per chunk."""
+    orders = orders.select_related('user', 'payment_record').prefetch_related('items')
+    for chunk in iterate_in_chunks(orders, EXPORT_CHUNK_SIZE):
+        for order in chunk:
+            yield export_record(order)
+
+
+def stream_ndjson(orders):
+    for record in export_records(orders):
+        yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_csv(orders):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for record in export_records(orders):
+        record['order_date'] = record['order_date'].isoformat()
+        record['items'] = '; '.join(f"{item['product_name']} x {item['quantity']}" for item in record['items'])
+        yield writer.writerow([record[column] for column in CSV_COLUMNS])
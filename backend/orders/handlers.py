@@ -0,0 +1,11 @@
+from .invoices import freeze_invoice
+from .models import Order
+from .outbox import register
+
+
+@register('order.status_changed')
+def freeze_invoice_when_paid(message):
+    if message.payload['to_status'] != 'paid':
+        return
+    order = Order.objects.select_related('user').prefetch_related('items').get(pk=message.payload['order_id'])
+    freeze_invoice(order)
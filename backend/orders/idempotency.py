@@ -0,0 +1,112 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Client errors that a retry with the same request can succeed past (e.g. the
+# 409 "Stock changed" from place_order_items), so they are never replayed
+RETRYABLE_STATUSES = frozenset({
+    status.HTTP_408_REQUEST_TIMEOUT,
+    status.HTTP_409_CONFLICT,
+    status.HTTP_425_TOO_EARLY,
+    status.HTTP_429_TOO_MANY_REQUESTS,
+})
+
+
+def get_idempotency_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+
+
+def request_fingerprint(request):
+    """Hash of method, path and body so a reused key with a different payload can be rejected."""
+    data = request.data
+    if not hasattr(data, 'items'):
+        data = {'': data}
+    body = {}
+    for name, value in data.items():
+        # Uploaded files are fingerprinted by name and size rather than content
+        if hasattr(value, 'read'):
+            value = f'{getattr(value, "name", "")}:{getattr(value, "size", "")}'
+        body[name] = value
+    raw = json.dumps([request.method, request.path, body], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def run_idempotent(request, endpoint, handler):
+    """
+    Run `handler()` at most once per (user, endpoint, Idempotency-Key).
+
+    The key row is locked with SELECT ... FOR UPDATE while the handler runs, so a
+    concurrent duplicate waits for the first request and then gets its response.
+    Only final outcomes (2xx and non-retryable 4xx) are stored and replayed;
+    after a server error or a RETRYABLE_STATUSES response the key is released
+    so the client can retry with it. Requests without the header are passed
+    straight through.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+    if not key:
+        return handler()
+    if len(key) > 255:
+        return Response(
+            {'error': f'{IDEMPOTENCY_HEADER} must be at most 255 characters.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    fingerprint = request_fingerprint(request)
+    now = timezone.now()
+
+    with transaction.atomic():
+        record, created = IdempotencyKey.objects.get_or_create(
+            user=request.user, endpoint=endpoint, key=key,
+            defaults={'fingerprint': fingerprint, 'expires_at': now + get_idempotency_ttl()},
+        )
+        if not created:
+            record = IdempotencyKey.objects.select_for_update().get(pk=record.pk)
+            if record.expires_at <= now:
+                # Expired keys start over as if they were new
+                record.fingerprint = fingerprint
+                record.response_status = None
+                record.response_body = None
+                record.expires_at = now + get_idempotency_ttl()
+                record.save(update_fields=['fingerprint', 'response_status', 'response_body', 'expires_at'])
+
+        if record.fingerprint != fingerprint:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} was already used with a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+
+        if record.response_status is not None:
+            response = Response(record.response_body, status=record.response_status)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        response = handler()
+
+        if response.status_code < 500 and response.status_code not in RETRYABLE_STATUSES:
+            record.response_status = response.status_code
+            record.response_body = json.loads(JSONRenderer().render(response.data) or b'null')
+            record.save(update_fields=['response_status', 'response_body'])
+        else:
+            record.delete()
+        return response
+
+
+def idempotent(endpoint):
+    """Decorator for function views; place it below @api_view/@permission_classes."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return run_idempotent(request, endpoint, lambda: view(request, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,163 @@
+import hashlib
+import json
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Invoice
+from jobs.models import Job
+from jobs.queue import enqueue
+
+RENDER_PDF_TASK = 'orders.render_invoice_pdf'
+
+PDF_LINES_PER_PAGE = 50
+
+
+def build_invoice_data(order):
+    """Invoice contents for `order`, computed from its items without writing anything."""
+    items = list(order.items.all())
+    total = sum((item.price_at_purchase * item.quantity for item in items), Decimal('0'))
+    return {
+        'invoice_id': f'INV-{order.id}',
+        'order_id': order.id,
+        'date': order.order_date.isoformat() if order.order_date else None,
+        'customer': {
+            'id': order.user.id,
+            'email': order.user.email,
+            'username': order.user.username,
+        },
+        'shipping_address': order.shipping_address,
+        'items': [
+            {
+                'product_name': item.product_name,
+                'unit_price': float(item.price_at_purchase),
+                'quantity': item.quantity,
+                'subtotal': float(item.calculate_subtotal())
+            }
+            for item in items
+        ],
+        'total': float(total),
+        'loyalty_points_earned': order.loyalty_points_earned,
+        'order_status': order.status
+    }
+
+
+def content_hash(data):
+    raw = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def freeze_invoice(order, render=True):
+    """
+    Create the immutable invoice snapshot for `order` (once) and queue its PDF
+    unless `render` is False. Safe to call repeatedly: an existing snapshot is
+    returned untouched.
+    """
+    invoice = Invoice.objects.filter(order=order).first()
+    if invoice is not None:
+        return invoice
+
+    data = build_invoice_data(order)
+    invoice = Invoice.objects.create(
+        order=order,
+        invoice_number=data['invoice_id'],
+        data=data,
+        content_hash=content_hash(data),
+    )
+    if render:
+        schedule_pdf_render(invoice.pk)
+    return invoice
+
+
+def schedule_pdf_render(invoice_id):
+    """
+    Queue the PDF render as a background job, unless one for this invoice is
+    already waiting or running; it runs once the surrounding transaction commits.
+    """
+    pending = Job.objects.filter(
+        task=RENDER_PDF_TASK, kwargs__invoice_id=invoice_id, status__in=('queued', 'running')
+    )
+    if not pending.exists():
+        enqueue(RENDER_PDF_TASK, {'invoice_id': invoice_id})
+
+
+def render_invoice_pdf(invoice_id, force=False):
+    """
+    Render the snapshot to PDF and store it as invoices/<sha256>.pdf.
+    Identical snapshots produce identical bytes, so the file is written only once.
+    """
+    invoice = Invoice.objects.get(pk=invoice_id)
+    if invoice.pdf and not force:
+        return invoice
+
+    pdf_bytes = render_pdf(invoice_lines(invoice.data))
+    pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    name = f'invoices/{pdf_hash}.pdf'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(pdf_bytes))
+
+    Invoice.objects.filter(pk=invoice.pk).update(pdf=name, pdf_hash=pdf_hash)
+    invoice.pdf.name = name
+    invoice.pdf_hash = pdf_hash
+    return invoice
+
+
+def invoice_lines(data):
+    lines = [
+        f"Invoice {data['invoice_id']}",
+        f"Order #{data['order_id']}    Date: {data['date'] or '-'}",
+        f"Customer: {data['customer']['username']} <{data['customer']['email']}>",
+        f"Ship to: {data['shipping_address'] or '-'}",
+        '',
+        f"{'Product':<40}{'Price':>12}{'Qty':>6}{'Subtotal':>14}",
+    ]
+    for item in data['items']:
+        lines.append(
+            f"{item['product_name'][:40]:<40}{item['unit_price']:>12.2f}{item['quantity']:>6}{item['subtotal']:>14.2f}"
+        )
+    lines += [
+        '',
+        f"{'Total:':<58}{data['total']:>14.2f}",
+        f"Loyalty points earned: {data['loyalty_points_earned']}",
+    ]
+    return lines
+
+
+def _pdf_escape(text):
+    text = text.encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def render_pdf(lines):
+    """Minimal single-font text PDF (A4, Courier 10pt); no third-party dependency."""
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then a (page, content) pair per page
+    objects = {1: b'<< /Type /Catalog /Pages 2 0 R >>', 3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>'}
+    kids = []
+    for index, page_lines in enumerate(pages):
+        page_obj, content_obj = 4 + index * 2, 5 + index * 2
+        kids.append(f'{page_obj} 0 R')
+        text = ['BT', '/F1 10 Tf', '14 TL', '50 800 Td']
+        text += [f'({_pdf_escape(line)}) Tj T*' for line in page_lines]
+        text.append('ET')
+        stream = '\n'.join(text).encode('latin-1')
+        objects[page_obj] = (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {content_obj} 0 R >>'
+        ).encode()
+        objects[content_obj] = b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream'
+    objects[2] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(pages)} >>'.encode()
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number in range(1, len(objects) + 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + objects[number] + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
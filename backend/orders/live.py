@@ -0,0 +1,188 @@
+"""
+Live order updates: a small publish/subscribe layer feeding the server-sent
+event streams in orders.views.
+
+Publishers (orders.tracking.publish_tracking, run after a status change
+commits) push JSON strings to channels named "order:<id>" and "user:<id>";
+each open stream holds a Subscription on its channel. The broker is chosen by
+LIVE_UPDATES_BROKER (a dotted path). The default InMemoryBroker only reaches
+streams served by the process that made the change, which is enough when one
+ASGI process serves everything; changes saved elsewhere (another worker, the
+job worker, management commands) need a broker backed by something the
+processes share (e.g. Redis pub/sub) implementing the same three methods.
+"""
+import asyncio
+import secrets
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from users.revocation import token_cache
+
+
+def order_channel(order_id):
+    return f'order:{order_id}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """
+    One stream's view of a channel: messages are queued on the subscriber's
+    event loop and read with `await subscription.get()`. A subscriber that
+    falls QUEUE_SIZE messages behind loses the oldest ones; each message is a
+    full snapshot, so only the newest matters.
+    """
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, message):
+        """Called from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            pass  # The subscriber's loop has closed; unsubscribe is on its way
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """The next message, or None after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class BaseBroker:
+    def subscribe(self, channel):
+        """Return a Subscription to `channel`; must be called from the subscriber's event loop."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, channel, message):
+        """Deliver `message` (a string) to every subscriber of `channel`; safe to call from sync code."""
+        raise NotImplementedError
+
+    def has_subscribers(self):
+        """False only if no stream anywhere could be listening, letting publishers skip the work."""
+        return True
+
+
+class InMemoryBroker(BaseBroker):
+    """Process-local broker: a channel -> subscriptions map behind a lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, getattr(settings, 'LIVE_UPDATES_QUEUE_SIZE', 20))
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def has_subscribers(self):
+        return bool(self._channels)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'LIVE_UPDATES_BROKER', 'orders.live.InMemoryBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+@receiver(setting_changed)
+def _reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'LIVE_UPDATES_BROKER':
+        _broker = None
+
+
+async def event_stream(subscription, initial=None):
+    """
+    Server-sent events from `subscription`: `initial` (a JSON string, if
+    given) as the first event, then every published message, with a comment
+    line every LIVE_UPDATES_HEARTBEAT seconds so proxies keep the connection
+    open. Subscribe before loading `initial` so no change falls in between.
+    The subscription ends when the client disconnects and the server cancels
+    the generator.
+    """
+    heartbeat = getattr(settings, 'LIVE_UPDATES_HEARTBEAT', 15)
+    try:
+        yield 'retry: 5000\n\n'
+        if initial is not None:
+            yield f'event: order\ndata: {initial}\n\n'
+        while True:
+            message = await subscription.get(timeout=heartbeat)
+            if message is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f'event: order\ndata: {message}\n\n'
+    finally:
+        subscription.close()
+
+
+def _ticket_key(ticket):
+    return f'orders:stream-ticket:{ticket}'
+
+
+def issue_stream_ticket(user_id):
+    """
+    A random ticket that opens `user_id`'s event stream once, within
+    LIVE_UPDATES_TICKET_TTL seconds. EventSource cannot send headers, and a
+    spent ticket in an access log is worthless, unlike the access token.
+    Kept in AUTH_TOKEN_CACHE so any process can redeem it.
+    """
+    ticket = secrets.token_urlsafe(32)
+    token_cache().set(_ticket_key(ticket), user_id, getattr(settings, 'LIVE_UPDATES_TICKET_TTL', 30))
+    return ticket
+
+
+def redeem_stream_ticket(ticket):
+    """The ticket's user id, or None if it is unknown, expired or already used."""
+    key = _ticket_key(ticket)
+    cache = token_cache()
+    user_id = cache.get(key)
+    # delete() is True only for the caller that removed the entry, so a ticket works once
+    if user_id is None or not cache.delete(key):
+        return None
+    return user_id
@@ -0,0 +1,48 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.archive import archive_batch, hot_table_stats
+
+
+def _format_stats(stats):
+    parts = []
+    for table, values in stats.items():
+        text = f"{table}: {values['rows']} rows"
+        if 'bytes' in values:
+            text += f" ({values['bytes'] / (1024 * 1024):.1f} MB)"
+        parts.append(text)
+    return ', '.join(parts)
+
+
+class Command(BaseCommand):
+    help = 'Move delivered/cancelled/refunded orders older than N days into the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=365, help='Archive orders placed before this many days ago')
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders moved per transaction')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+
+    def handle(self, *args, **options):
+        if options['older_than_days'] < 1:
+            raise CommandError('--older-than-days must be at least 1.')
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        batch_size = max(1, options['batch_size'])
+
+        self.stdout.write(f'Before: {_format_stats(hot_table_stats())}')
+        moved = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            count = archive_batch(cutoff, batch_size=batch_size)
+            if not count:
+                break
+            moved += count
+            batches += 1
+            self.stdout.write(f'Batch {batches}: archived {count} order(s)')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(f'After: {_format_stats(hot_table_stats())}')
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} order(s) placed before {cutoff:%Y-%m-%d}.'))
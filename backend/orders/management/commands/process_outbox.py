@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Consume pending outbox messages (invoices, notifications, analytics) in batches. '
+        'run_worker already does this periodically; use this to drain by hand.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when empty')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when idle with --loop')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            handled = process_batch(options['batch_size'])
+            total += handled
+            if handled:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} outbox message(s).'))
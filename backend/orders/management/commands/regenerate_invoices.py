@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from orders.invoices import freeze_invoice, render_invoice_pdf
+from orders.models import Invoice, Order
+
+
+def _render(invoice_id, force):
+    close_old_connections()
+    try:
+        render_invoice_pdf(invoice_id, force=force)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Freeze missing invoice snapshots and (re)render invoice PDFs for paid orders in a date range.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True, help='First order date, YYYY-MM-DD')
+        parser.add_argument('--to', dest='date_to', required=True, help='Last order date, YYYY-MM-DD (inclusive)')
+        parser.add_argument('--workers', type=int, default=4, help='Parallel PDF renderers')
+        parser.add_argument('--force', action='store_true', help='Re-render PDFs that already exist')
+
+    def handle(self, *args, **options):
+        date_from, date_to = parse_date(options['date_from']), parse_date(options['date_to'])
+        if date_from is None or date_to is None:
+            raise CommandError('--from and --to must be dates in YYYY-MM-DD format.')
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+
+        orders = Order.objects.filter(
+            order_date__gte=start, order_date__lt=end, payment_record__status='approved'
+        )
+        missing = orders.filter(invoice__isnull=True).select_related('user').prefetch_related('items')
+        frozen = 0
+        for order in missing.iterator(chunk_size=200):
+            freeze_invoice(order, render=False)
+            frozen += 1
+
+        invoices = Invoice.objects.filter(order__in=orders)
+        if not options['force']:
+            invoices = invoices.filter(pdf='')
+        invoice_ids = list(invoices.values_list('pk', flat=True))
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {pool.submit(_render, pk, options['force']): pk for pk in invoice_ids}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'Invoice {futures[future]}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Froze {frozen} snapshot(s); rendered {len(invoice_ids) - failed} PDF(s), {failed} failed.'
+        ))
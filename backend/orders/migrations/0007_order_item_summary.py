@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+def backfill_item_summary(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    last_pk = 0
+    while True:
+        chunk = list(Order.objects.filter(pk__gt=last_pk).order_by('pk').prefetch_related('items')[:500])
+        if not chunk:
+            break
+        for order in chunk:
+            items = list(order.items.all())
+            order.item_count = len(items)
+            order.items_summary = ', '.join(f"{item.product_name} x {item.quantity}" for item in items)
+        Order.objects.bulk_update(chunk, ['item_count', 'items_summary'])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='items_summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(backfill_item_summary, migrations.RunPython.noop),
+    ]
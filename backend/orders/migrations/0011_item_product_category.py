@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:04
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_product_category(apps, schema_editor):
+    # Existing items take their product's current category; items whose
+    # product is gone stay blank and are rolled up as 'unknown'
+    ClothingProduct = apps.get_model('product', 'ClothingProduct')
+    category = ClothingProduct.objects.filter(pk=OuterRef('object_id')).values('category')[:1]
+    for model_name in ('OrderItem', 'ArchivedOrderItem'):
+        Item = apps.get_model('orders', model_name)
+        last_pk = 0
+        while True:
+            pks = list(Item.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:500])
+            if not pks:
+                break
+            Item.objects.filter(pk__in=pks).update(product_category=Coalesce(Subquery(category), Value('')))
+            last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_archived_orders'),
+        ('product', '0003_alter_clothingproduct_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='product_category',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_category',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.RunPython(backfill_product_category, migrations.RunPython.noop),
+    ]
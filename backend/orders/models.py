@@ -1,4 +1,7 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import DecimalField, F, Sum
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
@@ -24,10 +27,37 @@ class Order(models.Model):
     loyalty_points_earned = models.IntegerField(default=0)
     # Track order status explicitly. Defaults to '-' meaning no tracking yet.
     track_order_status = models.CharField(max_length=50, default='-')
+    # Denormalized from the items so listings never have to count or join them.
+    # Kept current by refresh_item_summary() whenever items are written.
+    item_count = models.PositiveIntegerField(default=0)
+    items_summary = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's history: WHERE user_id = ? ORDER BY order_date DESC, id DESC
+            models.Index(fields=['user', '-order_date', '-id'], name='order_user_date_idx'),
+            # Admin listing and date-range exports
+            models.Index(fields=['-order_date', '-id'], name='order_date_idx'),
+        ]
+
+    @staticmethod
+    def summarize_items(items):
+        """'Shirt x 2, Pant x 1' for a list of order items (or unsaved OrderItem objects)."""
+        return ', '.join(f"{item.product_name} x {item.quantity}" for item in items)
+
+    def refresh_item_summary(self, save=True):
+        items = list(self.items.all())
+        self.item_count = len(items)
+        self.items_summary = self.summarize_items(items)
+        if save:
+            self.save(update_fields=['item_count', 'items_summary'])
 
     def calculate_total(self):
-        total = sum(item.calculate_subtotal() for item in self.items.all())
-        self.total_amount = total
+        # Decimal price * quantity summed in the database, like place_order_items(); no float rounding
+        total = self.items.aggregate(
+            total=Sum(F('price_at_purchase') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2))
+        )['total']
+        self.total_amount = total if total is not None else Decimal('0')
         self.save(update_fields=['total_amount'])
         return self.total_amount
 
@@ -44,6 +74,8 @@ class OrderItem(models.Model):
     product = GenericForeignKey('content_type', 'object_id')
 
     product_name = models.CharField(max_length=255)
+    # Category at placement, so sales rollups stay put if the product is recategorised or deleted
+    product_category = models.CharField(max_length=50, blank=True)
     price_at_purchase = models.DecimalField(max_digits=12, decimal_places=2)
     quantity = models.PositiveIntegerField()
 
@@ -72,3 +104,137 @@ class RefundRequest(models.Model):
 
     def __str__(self):
         return f"Refund {self.id} for order {self.order.id} - {self.status}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response for a client-supplied Idempotency-Key header.
+    A replay of the same key returns `response_body` instead of re-running the view.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=100)
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'endpoint', 'key')
+
+    def __str__(self):
+        return f"{self.endpoint} [{self.key}] for {self.user}"
+
+
+class Invoice(models.Model):
+    """
+    Invoice frozen when the order's payment is approved. `data` never changes after
+    creation; `content_hash` identifies it (and doubles as the HTTP ETag). The PDF is
+    rendered once in the background and stored under its own content hash.
+    """
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='invoice')
+    invoice_number = models.CharField(max_length=50, unique=True)
+    data = models.JSONField()
+    content_hash = models.CharField(max_length=64)
+    pdf = models.FileField(upload_to='invoices/', blank=True)
+    pdf_hash = models.CharField(max_length=64, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.invoice_number
+
+
+class OrderEvent(models.Model):
+    """Append-only history of order status changes. Written only by orders.services."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    from_status = models.CharField(max_length=20, blank=True)
+    to_status = models.CharField(max_length=20)
+    track_order_status = models.CharField(max_length=50, blank=True)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    note = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [models.Index(fields=['order', 'created_at'], name='orderevent_order_idx')]
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status or '-'} -> {self.to_status}"
+
+
+class OutboxMessage(models.Model):
+    """
+    Side effects recorded in the same transaction as the change that caused them,
+    then consumed in batches by `manage.py process_outbox` (see orders/outbox.py).
+    """
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.id}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    A finished order moved out of the hot Order table by `manage.py archive_orders`.
+    Keeps the original primary key, so order ids stay valid; payment, invoice and
+    event history are kept as snapshots because their rows are removed with the order.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    order_date = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    shipping_address = models.TextField(blank=True, null=True)
+    loyalty_points_earned = models.IntegerField(default=0)
+    track_order_status = models.CharField(max_length=50, default='-')
+    item_count = models.PositiveIntegerField(default=0)
+    items_summary = models.TextField(blank=True, default='')
+    payment_status = models.CharField(max_length=20, default='waiting')
+    payment_screenshot = models.CharField(max_length=255, blank=True, default='')
+    # The payment's screenshot hashes, named as on Payment so payments.phash.find_similar()
+    # keeps matching new uploads against screenshots of archived orders
+    screenshot_hash = models.CharField(max_length=64, blank=True, default='')
+    screenshot_dhash = models.CharField(max_length=16, blank=True, default='')
+    screenshot_dhash_0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    screenshot_dhash_1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    screenshot_dhash_2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    screenshot_dhash_3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    invoice_data = models.JSONField(null=True, blank=True)
+    history = models.JSONField(default=list)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-order_date', '-id'], name='archivedorder_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.id} by {self.user}"
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True)
+    object_id = models.PositiveIntegerField(null=True, blank=True)
+    product = GenericForeignKey('content_type', 'object_id')
+    product_name = models.CharField(max_length=255)
+    product_category = models.CharField(max_length=50, blank=True)
+    price_at_purchase = models.DecimalField(max_digits=12, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+
+    def calculate_subtotal(self):
+        return float(self.price_at_purchase) * float(self.quantity)
+
+    def __str__(self):
+        return f"{self.product_name} x {self.quantity}"
@@ -0,0 +1,57 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# The periodic job (orders.tasks) that drains the outbox inside run_worker
+DRAIN_OUTBOX_TASK = 'orders.drain_outbox'
+
+_handlers = {}
+
+
+def register(topic):
+    """Decorator: call the function with each OutboxMessage published on `topic`."""
+    def decorator(func):
+        _handlers.setdefault(topic, []).append(func)
+        return func
+    return decorator
+
+
+def process_batch(batch_size=100):
+    """
+    Claim up to `batch_size` unprocessed messages and run their handlers.
+
+    Messages are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    consumers can drain the outbox at once without handling a message twice.
+    Each message is handled in its own savepoint; a failure is recorded on the
+    message and retried on a later batch until MAX_ATTEMPTS. Returns the number
+    of messages handled successfully.
+    """
+    done = 0
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+            .order_by('id')[:batch_size]
+        )
+        for message in batch:
+            try:
+                with transaction.atomic():
+                    for handler in _handlers.get(message.topic, []):
+                        handler(message)
+            except Exception as e:
+                logger.exception('Outbox message %s (%s) failed', message.id, message.topic)
+                message.attempts += 1
+                message.last_error = str(e)
+                message.save(update_fields=['attempts', 'last_error'])
+                continue
+            message.attempts += 1
+            message.processed_at = timezone.now()
+            message.save(update_fields=['attempts', 'processed_at'])
+            done += 1
+    return done
@@ -0,0 +1,131 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder rounds datetimes to milliseconds; a cursor needs them exact."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=CursorEncoder)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, model, fields):
+    """Turn a cursor back into field values, converted with each model field's to_python()."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError
+        return [model._meta.get_field(name).to_python(value) for name, value in zip(fields, values)]
+    except (ValueError, TypeError, ValidationError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor.')
+
+
+def get_page_size(request, default=20, maximum=100):
+    try:
+        size = int(request.query_params.get('page_size', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def _after(ordering, values):
+    """Q matching rows that sort after `values` under `ordering`."""
+    fields = [name.lstrip('-') for name in ordering]
+    # (a, b) after (x, y)  <=>  a > x OR (a = x AND b > y), per direction
+    condition = Q()
+    for i, name in enumerate(ordering):
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        step = Q(**{f'{fields[i]}__{lookup}': values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev_field: prev_value})
+        condition |= step
+    return condition
+
+
+def keyset_paginate(queryset, request, ordering=('-order_date', '-id'), default_page_size=20, max_page_size=100):
+    """
+    Seek-method pagination: instead of OFFSET, filter on the last row of the previous
+    page, so page N costs the same as page 1 on an index matching `ordering`.
+
+    `ordering` must end in a unique field. Returns (rows, next_cursor); next_cursor
+    is None on the last page. Raises InvalidCursor for a malformed ?cursor=.
+    """
+    fields = [name.lstrip('-') for name in ordering]
+    page_size = get_page_size(request, default_page_size, max_page_size)
+    queryset = queryset.order_by(*ordering)
+
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, fields)
+        queryset = queryset.filter(_after(ordering, values))
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, field) for field in fields])
+    return rows, next_cursor
+
+
+def keyset_paginate_merged(querysets, request, ordering=('-order_date', '-id'), default_page_size=20, max_page_size=100):
+    """
+    keyset_paginate() over the union of several querysets that share the `ordering`
+    fields and never share a key (e.g. live and archived orders). Each queryset is
+    read with the same seek filter and limit, and the pages are merged in Python.
+    """
+    fields = [name.lstrip('-') for name in ordering]
+    page_size = get_page_size(request, default_page_size, max_page_size)
+
+    cursor = request.query_params.get('cursor')
+    condition = Q()
+    if cursor:
+        condition = _after(ordering, decode_cursor(cursor, querysets[0].model, fields))
+
+    rows = []
+    for queryset in querysets:
+        rows += list(queryset.filter(condition).order_by(*ordering)[:page_size + 1])
+    # Stable sorts from the last ordering field to the first give the combined order
+    for name in reversed(ordering):
+        field = name.lstrip('-')
+        rows.sort(key=lambda row: getattr(row, field), reverse=name.startswith('-'))
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, field) for field in fields])
+    return rows, next_cursor
+
+
+def iterate_in_chunks(queryset, chunk_size=500):
+    """
+    Yield lists of at most `chunk_size` rows in primary-key order. Each chunk is a
+    separate keyset query, so prefetch_related() on `queryset` applies per chunk and
+    memory stays bounded no matter how many rows match.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
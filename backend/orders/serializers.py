@@ -1,6 +1,20 @@
 from rest_framework import serializers
-from .models import Order, OrderItem, RefundRequest
-from product.serializers import ClothingProductSerializer
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, RefundRequest
+from product.serializers import ClothingProductSerializer, reviews_by_product
+
+
+def order_serializer_context(request, orders):
+    """
+    Serializer context for orders whose items (and item products) were prefetched:
+    reviews for every product on the page are loaded in one query up front.
+    """
+    product_ids = {
+        item.object_id
+        for order in orders
+        for item in order.items.all()
+        if item.object_id is not None
+    }
+    return {'request': request, 'reviews_by_product': reviews_by_product(product_ids)}
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product = serializers.SerializerMethodField()
@@ -31,17 +45,19 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'order_date', 'status', 'payment_status', 'total_amount', 'shipping_address', 'items', 'loyalty_points_earned', 'payment_verification_status', 'track_order_status']
         read_only_fields = ['id', 'user', 'order_date', 'status', 'payment_status', 'total_amount', 'items', 'loyalty_points_earned']
 
-    def get_payment_verification_status(self, obj):
+    def _payment_status(self, obj):
         # If a Payment record exists (OneToOne relation named 'payment_record'), return its status
         payment = getattr(obj, 'payment_record', None)
         if payment is None:
             return 'waiting'
         return getattr(payment, 'status', 'waiting')
 
+    def get_payment_verification_status(self, obj):
+        return self._payment_status(obj)
+
     def get_track_order_status(self, obj):
         # Track status is '-' by default, becomes 'shipping' when payment is approved
-        payment = getattr(obj, 'payment_record', None)
-        if payment and getattr(payment, 'status', '').lower() == 'approved':
+        if self._payment_status(obj).lower() == 'approved':
             return 'shipping'
         # allow storing an explicit track field on the order in future
         return getattr(obj, 'track_order_status', '-')
@@ -52,10 +68,32 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def get_payment_status(self, obj):
         # Mirror payment verification status into the `payment_status` field
-        payment = getattr(obj, 'payment_record', None)
-        if payment is None:
-            return 'waiting'
-        return getattr(payment, 'status', 'waiting')
+        return self._payment_status(obj)
+
+class OrderSummarySerializer(OrderSerializer):
+    """Order without item detail, using the stored item_count."""
+
+    class Meta(OrderSerializer.Meta):
+        fields = ['id', 'order_date', 'status', 'payment_status', 'total_amount', 'item_count', 'loyalty_points_earned', 'payment_verification_status', 'track_order_status']
+        read_only_fields = fields
+
+class ArchivedOrderItemSerializer(OrderItemSerializer):
+    class Meta(OrderItemSerializer.Meta):
+        model = ArchivedOrderItem
+
+class ArchivedOrderSerializer(OrderSerializer):
+    """Same shape as OrderSerializer; the payment status was snapshotted when the order was archived."""
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+
+    class Meta(OrderSerializer.Meta):
+        model = ArchivedOrder
+
+    def _payment_status(self, obj):
+        return obj.payment_status
+
+class ArchivedOrderSummarySerializer(ArchivedOrderSerializer):
+    class Meta(OrderSummarySerializer.Meta):
+        model = ArchivedOrder
 
 class RefundRequestSerializer(serializers.ModelSerializer):
     class Meta:
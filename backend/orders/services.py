@@ -0,0 +1,347 @@
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+
+from .models import Order, OrderEvent, OrderItem, OutboxMessage, RefundRequest
+from .tracking import invalidate_tracking
+from product.models import ClothingProduct
+from users.loyalty import EARNING_STATUS, REVOKING_STATUSES, post_order_entries
+
+
+# Allowed status moves. Every status write goes through transition_order(), which checks this table.
+ORDER_TRANSITIONS = {
+    'pending': {'paid', 'cancelled'},
+    'paid': {'processing', 'shipped', 'cancelled', 'refunded'},
+    'processing': {'shipped', 'cancelled', 'refunded'},
+    'shipped': {'delivered', 'refunded'},
+    'delivered': {'refunded'},
+    'cancelled': set(),
+    'refunded': set(),
+}
+
+# Moving into one of these puts the order's items back in stock. Both are final
+# statuses, so an order can only ever be restocked once.
+RESTOCKING_STATUSES = ('cancelled', 'refunded')
+
+
+class InvalidTransition(Exception):
+    def __init__(self, from_status, to_status):
+        if to_status not in ORDER_TRANSITIONS:
+            message = f'Invalid status. Valid options: {", ".join(ORDER_TRANSITIONS)}'
+        else:
+            message = f'Cannot change order from {from_status} to {to_status}.'
+        super().__init__(message)
+        self.message = message
+
+
+class OrderPlacementError(Exception):
+    """Raised when an order cannot be placed. Carries the HTTP status to return."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def calculate_loyalty_points(amount):
+    """Calculate loyalty points: 1 point per 10 currency units."""
+    try:
+        pts = int(float(amount) // 10)
+        return max(pts, 0)
+    except (ValueError, TypeError):
+        return 0
+
+
+def merge_quantities(items):
+    """
+    Collapse [(product_id, qty), ...] into {product_id: total_qty}, so the same
+    product listed twice is locked and decremented once.
+    """
+    quantities = {}
+    for product_id, qty in items:
+        quantities[product_id] = quantities.get(product_id, 0) + qty
+    return quantities
+
+
+def place_order_items(user, items, shipping_address='', skip_missing=False):
+    """
+    Create an order for `items` ([(product_id, qty), ...]) in a fixed number of queries.
+
+    - all products are loaded with one SELECT ... FOR UPDATE in primary-key order,
+      so concurrent checkouts always lock rows in the same order and cannot deadlock
+    - order items are written with a single bulk INSERT
+    - stock is decremented with a single conditional UPDATE
+      (stock = stock - n WHERE stock >= n for every row)
+
+    Raises OrderPlacementError on the first missing or insufficient product;
+    nothing is written in that case. With `skip_missing` (used for carts) products
+    that no longer exist are dropped instead.
+    """
+    quantities = merge_quantities(items)
+    if not quantities:
+        raise OrderPlacementError('No items provided.')
+
+    with transaction.atomic():
+        products = list(
+            ClothingProduct.objects.select_for_update()
+            .filter(id__in=quantities.keys())
+            .order_by('pk')
+        )
+        found = {product.id for product in products}
+        if skip_missing:
+            if not products:
+                raise OrderPlacementError('No valid products found in cart.')
+        else:
+            for product_id in quantities:
+                if product_id not in found:
+                    raise OrderPlacementError(f'Product with id {product_id} not found', status_code=404)
+
+        total_amount = Decimal('0')
+        for product in products:
+            qty = quantities[product.id]
+            if product.stock < qty:
+                raise OrderPlacementError(
+                    f'Not enough stock for {product.name}. Available: {product.stock}, Requested: {qty}'
+                )
+            total_amount += product.price * qty
+
+        content_type = ContentType.objects.get_for_model(ClothingProduct)
+        order_items = [
+            OrderItem(
+                content_type=content_type,
+                object_id=product.id,
+                product_name=product.name,
+                product_category=product.category,
+                price_at_purchase=product.price,
+                quantity=quantities[product.id],
+            )
+            for product in products
+        ]
+        order = Order.objects.create(
+            user=user,
+            shipping_address=shipping_address,
+            status='pending',
+            total_amount=total_amount,
+            loyalty_points_earned=calculate_loyalty_points(total_amount),
+            item_count=len(order_items),
+            items_summary=Order.summarize_items(order_items),
+        )
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+        record_order_event(order, '', 'pending', actor=user, topic='order.placed')
+
+        # One UPDATE for the whole cart; each row only matches while it still has enough stock.
+        guard = Q()
+        for product in products:
+            guard |= Q(pk=product.id, stock__gte=quantities[product.id])
+        updated = ClothingProduct.objects.filter(guard).update(
+            stock=Case(
+                *[When(pk=product.id, then=F('stock') - quantities[product.id]) for product in products],
+                default=F('stock'),
+                output_field=IntegerField(),
+            )
+        )
+        if updated != len(products):
+            # Only reachable on backends without row locks; roll back the whole order.
+            raise OrderPlacementError('Stock changed while placing the order. Please try again.', status_code=409)
+
+    return order
+
+
+def record_order_events(orders, to_status, actor=None, note='', topic='order.status_changed'):
+    """
+    Bulk version of record_order_event(): `orders` is a list of (order, from_status).
+    Two INSERTs regardless of how many orders changed, plus the loyalty ledger
+    entries (and balance UPDATE) when orders are paid, cancelled or refunded.
+    """
+    events = OrderEvent.objects.bulk_create([
+        OrderEvent(
+            order=order,
+            from_status=from_status,
+            to_status=to_status,
+            track_order_status=order.track_order_status,
+            actor=actor,
+            note=note,
+        )
+        for order, from_status in orders
+    ])
+    OutboxMessage.objects.bulk_create([
+        OutboxMessage(topic=topic, payload={
+            'event_id': event.id,
+            'order_id': order.id,
+            'user_id': order.user_id,
+            'from_status': from_status,
+            'to_status': to_status,
+            'track_order_status': order.track_order_status,
+        })
+        for event, (order, from_status) in zip(events, orders)
+    ])
+    if to_status == EARNING_STATUS:
+        post_order_entries('earn', [order for order, _ in orders])
+    elif to_status in REVOKING_STATUSES:
+        post_order_entries('revoke', [order for order, _ in orders], note=f'Order {to_status}')
+    return events
+
+
+def record_order_event(order, from_status, to_status, actor=None, note='', topic='order.status_changed'):
+    """Append an OrderEvent and its outbox message. Call inside the transaction that changed the order."""
+    return record_order_events([(order, from_status)], to_status, actor=actor, note=note, topic=topic)[0]
+
+
+def restore_stock(order_ids):
+    """
+    Put the items of `order_ids` back in stock with one UPDATE: each product gets
+    stock = stock + (sum of its quantities across those orders). Returns rows updated.
+    """
+    content_type = ContentType.objects.get_for_model(ClothingProduct)
+    items = OrderItem.objects.filter(order_id__in=order_ids, content_type=content_type)
+    returned = (
+        items.filter(object_id=OuterRef('pk'))
+        .values('object_id')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+    return ClothingProduct.objects.filter(pk__in=items.values('object_id')).update(
+        stock=F('stock') + Subquery(returned, output_field=IntegerField())
+    )
+
+
+def transition_order(order, new_status, actor=None, note='', track_order_status=None):
+    """
+    Move `order` to `new_status` if ORDER_TRANSITIONS allows it, recording an
+    OrderEvent and an outbox message in the same transaction. Moving to
+    'cancelled' or 'refunded' also puts the order's items back in stock.
+
+    The order row is re-read with SELECT ... FOR UPDATE so two concurrent
+    transitions cannot both pass validation. Moving to the current status is a
+    no-op (apart from an optional track status change), which is what stops a
+    double cancel from restoring stock twice. Raises InvalidTransition.
+    """
+    with transaction.atomic():
+        locked = Order.objects.select_for_update().get(pk=order.pk)
+        old_status = locked.status
+        if new_status != old_status and new_status not in ORDER_TRANSITIONS.get(old_status, ()):
+            raise InvalidTransition(old_status, new_status)
+
+        update_fields = []
+        if track_order_status is not None and track_order_status != locked.track_order_status:
+            locked.track_order_status = track_order_status
+            update_fields.append('track_order_status')
+        if new_status != old_status:
+            locked.status = new_status
+            update_fields.append('status')
+        if update_fields:
+            locked.save(update_fields=update_fields)
+            invalidate_tracking([locked.pk])
+        if new_status != old_status:
+            if new_status in RESTOCKING_STATUSES:
+                restore_stock([locked.pk])
+            record_order_event(locked, old_status, new_status, actor=actor, note=note)
+
+    order.status = locked.status
+    order.track_order_status = locked.track_order_status
+    return order
+
+
+def cancel_orders(order_ids, actor=None, note=''):
+    """
+    Cancel many orders in one transaction with a fixed number of queries:
+    lock them in primary-key order, cancel those whose status allows it, restore
+    their stock with one UPDATE and bulk-insert their events.
+
+    Returns (cancelled_ids, skipped) where skipped maps order id -> current status
+    for orders that could not be cancelled (already cancelled, shipped, ...).
+    """
+    with transaction.atomic():
+        locked = list(Order.objects.select_for_update().filter(pk__in=order_ids).order_by('pk'))
+        cancellable = [order for order in locked if 'cancelled' in ORDER_TRANSITIONS.get(order.status, ())]
+        skipped = {order.pk: order.status for order in locked if order not in cancellable}
+        cancelled_ids = [order.pk for order in cancellable]
+        if cancelled_ids:
+            Order.objects.filter(pk__in=cancelled_ids).update(status='cancelled')
+            invalidate_tracking(cancelled_ids)
+            restore_stock(cancelled_ids)
+            record_order_events([(order, order.status) for order in cancellable], 'cancelled', actor=actor, note=note)
+    return cancelled_ids, skipped
+
+
+REFUND_DECISIONS = ('approve', 'reject')
+
+
+def process_refund_requests(refund_ids, decision, actor=None, note='', chunk_size=200):
+    """
+    Approve or reject many RefundRequests. Requests are handled `chunk_size` at a
+    time, each chunk in its own transaction with a fixed number of queries, so one
+    large run never holds its locks for long.
+
+    Approving a request moves its order to 'refunded' (one UPDATE), restores the
+    order's stock (one UPDATE), revokes its loyalty points and records events
+    through record_order_events(), then marks the request 'processed'. Rejecting
+    only marks the request 'rejected'.
+
+    Returns one {'id', 'outcome', 'detail'} per requested id, in the order given;
+    outcome is 'refunded', 'rejected' or 'skipped'.
+    """
+    if decision not in REFUND_DECISIONS:
+        raise ValueError(f'decision must be one of: {", ".join(REFUND_DECISIONS)}')
+    refund_ids = list(dict.fromkeys(refund_ids))
+    outcomes = {}
+    for start in range(0, len(refund_ids), chunk_size):
+        outcomes.update(_process_refund_chunk(refund_ids[start:start + chunk_size], decision, actor, note))
+    return [
+        {'id': refund_id, 'outcome': outcomes[refund_id][0], 'detail': outcomes[refund_id][1]}
+        for refund_id in refund_ids
+    ]
+
+
+def _process_refund_chunk(refund_ids, decision, actor, note):
+    outcomes = {refund_id: ('skipped', 'Refund request not found.') for refund_id in refund_ids}
+    with transaction.atomic():
+        requests = list(RefundRequest.objects.select_for_update().filter(pk__in=refund_ids).order_by('pk'))
+        pending = []
+        for refund in requests:
+            if refund.status == 'pending':
+                pending.append(refund)
+            else:
+                outcomes[refund.pk] = ('skipped', f'Refund request is already {refund.status}.')
+        if not pending:
+            return outcomes
+
+        if decision == 'reject':
+            RefundRequest.objects.filter(pk__in=[refund.pk for refund in pending]).update(
+                status='rejected', admin_note=note or None
+            )
+            outcomes.update({refund.pk: ('rejected', '') for refund in pending})
+            return outcomes
+
+        # Same lock order as cancel_orders() and transition_order(): orders by pk
+        orders = {
+            order.pk: order
+            for order in Order.objects.select_for_update()
+            .filter(pk__in={refund.order_id for refund in pending}).order_by('pk')
+        }
+        refunding = {}
+        processed = []
+        for refund in pending:
+            order = orders[refund.order_id]
+            if order.pk in refunding:
+                outcomes[refund.pk] = ('skipped', f'Order #{order.pk} is refunded by another request in this batch.')
+            elif 'refunded' not in ORDER_TRANSITIONS.get(order.status, ()):
+                outcomes[refund.pk] = ('skipped', f'Order #{order.pk} is {order.status} and cannot be refunded.')
+            else:
+                refunding[order.pk] = (order, order.status)
+                processed.append(refund.pk)
+                outcomes[refund.pk] = ('refunded', f'Order #{order.pk} refunded.')
+        if not refunding:
+            return outcomes
+
+        order_ids = list(refunding)
+        Order.objects.filter(pk__in=order_ids).update(status='refunded')
+        invalidate_tracking(order_ids)
+        restore_stock(order_ids)
+        record_order_events(list(refunding.values()), 'refunded', actor=actor, note=note or 'Refund approved')
+        RefundRequest.objects.filter(pk__in=processed).update(status='processed', admin_note=note or None)
+    return outcomes
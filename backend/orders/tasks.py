@@ -0,0 +1,20 @@
+from django.conf import settings
+
+from jobs.queue import task
+
+from .invoices import RENDER_PDF_TASK, render_invoice_pdf
+from .outbox import DRAIN_OUTBOX_TASK, process_batch
+
+
+@task(RENDER_PDF_TASK)
+def render_invoice_pdf_task(invoice_id):
+    render_invoice_pdf(invoice_id)
+
+
+# Periodic, so any run_worker deployment handles order confirmations, invoice
+# freezing and rollups without a separate process_outbox process. Not atomic:
+# each batch commits on its own, as it does under process_outbox.
+@task(DRAIN_OUTBOX_TASK, atomic=False, every=settings.OUTBOX_DRAIN_INTERVAL)
+def drain_outbox():
+    while process_batch():
+        pass
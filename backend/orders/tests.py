@@ -1,3 +1,675 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import tempfile
+import threading
+from unittest import mock
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .invoices import freeze_invoice
+from .live import InMemoryBroker, get_broker
+from .archive import archive_batch
+from .models import ArchivedOrder, IdempotencyKey, Order, OrderEvent, OrderItem, OutboxMessage, RefundRequest
+from .outbox import process_batch, register
+from .tracking import publish_tracking
+from .services import (
+    InvalidTransition, OrderPlacementError, cancel_orders, place_order_items, process_refund_requests,
+    transition_order,
+)
+from jobs.models import Job
+from mailer.models import OutgoingEmail
+from product.models import ClothingProduct
+
+User = get_user_model()
+
+
+def make_products(count, stock=10, price='100.00'):
+    return [
+        ClothingProduct.objects.create(
+            name=f'Product {i}', description='-', price=price, stock=stock, category='shirt'
+        )
+        for i in range(count)
+    ]
+
+
+class PlaceOrderItemsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+
+    def test_places_order_and_decrements_stock(self):
+        shirt, pant = make_products(2, stock=5)
+        order = place_order_items(self.user, [(shirt.id, 2), (pant.id, 1), (shirt.id, 1)])
+
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(order.total_amount, 400)
+        self.assertEqual(order.loyalty_points_earned, 40)
+        shirt.refresh_from_db()
+        pant.refresh_from_db()
+        self.assertEqual(shirt.stock, 2)
+        self.assertEqual(pant.stock, 4)
+
+    def test_recalculated_total_is_exact(self):
+        # What the order admin runs after inline item edits
+        shirt, pant = make_products(2, price='19.99')
+        ClothingProduct.objects.filter(pk=pant.pk).update(price='0.10')
+        order = place_order_items(self.user, [(shirt.id, 3), (pant.id, 7)])
+        placed = order.total_amount
+        self.assertEqual(order.calculate_total(), placed)
+        self.assertIsInstance(order.total_amount, Decimal)
+
+        order.items.filter(object_id=pant.id).delete()
+        self.assertEqual(order.calculate_total(), Decimal('59.97'))
+
+    def test_insufficient_stock_writes_nothing(self):
+        shirt, pant = make_products(2, stock=1)
+        with self.assertRaises(OrderPlacementError):
+            place_order_items(self.user, [(shirt.id, 1), (pant.id, 2)])
+
+        self.assertFalse(Order.objects.exists())
+        shirt.refresh_from_db()
+        self.assertEqual(shirt.stock, 1)
+
+    def test_missing_product_is_404(self):
+        with self.assertRaises(OrderPlacementError) as ctx:
+            place_order_items(self.user, [(9999, 1)])
+        self.assertEqual(ctx.exception.status_code, 404)
+
+    def test_query_count_is_independent_of_cart_size(self):
+        # Warm the ContentType cache so it does not count against the first run
+        place_order_items(self.user, [(make_products(1)[0].id, 1)])
+
+        for size in (1, 5, 30):
+            items = [(product.id, 1) for product in make_products(size)]
+            # savepoint + locked SELECT + order INSERT + bulk INSERT + event INSERT + outbox INSERT
+            # + stock UPDATE + release (loyalty points are credited on payment)
+            with self.assertNumQueries(8):
+                place_order_items(self.user, items)
+
+
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.order = place_order_items(self.user, [(make_products(1)[0].id, 1)])
+
+    def test_valid_move_logs_event_and_outbox_message(self):
+        transition_order(self.order, 'paid', actor=self.user)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'paid')
+        event = self.order.events.last()
+        self.assertEqual((event.from_status, event.to_status), ('pending', 'paid'))
+        message = OutboxMessage.objects.filter(topic='order.status_changed').get()
+        self.assertEqual(message.payload['event_id'], event.id)
+
+    def test_invalid_move_is_rejected(self):
+        transition_order(self.order, 'cancelled')
+        with self.assertRaises(InvalidTransition):
+            transition_order(self.order, 'shipped')
+        self.assertEqual(self.order.events.count(), 2)  # placed + cancelled
+
+    def test_worker_drains_the_outbox(self):
+        # No process_outbox process: run_worker schedules the periodic drain itself
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        self.assertFalse(OutboxMessage.objects.filter(processed_at__isnull=True).exists())
+        self.assertTrue(OutgoingEmail.objects.filter(template='order_confirmation').exists())
+        next_run = Job.objects.get(task='orders.drain_outbox', status='queued')
+        self.assertGreater(next_run.run_after, timezone.now())
+
+        # Restarting the worker does not start a second chain
+        call_command('run_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        self.assertEqual(Job.objects.filter(task='orders.drain_outbox', status='queued').count(), 1)
+
+    def test_outbox_handlers_run_once(self):
+        handled = []
+        register('test.topic')(lambda message: handled.append(message.id))
+        OutboxMessage.objects.create(topic='test.topic', payload={})
+
+        process_batch()
+        process_batch()
+
+        self.assertEqual(len(handled), 1)
+        self.assertFalse(OutboxMessage.objects.filter(processed_at__isnull=True).exists())
+
+
+class CancelOrderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = make_products(2, stock=10)
+
+    def stock(self):
+        return list(ClothingProduct.objects.order_by('pk').values_list('stock', flat=True))
+
+    def test_cancel_restores_stock_once(self):
+        order = place_order_items(self.user, [(self.products[0].id, 3), (self.products[1].id, 1)])
+        self.assertEqual(self.stock(), [7, 9])
+
+        self.assertEqual(self.client.post(f'/api/orders/{order.id}/cancel/').status_code, 200)
+        self.assertEqual(self.stock(), [10, 10])
+
+        self.assertEqual(self.client.post(f'/api/orders/{order.id}/cancel/').status_code, 400)
+        self.assertEqual(self.stock(), [10, 10])
+
+    def test_refund_by_transition_restores_stock(self):
+        # The status endpoint and the order admin go through transition_order(),
+        # and must agree with process_refund_requests()
+        order = place_order_items(self.user, [(self.products[0].id, 3)])
+        for next_status in ('paid', 'shipped', 'refunded'):
+            transition_order(order, next_status)
+        self.assertEqual(self.stock(), [10, 10])
+
+    def test_bulk_cancel_is_set_based(self):
+        order_ids = [
+            place_order_items(self.user, [(product.id, 1) for product in self.products]).id
+            for _ in range(5)
+        ]
+        self.assertEqual(self.stock(), [5, 5])
+        # Warm the ContentType cache so the count only covers the cancel itself
+        ContentType.objects.get_for_model(ClothingProduct)
+
+        # savepoint, lock, status UPDATE, stock UPDATE, event + outbox INSERTs,
+        # loyalty ledger SELECT (unpaid orders earned nothing to revoke), release
+        with self.assertNumQueries(8):
+            cancelled_ids, skipped = cancel_orders(order_ids)
+        self.assertEqual(sorted(cancelled_ids), sorted(order_ids))
+        self.assertEqual(self.stock(), [10, 10])
+
+        cancelled_ids, skipped = cancel_orders(order_ids)
+        self.assertEqual(cancelled_ids, [])
+        self.assertEqual(set(skipped.values()), {'cancelled'})
+        self.assertEqual(self.stock(), [10, 10])
+
+
+class RefundPipelineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass1234', is_staff=True)
+        self.products = make_products(2, stock=10)
+
+    def delivered_order_with_request(self):
+        order = place_order_items(self.user, [(product.id, 1) for product in self.products])
+        for next_status in ('paid', 'shipped', 'delivered'):
+            transition_order(order, next_status)
+        return order, RefundRequest.objects.create(order=order, user=self.user, reason='Wrong size')
+
+    def test_approve_refunds_orders_in_chunks(self):
+        pairs = [self.delivered_order_with_request() for _ in range(5)]
+        self.assertEqual(ClothingProduct.objects.get(pk=self.products[0].pk).stock, 5)
+        refund_ids = [refund.pk for _, refund in pairs]
+
+        results = process_refund_requests(refund_ids + [9999], 'approve', actor=self.admin, chunk_size=2)
+
+        self.assertEqual([result['outcome'] for result in results], ['refunded'] * 5 + ['skipped'])
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), {'refunded'})
+        self.assertEqual(set(RefundRequest.objects.values_list('status', flat=True)), {'processed'})
+        self.assertEqual(ClothingProduct.objects.get(pk=self.products[0].pk).stock, 10)
+        self.assertEqual(User.objects.get(pk=self.user.pk).loyalty_balance, 0)
+        self.assertEqual(OrderEvent.objects.filter(to_status='refunded', actor=self.admin).count(), 5)
+
+        # A second run changes nothing
+        results = process_refund_requests(refund_ids, 'approve')
+        self.assertEqual({result['outcome'] for result in results}, {'skipped'})
+        self.assertEqual(ClothingProduct.objects.get(pk=self.products[0].pk).stock, 10)
+
+    def test_chunk_query_count_is_fixed(self):
+        refund_ids = [self.delivered_order_with_request()[1].pk for _ in range(4)]
+        ContentType.objects.get_for_model(ClothingProduct)
+        # savepoint, lock requests, lock orders, order UPDATE, stock UPDATE, event + outbox INSERTs,
+        # loyalty ledger SELECT + INSERT + balance UPDATE, request UPDATE, release
+        with self.assertNumQueries(12):
+            process_refund_requests(refund_ids, 'approve')
+
+    def test_reject_and_ineligible_orders_are_reported(self):
+        order, refund = self.delivered_order_with_request()
+        cancelled = place_order_items(self.user, [(self.products[0].id, 1)])
+        cancel_orders([cancelled.pk])
+        stale = RefundRequest.objects.create(order=cancelled, user=self.user, reason='-')
+        duplicate = RefundRequest.objects.create(order=order, user=self.user, reason='again')
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        body = client.post('/api/orders/admin/refunds/process/', {
+            'refund_ids': [refund.pk, stale.pk, duplicate.pk], 'decision': 'approve',
+        }, format='json').json()
+        self.assertEqual((body['refunded'], body['skipped']), (1, 2))
+        self.assertIn('cancelled and cannot be refunded', body['results'][1]['detail'])
+        self.assertIn('another request', body['results'][2]['detail'])
+
+        body = client.post('/api/orders/admin/refunds/process/', {
+            'refund_ids': [stale.pk], 'decision': 'reject', 'note': 'Order was cancelled',
+        }, format='json').json()
+        self.assertEqual(body['rejected'], 1)
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.admin_note), ('rejected', 'Order was cancelled'))
+
+    def test_admin_action(self):
+        _, refund = self.delivered_order_with_request()
+        self.client.force_login(self.admin)
+        self.admin.is_superuser = True
+        self.admin.save()
+        response = self.client.post('/admin/orders/refundrequest/', {
+            'action': 'approve_selected_refunds', '_selected_action': [refund.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        refund.refresh_from_db()
+        self.assertEqual(refund.status, 'processed')
+
+
+class TrackOrderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.order = place_order_items(self.user, [(make_products(1)[0].id, 1)])
+        self.url = f'/api/orders/{self.order.id}/track/'
+
+    def test_tracking_is_cached_until_status_changes(self):
+        with self.assertNumQueries(1):
+            first = self.client.get(self.url).json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).json(), first)
+        self.assertEqual((first['status'], first['payment_status']), ('pending', 'waiting'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_order(self.order, 'paid', track_order_status='shipping')
+        updated = self.client.get(self.url).json()
+        self.assertEqual((updated['status'], updated['track_order_status']), ('paid', 'shipping'))
+
+    def test_unknown_order_is_404(self):
+        self.assertEqual(self.client.get('/api/orders/999999/track/').status_code, 404)
+
+
+class LiveUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.order = place_order_items(self.user, [(make_products(1)[0].id, 1)])
+
+    def change_status(self, to_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_order(Order.objects.get(pk=self.order.pk), to_status)
+
+    async def next_event(self, stream):
+        """The next `order` event's data, skipping the retry line and keep-alives."""
+        while True:
+            chunk = (await anext(stream)).decode()
+            if chunk.startswith('event: order'):
+                return json.loads(chunk.split('data: ', 1)[1])
+
+    async def disconnect(self, stream):
+        # On disconnect the ASGI handler cancels the task waiting on the stream
+        reader = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+
+    async def test_broker_delivers_across_threads(self):
+        broker = InMemoryBroker()
+        subscription = broker.subscribe('order:1')
+        worker = threading.Thread(target=broker.publish, args=('order:1', 'hello'))
+        worker.start()
+        worker.join()
+        broker.publish('order:2', 'not for us')
+        self.assertEqual(await subscription.get(timeout=1), 'hello')
+        self.assertIsNone(await subscription.get(timeout=0.01))
+        subscription.close()
+        self.assertFalse(broker.has_subscribers())
+
+    async def test_order_stream_pushes_status_changes(self):
+        response = await self.async_client.get(f'/api/orders/{self.order.id}/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertEqual((await self.next_event(stream))['status'], 'pending')
+
+        await sync_to_async(self.change_status)('paid')
+        self.assertEqual((await self.next_event(stream))['status'], 'paid')
+
+        await self.disconnect(stream)
+        self.assertFalse(get_broker().has_subscribers())
+
+    async def test_user_stream_needs_a_token(self):
+        response = await self.async_client.get('/api/orders/events/')
+        self.assertEqual(response.status_code, 401)
+
+        token = str(AccessToken.for_user(self.user))
+        # The access token is not accepted in the URL, only a single-use ticket
+        response = await self.async_client.get('/api/orders/events/', {'token': token})
+        self.assertEqual(response.status_code, 401)
+        ticket = await self.async_client.post('/api/orders/events/ticket/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(ticket.status_code, 201)
+        response = await self.async_client.get('/api/orders/events/', {'ticket': ticket.json()['ticket']})
+        stream = response.streaming_content
+        await anext(stream)  # retry line; the subscription is live from here
+        await sync_to_async(self.change_status)('cancelled')
+        event = await self.next_event(stream)
+        self.assertEqual((event['id'], event['status']), (self.order.id, 'cancelled'))
+        await self.disconnect(stream)
+
+        reused = await self.async_client.get('/api/orders/events/', {'ticket': ticket.json()['ticket']})
+        self.assertEqual(reused.status_code, 401)
+
+    async def test_order_stream_is_rate_limited(self):
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'order_tracking': '1/min'}
+        with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            stream = (await self.async_client.get(f'/api/orders/{self.order.id}/events/')).streaming_content
+            await self.next_event(stream)
+            await self.disconnect(stream)
+            response = await self.async_client.get(f'/api/orders/{self.order.id}/events/')
+            self.assertEqual(response.status_code, 429)
+            self.assertFalse(get_broker().has_subscribers())
+
+    def test_no_query_without_listeners(self):
+        with self.assertNumQueries(0):
+            publish_tracking([self.order.id])
+
+    def test_wsgi_is_refused(self):
+        self.assertEqual(self.client.get(f'/api/orders/{self.order.id}/events/').status_code, 501)
+
+
+class IdempotentPlaceOrderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = make_products(1, stock=5)[0]
+
+    def place(self, key, quantity=1):
+        return self.client.post(
+            '/api/orders/place/',
+            {'use_cart': False, 'items': [{'product_id': self.product.id, 'quantity': quantity}]},
+            format='json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay_returns_original_response(self):
+        first = self.place('retry-1')
+        second = self.place('retry-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 4)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.place('retry-2')
+        response = self.place('retry-2', quantity=2)
+        self.assertEqual(response.status_code, 422)
+
+    def test_retryable_conflict_is_not_replayed(self):
+        conflict = OrderPlacementError('Stock changed while placing the order. Please try again.', status_code=409)
+        with mock.patch('orders.views.place_order_items', side_effect=conflict):
+            first = self.place('retry-3')
+        self.assertEqual(first.status_code, 409)
+        self.assertFalse(IdempotencyKey.objects.filter(key='retry-3').exists())
+
+        second = self.place('retry-3')
+        self.assertEqual(second.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place_orders(self, count, lines=3):
+        for _ in range(count):
+            place_order_items(self.user, [(product.id, 1) for product in make_products(lines)])
+
+    def test_history_query_count_is_constant(self):
+        self.place_orders(2)
+        # orders + payment join, items, products, reviews, archived orders
+        with self.assertNumQueries(5):
+            self.client.get('/api/orders/history/')
+        self.place_orders(10)
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/orders/history/')
+        self.assertEqual(len(response.json()['results']), 12)
+
+    def test_cursor_walks_every_order_once(self):
+        self.place_orders(5, lines=1)
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 2, 'summary': 'true'}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get('/api/orders/history/', params).json()
+            seen += [order['id'] for order in body['results']]
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, list(Order.objects.order_by('-order_date', '-id').values_list('id', flat=True)))
+
+    def test_summary_mode_has_item_count(self):
+        self.place_orders(1, lines=3)
+        order = self.client.get('/api/orders/history/', {'summary': '1'}).json()['results'][0]
+        self.assertEqual(order['item_count'], 3)
+        self.assertNotIn('items', order)
+
+    def test_bad_cursor_is_400(self):
+        self.assertEqual(self.client.get('/api/orders/history/', {'cursor': 'nope'}).status_code, 400)
+
+
+class ArchiveOrdersTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cutoff = timezone.now() - timedelta(days=365)
+
+    def place_old_order(self, status, days_ago=400):
+        order = place_order_items(self.user, [(product.id, 2) for product in make_products(2)])
+        if status != 'pending':
+            transition_order(order, 'cancelled' if status == 'cancelled' else 'paid')
+            if status == 'delivered':
+                transition_order(order, 'shipped')
+                transition_order(order, 'delivered')
+        Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def test_moves_only_old_finished_orders(self):
+        delivered = self.place_old_order('delivered')
+        cancelled = self.place_old_order('cancelled')
+        pending = self.place_old_order('pending')
+        recent = self.place_old_order('delivered', days_ago=10)
+        disputed = self.place_old_order('delivered')
+        RefundRequest.objects.create(order=disputed, user=self.user, reason='Damaged')
+
+        self.assertEqual(archive_batch(self.cutoff), 2)
+
+        self.assertEqual(set(ArchivedOrder.objects.values_list('pk', flat=True)), {delivered.pk, cancelled.pk})
+        self.assertEqual(
+            set(Order.objects.values_list('pk', flat=True)), {pending.pk, recent.pk, disputed.pk}
+        )
+        self.assertFalse(OrderItem.objects.filter(order_id=delivered.pk).exists())
+        self.assertFalse(OrderEvent.objects.filter(order_id=delivered.pk).exists())
+        archived = ArchivedOrder.objects.get(pk=delivered.pk)
+        self.assertEqual(archived.items.count(), 2)
+        self.assertEqual([event['to_status'] for event in archived.history], ['pending', 'paid', 'shipped', 'delivered'])
+        self.assertEqual(archive_batch(self.cutoff), 0)
+
+    def test_archived_orders_stay_visible(self):
+        old = self.place_old_order('delivered')
+        new = place_order_items(self.user, [(make_products(1)[0].id, 1)])
+        archive_batch(self.cutoff)
+
+        response = self.client.get(f'/api/orders/{old.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['items']), 2)
+
+        for params in ({}, {'summary': 'true'}):
+            results = self.client.get('/api/orders/history/', params).json()['results']
+            self.assertEqual([order['id'] for order in results], [new.pk, old.pk])
+
+    def test_history_cursor_crosses_into_archive(self):
+        old = [self.place_old_order('delivered', days_ago=400 + i) for i in range(3)]
+        new = [place_order_items(self.user, [(make_products(1)[0].id, 1)]) for _ in range(2)]
+        archive_batch(self.cutoff)
+
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get('/api/orders/history/', params).json()
+            seen += [order['id'] for order in body['results']]
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, [order.pk for order in reversed(new)] + [order.pk for order in old])
+
+
+class AdminOrderListTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass1234', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        for _ in range(3):
+            place_order_items(self.buyer, [(product.id, 2) for product in make_products(2)])
+        Order.objects.filter(pk=Order.objects.first().pk).update(status='paid')
+
+    def test_filters_by_status(self):
+        body = self.client.get('/api/orders/admin/list/', {'status': 'paid'}).json()
+        self.assertEqual(len(body['results']), 1)
+        self.assertEqual(self.client.get('/api/orders/admin/list/', {'status': 'bogus'}).status_code, 400)
+
+    def test_ndjson_export_streams_every_order(self):
+        response = self.client.get('/api/orders/admin/list/', {'export': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])['item_count'], 2)
+
+    def test_csv_export_has_header_and_rows(self):
+        response = self.client.get('/api/orders/admin/list/', {'export': 'csv', 'date_from': '2000-01-01'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][0], 'order_id')
+        self.assertEqual(len(rows), 4)
+
+
+class OrderAdminTests(TestCase):
+    def setUp(self):
+        admin_user = User.objects.create_superuser(username='root', email='root@example.com', password='pass1234')
+        self.client.force_login(admin_user)
+        buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        products = make_products(3, stock=1000)
+        for _ in range(100):
+            place_order_items(buyer, [(product.id, 1) for product in products])
+
+    def test_changelist_query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/admin/orders/order/')
+        self.assertEqual(response.status_code, 200)
+        order_queries = [q for q in ctx.captured_queries if 'orders_order' in q['sql'] or 'orders_orderitem' in q['sql']]
+        self.assertLess(len(order_queries), 5)
+
+    def test_change_view_does_not_write(self):
+        order = Order.objects.first()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(f'/admin/orders/order/{order.pk}/change/')
+        writes = [q for q in ctx.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))]
+        self.assertEqual(writes, [])
+
+
+@override_settings(JOBS_RUN_EAGERLY=True)
+class InvoiceTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.order = place_order_items(self.user, [(product.id, 1) for product in make_products(2)])
+        self.url = f'/api/orders/{self.order.id}/invoice/'
+
+    def freeze(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return freeze_invoice(self.order)
+
+    def test_unpaid_invoice_is_computed_without_writes(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()['total'], 200.0)
+        self.assertFalse(any(q['sql'].startswith('UPDATE') for q in ctx.captured_queries))
+        self.assertEqual(self.client.get(self.url, {'format': 'pdf'}).status_code, 409)
+
+    def test_frozen_invoice_is_served_with_etag(self):
+        invoice = self.freeze()
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], f'"{invoice.content_hash}"')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # The snapshot does not follow later changes to the order
+        Order.objects.filter(pk=self.order.pk).update(shipping_address='elsewhere')
+        self.assertEqual(self.client.get(self.url).json(), response.json())
+
+    def test_pdf_is_rendered_once_under_its_hash(self):
+        invoice = self.freeze()
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.pdf.name, f'invoices/{invoice.pdf_hash}.pdf')
+
+        response = self.client.get(self.url, {'format': 'pdf'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'%PDF-1.4'))
+        self.assertEqual(response['ETag'], f'"{invoice.pdf_hash}"')
+
+    def test_pdf_requests_share_one_render_job(self):
+        # Frozen without running on_commit hooks, so the PDF is still missing
+        freeze_invoice(self.order)
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url, {'format': 'pdf'}).status_code, 202)
+        self.assertEqual(Job.objects.filter(task='orders.render_invoice_pdf').count(), 1)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ParallelCheckoutTests(TransactionTestCase):
+    def test_concurrent_checkouts_never_oversell(self):
+        product = make_products(1, stock=5)[0]
+        buyers = [
+            User.objects.create_user(username=f'buyer{i}', email=f'buyer{i}@example.com', password='pass1234')
+            for i in range(10)
+        ]
+        results = []
+
+        def checkout(user):
+            try:
+                place_order_items(user, [(product.id, 1)])
+                results.append(True)
+            except OrderPlacementError:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(user,)) for user in buyers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(results.count(True), 5)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.count(), 5)
@@ -0,0 +1,90 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .live import get_broker, order_channel, user_channel
+from .models import Order, OrderEvent
+
+
+def tracking_cache_key(order_id):
+    return f'orders:tracking:{order_id}'
+
+
+def load_tracking_many(order_ids):
+    """
+    Narrow tracking projections for several orders in one indexed query: only
+    the orders' status columns, their payment status and the time of the last
+    status change. Returns {order_id: (user_id, tracking)}; missing orders are
+    left out.
+    """
+    last_change = OrderEvent.objects.filter(order=OuterRef('pk')).order_by('-created_at', '-id').values('created_at')[:1]
+    rows = (
+        Order.objects.filter(pk__in=order_ids)
+        .annotate(status_changed_at=Subquery(last_change))
+        .values('id', 'user_id', 'status', 'track_order_status', 'payment_record__status', 'order_date', 'status_changed_at')
+    )
+    return {
+        row['id']: (row['user_id'], {
+            'id': row['id'],
+            'status': row['status'],
+            'track_order_status': row['track_order_status'],
+            'payment_status': row['payment_record__status'] or 'waiting',
+            'order_date': row['order_date'],
+            'status_changed_at': row['status_changed_at'] or row['order_date'],
+        })
+        for row in rows
+    }
+
+
+def load_tracking(order_id):
+    """Tracking projection for one order, or None if it does not exist."""
+    found = load_tracking_many([order_id]).get(order_id)
+    return found[1] if found else None
+
+
+def get_tracking(order_id):
+    """Tracking projection for `order_id`, served from the cache when possible."""
+    key = tracking_cache_key(order_id)
+    data = cache.get(key)
+    if data is None:
+        data = load_tracking(order_id)
+        if data is not None:
+            cache.set(key, data, getattr(settings, 'ORDER_TRACKING_CACHE_TTL', 300))
+    return data
+
+
+def tracking_json(data):
+    """A tracking projection as the JSON string sent on live channels."""
+    return json.dumps(data, cls=DjangoJSONEncoder)
+
+
+def publish_tracking(order_ids):
+    """Push the orders' current tracking projections to their order and owner live channels."""
+    broker = get_broker()
+    if not broker.has_subscribers():
+        return  # Nobody is streaming; skip the query
+    for order_id, (user_id, data) in load_tracking_many(order_ids).items():
+        message = tracking_json(data)
+        broker.publish(order_channel(order_id), message)
+        broker.publish(user_channel(user_id), message)
+
+
+def invalidate_tracking(order_ids):
+    """
+    Once the current transaction commits, drop the orders' cached tracking
+    entries and push the new state to anyone streaming them (orders.live).
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+    keys = [tracking_cache_key(order_id) for order_id in order_ids]
+
+    def after_commit():
+        cache.delete_many(keys)
+        publish_tracking(order_ids)
+
+    transaction.on_commit(after_commit)
@@ -4,6 +4,10 @@ from . import views
 urlpatterns = [
     path('place/', views.place_order, name='place-order'),
     path('<int:order_id>/', views.view_order, name='view-order'),
+    path('<int:order_id>/track/', views.track_order, name='track-order'),
+    path('<int:order_id>/events/', views.order_events, name='order-events'),
+    path('events/', views.my_order_events, name='my-order-events'),
+    path('events/ticket/', views.order_events_ticket, name='order-events-ticket'),
     path('history/', views.order_history, name='order-history'),
     path('<int:order_id>/cancel/', views.cancel_order, name='cancel-order'),
     path('<int:order_id>/refund/', views.request_refund, name='request-refund'),
@@ -12,4 +16,5 @@ urlpatterns = [
     
     path('admin/list/', views.admin_list_orders, name='admin-list-orders'),
     path('admin/<int:order_id>/status/', views.admin_update_order_status, name='admin-update-order-status'),
+    path('admin/refunds/process/', views.admin_process_refunds, name='admin-process-refunds'),
 ]
@@ -1,33 +1,77 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, throttle_classes
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
 from rest_framework import status
+from datetime import datetime, time, timedelta
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.db import transaction
 from django.contrib.contenttypes.models import ContentType
 
-from .models import Order, OrderItem, RefundRequest
-from .serializers import OrderSerializer, CreateOrderItemSerializer, RefundRequestSerializer
+from .models import ArchivedOrder, Order, RefundRequest
+from .serializers import (
+    ArchivedOrderSerializer, ArchivedOrderSummarySerializer, OrderSerializer, OrderSummarySerializer,
+    CreateOrderItemSerializer, RefundRequestSerializer, order_serializer_context,
+)
+from .pagination import InvalidCursor, keyset_paginate, keyset_paginate_merged
+from .exports import stream_csv, stream_ndjson
+from .invoices import build_invoice_data, schedule_pdf_render
+from .renderers import PDFRenderer
+from .live import event_stream, get_broker, issue_stream_ticket, order_channel, redeem_stream_ticket, user_channel
+from .tracking import get_tracking, tracking_json
+from .idempotency import idempotent
+from .services import (
+    REFUND_DECISIONS, InvalidTransition, OrderPlacementError, cancel_orders, place_order_items,
+    process_refund_requests, transition_order,
+)
 from product.models import ClothingProduct
-from cart.models import Cart, CartItem
+from users.authentication import CachedJWTAuthentication
+from cart.models import Cart
 
 
-def calculate_loyalty_points(amount):
-    """Calculate loyalty points: 1 point per 10 currency units."""
-    try:
-        pts = int(float(amount) // 10)
-        return max(pts, 0)
-    except (ValueError, TypeError):
-        return 0
+def _order_detail_queryset(orders=None):
+    """Orders with payment, items and item products loaded in a fixed number of queries."""
+    if orders is None:
+        orders = Order.objects.all()
+    return orders.select_related('payment_record').prefetch_related('items__product')
+
+
+def _serialize_orders(orders, context, summary=False):
+    """Serialize a page that may mix live and archived orders, keeping its order."""
+    if summary:
+        live, archived = OrderSummarySerializer, ArchivedOrderSummarySerializer
+    else:
+        live, archived = OrderSerializer, ArchivedOrderSerializer
+    return [
+        (archived if isinstance(order, ArchivedOrder) else live)(order, context=context).data
+        for order in orders
+    ]
+
+
+def _is_truthy(value):
+    return str(value).lower() in ('1', 'true', 'yes')
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('orders.place')
 @transaction.atomic
 def place_order(request):
     """
     POST /api/orders/place/
     Place an order from cart or custom items.
+    Send an `Idempotency-Key` header to make retries safe: a replay returns the
+    original response instead of placing a second order.
     
     Option A: From cart (default)
     Body: { "use_cart": true, "shipping_address": "..." }
@@ -49,108 +93,45 @@ def place_order(request):
         # Get items from cart or from request body
         if use_cart:
             cart, _ = Cart.objects.get_or_create(user=user)
-            cart_items = cart.items.all()
-            if not cart_items.exists():
-                return Response(
-                    {'error': 'Cart is empty. Add items before placing order.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            # Extract product info from GenericForeignKey
-            for ci in cart_items:
-                try:
-                    product = ci.product
-                    if product:
-                        items_input.append({
-                            'product_id': product.id,
-                            'quantity': ci.quantity
-                        })
-                except Exception:
-                    # Product type no longer exists, skip
-                    pass
-
+            # Read product ids straight off the cart rows instead of resolving each GenericForeignKey
+            content_type = ContentType.objects.get_for_model(ClothingProduct)
+            items_input = list(
+                cart.items.filter(content_type=content_type).values_list('object_id', 'quantity')
+            )
             if not items_input:
                 return Response(
-                    {'error': 'No valid products found in cart.'},
+                    {'error': 'Cart is empty. Add items before placing order.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
         else:
-            items_input = request.data.get('items', [])
-            if not items_input:
+            raw_items = request.data.get('items', [])
+            if not raw_items:
                 return Response(
                     {'error': 'No items provided.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-        # Validate and collect items
-        validated_items = []
-        for item_data in items_input:
             # Validate item structure
-            serializer = CreateOrderItemSerializer(data=item_data)
+            serializer = CreateOrderItemSerializer(data=raw_items, many=True)
             if not serializer.is_valid():
                 return Response(
                     {'error': 'Invalid item data', 'details': serializer.errors},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            items_input = [(data['product_id'], data['quantity']) for data in serializer.validated_data]
 
-            data = serializer.validated_data
-            product_id = data['product_id']
-            qty = data['quantity']
-
-            # Get product
-            try:
-                product = ClothingProduct.objects.get(id=product_id)
-            except ClothingProduct.DoesNotExist:
-                return Response(
-                    {'error': f'Product with id {product_id} not found'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-
-            # Check stock
-            if product.stock < qty:
-                return Response(
-                    {'error': f'Not enough stock for {product.name}. Available: {product.stock}, Requested: {qty}'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            validated_items.append((product, qty))
-
-        # Create order
-        order = Order.objects.create(
-            user=user,
-            shipping_address=shipping_address,
-            status='pending'
-        )
-
-        # Create order items and decrement stock
-        total_amount = 0
-        content_type = ContentType.objects.get_for_model(ClothingProduct)
-
-        for product, qty in validated_items:
-            order_item = OrderItem.objects.create(
-                order=order,
-                content_type=content_type,
-                object_id=product.id,
-                product_name=product.name,
-                price_at_purchase=product.price,
-                quantity=qty
-            )
-            subtotal = order_item.calculate_subtotal()
-            total_amount += subtotal
-
-            # Decrement product stock
-            product.stock = max(0, product.stock - qty)
-            product.save(update_fields=['stock'])
-
-        # Calculate loyalty points and save order
-        order.total_amount = total_amount
-        order.loyalty_points_earned = calculate_loyalty_points(total_amount)
-        order.save(update_fields=['total_amount', 'loyalty_points_earned'])
+        try:
+            # Products deleted since they were added to the cart are skipped, as before
+            order = place_order_items(user, items_input, shipping_address, skip_missing=use_cart)
+        except OrderPlacementError as e:
+            return Response({'error': e.message}, status=e.status_code)
 
         # Clear cart if order was from cart
         if use_cart:
             cart.items.all().delete()
 
-        serializer = OrderSerializer(order, context={'request': request})
+        order = _order_detail_queryset().get(pk=order.pk)
+        serializer = OrderSerializer(order, context=order_serializer_context(request, [order]))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     except Exception as e:
@@ -166,10 +147,16 @@ def view_order(request, order_id):
     """
     GET /api/orders/<order_id>/
     View a specific order (public access - anyone can track order by ID).
+    Orders moved out by `manage.py archive_orders` are served from the archive.
     """
     try:
-        order = get_object_or_404(Order, id=order_id)
-        serializer = OrderSerializer(order, context={'request': request})
+        order = _order_detail_queryset().filter(id=order_id).first()
+        serializer_class = OrderSerializer
+        if order is None:
+            archived = ArchivedOrder.objects.prefetch_related('items__product')
+            order = get_object_or_404(archived, id=order_id)
+            serializer_class = ArchivedOrderSerializer
+        serializer = serializer_class(order, context=order_serializer_context(request, [order]))
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Exception as e:
         return Response(
@@ -178,17 +165,170 @@ def view_order(request, order_id):
         )
 
 
+class OrderTrackingThrottle(SimpleRateThrottle):
+    """
+    Public tracking requests per client IP (rate 'order_tracking'), shared by
+    /track/ and the /events/ streams.
+    """
+    scope = 'order_tracking'
+
+    def get_rate(self):
+        # Read at call time (not import time) so override_settings applies
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+@api_view(['GET'])
+@permission_classes([])  # Public, like view_order
+@throttle_classes([OrderTrackingThrottle])
+def track_order(request, order_id):
+    """
+    GET /api/orders/<order_id>/track/
+    Lightweight public tracking: status, track status, payment status and timestamps.
+    Served from a per-order cache that status changes invalidate; rate-limited per client
+    (REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['order_tracking']).
+    """
+    data = get_tracking(order_id)
+    if data is None:
+        return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(data, status=status.HTTP_200_OK)
+
+
+def _sse_response(subscription, initial=None):
+    response = StreamingHttpResponse(event_stream(subscription, initial), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx holding events back
+    return response
+
+
+def _throttled(request):
+    """A 429 response if the client is over the order_tracking rate, else None."""
+    throttle = OrderTrackingThrottle()
+    if throttle.allow_request(request, None):
+        return None
+    response = JsonResponse(
+        {'error': 'Too many requests', 'detail': 'Order tracking is rate-limited. Retry later.'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+    wait = throttle.wait()
+    if wait is not None:
+        response['Retry-After'] = str(int(wait) + 1)
+    return response
+
+
+def _needs_asgi():
+    # Under WSGI the async stream would be buffered whole, i.e. never sent
+    return JsonResponse(
+        {'error': 'Live updates need the ASGI server (backend.asgi:application).'},
+        status=status.HTTP_501_NOT_IMPLEMENTED,
+    )
+
+
+@require_GET
+async def order_events(request, order_id):
+    """
+    GET /api/orders/<order_id>/events/
+    Server-sent events carrying the order's tracking data (the /track/ payload):
+    the current state first, then a new `order` event each time its status or
+    payment status changes. Public and rate-limited like track_order; each
+    connection counts as one request. Replaces polling the order.
+    """
+    if not isinstance(request, ASGIRequest):
+        return _needs_asgi()
+    throttled = await sync_to_async(_throttled)(request)
+    if throttled is not None:
+        return throttled
+    # Subscribe before reading the current state so no change is missed in between
+    subscription = get_broker().subscribe(order_channel(order_id))
+    try:
+        data = await sync_to_async(get_tracking)(order_id)
+    except Exception:
+        subscription.close()
+        raise
+    if data is None:
+        subscription.close()
+        return JsonResponse({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    return _sse_response(subscription, tracking_json(data))
+
+
+@require_GET
+async def my_order_events(request):
+    """
+    GET /api/orders/events/
+    Server-sent events for all of the authenticated user's orders: an `order`
+    event with the tracking data of whichever order changed.
+
+    EventSource cannot send headers, so instead of the Authorization header
+    the stream may be opened with ?ticket=<ticket> from
+    POST /api/orders/events/ticket/. Tickets work once and expire after
+    LIVE_UPDATES_TICKET_TTL seconds; reconnecting needs a new one.
+    """
+    if not isinstance(request, ASGIRequest):
+        return _needs_asgi()
+    auth = CachedJWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if raw_token:
+        try:
+            user = await sync_to_async(auth.get_user)(auth.get_validated_token(raw_token))
+        except (InvalidToken, AuthenticationFailed) as e:
+            return JsonResponse({'error': 'Invalid token', 'detail': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+        user_id = user.pk
+    elif request.GET.get('ticket'):
+        user_id = await sync_to_async(redeem_stream_ticket)(request.GET['ticket'])
+        if user_id is None:
+            return JsonResponse({'error': 'Invalid or expired stream ticket.'}, status=status.HTTP_401_UNAUTHORIZED)
+    else:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    return _sse_response(get_broker().subscribe(user_channel(user_id)))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def order_events_ticket(request):
+    """
+    POST /api/orders/events/ticket/
+    A single-use ticket for opening GET /api/orders/events/?ticket=<ticket>,
+    so the access token never goes in a URL (and so into access logs).
+    Response: { "ticket": "...", "expires_in": <seconds> }
+    """
+    return Response(
+        {'ticket': issue_stream_ticket(request.user.pk), 'expires_in': getattr(settings, 'LIVE_UPDATES_TICKET_TTL', 30)},
+        status=status.HTTP_201_CREATED
+    )
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def order_history(request):
     """
     GET /api/orders/history/
-    Get all orders for the authenticated user, ordered by date (newest first).
+    Get the authenticated user's orders, newest first, one page at a time.
+
+    Query params:
+      cursor     - `next_cursor` from the previous page
+      page_size  - orders per page (default 20, max 100)
+      summary    - "true" to omit item detail and return an `item_count` instead
+
+    Response: { "results": [...], "next_cursor": "..." | null }
     """
     try:
-        orders = Order.objects.filter(user=request.user).order_by('-order_date')
-        serializer = OrderSerializer(orders, many=True, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Archived orders are merged in, so history covers everything ever placed
+        if _is_truthy(request.query_params.get('summary')):
+            orders = Order.objects.filter(user=request.user).select_related('payment_record')
+            archived = ArchivedOrder.objects.filter(user=request.user)
+            page, next_cursor = keyset_paginate_merged([orders, archived], request)
+            results = _serialize_orders(page, {'request': request}, summary=True)
+        else:
+            orders = _order_detail_queryset().filter(user=request.user)
+            archived = ArchivedOrder.objects.filter(user=request.user).prefetch_related('items__product')
+            page, next_cursor = keyset_paginate_merged([orders, archived], request)
+            results = _serialize_orders(page, order_serializer_context(request, page))
+        return Response({'results': results, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response(
             {'error': 'Failed to retrieve order history', 'detail': str(e)},
@@ -202,28 +342,20 @@ def order_history(request):
 def cancel_order(request, order_id):
     """
     POST /api/orders/<order_id>/cancel/
-    Cancel an order and revert stock (only for pending/processing orders).
+    Cancel an order and revert stock (only for pending/paid/processing orders).
     """
     try:
         order = get_object_or_404(Order, id=order_id, user=request.user)
 
-        # Check if order can be cancelled
-        if order.status in ['cancelled', 'refunded', 'delivered', 'shipped']:
+        # Cancels under a row lock and restores stock in one UPDATE; a repeated or
+        # concurrent cancel finds the order already cancelled and restores nothing
+        cancelled_ids, skipped = cancel_orders([order.id], actor=request.user, note='Cancelled by customer')
+        if not cancelled_ids:
             return Response(
-                {'error': f'Cannot cancel order in {order.status} status.'},
+                {'error': f'Cannot cancel order in {skipped.get(order.id, order.status)} status.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        # Revert stock for all items
-        for item in order.items.all():
-            if item.product:
-                product = item.product
-                product.stock = product.stock + item.quantity
-                product.save(update_fields=['stock'])
-
-        # Update order status
         order.status = 'cancelled'
-        order.save(update_fields=['status'])
 
         return Response(
             {'message': 'Order cancelled successfully', 'order_id': order.id, 'status': order.status},
@@ -286,40 +418,52 @@ def request_refund(request, order_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, BrowsableAPIRenderer, PDFRenderer])
 def generate_invoice(request, order_id):
     """
     GET /api/orders/<order_id>/invoice/
-    Generate invoice data for an order in JSON format.
+    Invoice for an order as JSON, or as PDF with ?format=pdf / Accept: application/pdf.
+
+    Once payment is approved the invoice is a frozen snapshot served with an ETag
+    (send If-None-Match to get a 304). Before that, JSON is computed from the
+    current items and no PDF exists yet.
     """
     try:
-        order = get_object_or_404(Order, id=order_id, user=request.user)
-        order.calculate_total()  # Ensure total is accurate
-
-        invoice = {
-            'invoice_id': f'INV-{order.id}',
-            'order_id': order.id,
-            'date': order.order_date.isoformat() if order.order_date else None,
-            'customer': {
-                'id': request.user.id,
-                'email': request.user.email,
-                'username': request.user.username,
-            },
-            'shipping_address': order.shipping_address,
-            'items': [
-                {
-                    'product_name': item.product_name,
-                    'unit_price': float(item.price_at_purchase),
-                    'quantity': item.quantity,
-                    'subtotal': float(item.calculate_subtotal())
-                }
-                for item in order.items.all()
-            ],
-            'total': float(order.total_amount),
-            'loyalty_points_earned': order.loyalty_points_earned,
-            'order_status': order.status
-        }
-
-        return Response(invoice, status=status.HTTP_200_OK)
+        order = get_object_or_404(Order.objects.select_related('user', 'invoice'), id=order_id, user=request.user)
+        invoice = getattr(order, 'invoice', None)
+        wants_pdf = request.accepted_renderer.format == 'pdf'
+
+        if invoice is None:
+            if wants_pdf:
+                return Response(
+                    {'error': 'The invoice PDF is available once payment has been approved.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            return Response(build_invoice_data(order), status=status.HTTP_200_OK)
+
+        if wants_pdf:
+            if not invoice.pdf:
+                schedule_pdf_render(invoice.pk)
+                return Response(
+                    {'status': 'rendering', 'detail': 'The invoice PDF is being generated. Retry shortly.'},
+                    status=status.HTTP_202_ACCEPTED
+                )
+            etag = f'"{invoice.pdf_hash}"'
+        else:
+            etag = f'"{invoice.content_hash}"'
+
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        if wants_pdf:
+            with invoice.pdf.open('rb') as pdf_file:
+                response = Response(pdf_file.read(), status=status.HTTP_200_OK)
+            response['Content-Disposition'] = f'inline; filename="{invoice.invoice_number}.pdf"'
+        else:
+            response = Response(invoice.data, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=3600'
+        return response
 
     except Exception as e:
         return Response(
@@ -330,17 +474,64 @@ def generate_invoice(request, order_id):
 
 # ============ Admin Endpoints ============
 
+def _filter_orders(orders, params):
+    """
+    Apply ?status=, ?date_from= and ?date_to= (YYYY-MM-DD, inclusive) filters.
+    Dates are turned into a datetime range so the order_date index can be used.
+    Raises ValueError for an unknown status or malformed date.
+    """
+    order_status = params.get('status')
+    if order_status:
+        if order_status not in dict(Order.STATUS_CHOICES):
+            raise ValueError(f'Invalid status. Valid options: {", ".join(dict(Order.STATUS_CHOICES))}')
+        orders = orders.filter(status=order_status)
+
+    for param, lookup, offset in (('date_from', 'order_date__gte', 0), ('date_to', 'order_date__lt', 1)):
+        value = params.get(param)
+        if not value:
+            continue
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{param} must be a date in YYYY-MM-DD format.')
+        start = timezone.make_aware(datetime.combine(day + timedelta(days=offset), time.min))
+        orders = orders.filter(**{lookup: start})
+    return orders
+
+
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def admin_list_orders(request):
     """
     GET /api/orders/admin/list/
-    Admin endpoint to list all orders (admin only).
+    Admin endpoint to list orders (admin only), newest first.
+
+    Query params:
+      status, date_from, date_to  - filters (dates are YYYY-MM-DD, inclusive)
+      cursor, page_size           - keyset pagination, see order_history
+      export=ndjson|csv           - stream every matching order instead of one page
     """
     try:
-        orders = Order.objects.all().order_by('-order_date')
-        serializer = OrderSerializer(orders, many=True, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        orders = _filter_orders(Order.objects.all(), request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    export = request.query_params.get('export')
+    if export:
+        if export == 'ndjson':
+            response = StreamingHttpResponse(stream_ndjson(orders), content_type='application/x-ndjson')
+        elif export == 'csv':
+            response = StreamingHttpResponse(stream_csv(orders), content_type='text/csv')
+        else:
+            return Response({'error': 'export must be ndjson or csv.'}, status=status.HTTP_400_BAD_REQUEST)
+        response['Content-Disposition'] = f'attachment; filename="orders.{export}"'
+        return response
+
+    try:
+        page, next_cursor = keyset_paginate(_order_detail_queryset(orders), request)
+        serializer = OrderSerializer(page, many=True, context=order_serializer_context(request, page))
+        return Response({'results': serializer.data, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response(
             {'error': 'Failed to retrieve orders', 'detail': str(e)},
@@ -354,11 +545,13 @@ def admin_list_orders(request):
 def admin_update_order_status(request, order_id):
     """
     POST /api/orders/admin/<order_id>/status/
-    Admin endpoint to update order status.
+    Admin endpoint to update order status. Only moves allowed by
+    orders.services.ORDER_TRANSITIONS are accepted.
     
     Body:
     {
-      "status": "pending|paid|processing|shipped|delivered|cancelled|refunded"
+      "status": "pending|paid|processing|shipped|delivered|cancelled|refunded",
+      "note": "optional, stored on the order event"
     }
     """
     try:
@@ -371,17 +564,12 @@ def admin_update_order_status(request, order_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Validate status
-        valid_statuses = dict(Order.STATUS_CHOICES).keys()
-        if new_status not in valid_statuses:
-            return Response(
-                {'error': f'Invalid status. Valid options: {", ".join(valid_statuses)}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
+        # Validate the move against the order state table
         old_status = order.status
-        order.status = new_status
-        order.save(update_fields=['status'])
+        try:
+            transition_order(order, new_status, actor=request.user, note=request.data.get('note', ''))
+        except InvalidTransition as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(
             {
@@ -397,3 +585,50 @@ def admin_update_order_status(request, order_id):
             {'error': 'Failed to update order status', 'detail': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def admin_process_refunds(request):
+    """
+    POST /api/orders/admin/refunds/process/
+    Approve or reject many refund requests at once. Approved requests refund their
+    order, restore its stock and revoke its loyalty points; see
+    orders.services.process_refund_requests().
+
+    Body:
+    {
+      "refund_ids": [1, 2, 3],
+      "decision": "approve|reject",
+      "note": "optional, stored on the requests and order events"
+    }
+
+    Response: { "refunded": n, "rejected": n, "skipped": n, "results": [{"id", "outcome", "detail"}, ...] }
+    """
+    try:
+        decision = request.data.get('decision', '')
+        if decision not in REFUND_DECISIONS:
+            return Response(
+                {'error': f'decision must be one of: {", ".join(REFUND_DECISIONS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        refund_ids = request.data.get('refund_ids')
+        if not isinstance(refund_ids, list) or not refund_ids:
+            return Response({'error': 'refund_ids must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            refund_ids = [int(refund_id) for refund_id in refund_ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'refund_ids must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = process_refund_requests(
+            refund_ids, decision, actor=request.user, note=str(request.data.get('note', '')).strip()
+        )
+        summary = {outcome: 0 for outcome in ('refunded', 'rejected', 'skipped')}
+        for result in results:
+            summary[result['outcome']] += 1
+        return Response({**summary, 'results': results}, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to process refund requests', 'detail': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -1,46 +1,89 @@
 # payments/admin.py
-from django.contrib import admin
-from django.utils.html import format_html
+from django.contrib import admin, messages
+from django.utils.html import format_html, format_html_join
 from django.shortcuts import redirect
-from django.urls import path
+from django.urls import path, reverse
 from django.http import HttpResponseRedirect
 from .models import Payment
+from .phash import find_similar
+from .queue import ClaimConflict
+from .services import review_payments
+from orders.models import ArchivedOrder
+
+def _review_selected(modeladmin, request, queryset, decision):
+    try:
+        reviewed, skipped = review_payments(list(queryset.values_list('pk', flat=True)), decision, actor=request.user)
+    except ClaimConflict as e:
+        return 0, [f"#{pk}: claimed by another reviewer" for pk in e.payment_ids]
+    failed = [f"#{pk}: order is {order_status}" for pk, order_status in sorted(skipped.items())]
+    return len(reviewed), failed
+
 
 def approve_payment(modeladmin, request, queryset):
-    """Admin action to approve selected payments and update order status"""
-    for payment in queryset:
-        payment.status = 'approved'
-        payment.save()
-        # Update order status to 'paid'
-        payment.order.status = 'paid'
-        payment.order.save(update_fields=['status'])
-    modeladmin.message_user(request, f"{queryset.count()} payment(s) approved. Order status updated to 'paid'.")
+    """Admin action to approve selected payments and mark their orders paid"""
+    done, failed = _review_selected(modeladmin, request, queryset, 'approved')
+    modeladmin.message_user(request, f"{done} payment(s) approved. Order status updated to 'paid'.")
+    if failed:
+        modeladmin.message_user(request, "Skipped " + "; ".join(failed), level=messages.WARNING)
 
 approve_payment.short_description = "✓ Approve selected payments"
 
 
 def reject_payment(modeladmin, request, queryset):
-    """Admin action to reject selected payments and update order status"""
-    for payment in queryset:
-        payment.status = 'rejected'
-        payment.save()
-        # Update order status to 'cancelled'
-        payment.order.status = 'cancelled'
-        payment.order.save(update_fields=['status'])
-    modeladmin.message_user(request, f"{queryset.count()} payment(s) rejected. Order status updated to 'cancelled'.")
+    """Admin action to reject selected payments and cancel their orders"""
+    done, failed = _review_selected(modeladmin, request, queryset, 'rejected')
+    modeladmin.message_user(request, f"{done} payment(s) rejected. Order status updated to 'cancelled'.")
+    if failed:
+        modeladmin.message_user(request, "Skipped " + "; ".join(failed), level=messages.WARNING)
 
 reject_payment.short_description = "✗ Reject selected payments"
 
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
-    list_display = ('id', 'order', 'user', 'status', 'uploaded_at', 'screenshot_preview', 'action_buttons')
-    list_filter = ('status', 'uploaded_at')
+    list_display = ('id', 'order', 'user', 'status', 'uploaded_at', 'screenshot_thumb', 'screenshot_reused', 'action_buttons')
+    list_filter = ('status', 'screenshot_status', 'screenshot_reused', 'uploaded_at')
     search_fields = ('order__id', 'user__email', 'status')
-    readonly_fields = ('id', 'user', 'uploaded_at', 'screenshot_preview')
-    fields = ('id', 'order', 'user', 'screenshot', 'screenshot_preview', 'status', 'uploaded_at')
+    list_select_related = ('order', 'user')
+    readonly_fields = ('id', 'user', 'uploaded_at', 'screenshot_preview', 'screenshot_status', 'screenshot_error', 'screenshot_matches', 'claimed_by', 'claimed_at')
+    fields = ('id', 'order', 'user', 'screenshot', 'screenshot_preview', 'screenshot_status', 'screenshot_error', 'screenshot_matches', 'status', 'uploaded_at')
     actions = [approve_payment, reject_payment]
 
+    def screenshot_thumb(self, obj):
+        # List rows only ever load the small thumbnail; the full image is one click away
+        if obj.screenshot_thumbnail:
+            return format_html(
+                '<a href="{}" target="_blank"><img src="{}" style="max-width: 120px; max-height: 120px;" loading="lazy" /></a>',
+                obj.screenshot.url, obj.screenshot_thumbnail.url
+            )
+        if obj.screenshot:
+            label = 'Invalid image' if obj.screenshot_status == 'invalid' else 'Processing...'
+            return format_html('<a href="{}" target="_blank">{}</a>', obj.screenshot.url, label)
+        return 'No screenshot'
+    screenshot_thumb.short_description = 'Screenshot'
+
+    def screenshot_matches(self, obj):
+        # Other payments whose screenshot is (nearly) the same image
+        if not obj.screenshot_dhash:
+            return 'Not hashed yet'
+        value = int(obj.screenshot_dhash, 16)
+        matches = find_similar(Payment.objects.select_related('user', 'order'), value, exclude_pk=obj.pk)
+        archived = find_similar(ArchivedOrder.objects.select_related('user'), value)
+        if not matches and not archived:
+            return 'No matching screenshots'
+        return format_html(
+            '<ul>{}{}</ul>',
+            format_html_join('', '<li><a href="{}">Payment #{}</a> for order #{} by {} ({}, distance {})</li>', (
+                (reverse('admin:payments_payment_change', args=[match.pk]), match.pk, match.order_id, match.user, match.status, distance)
+                for match, distance in matches
+            )),
+            format_html_join('', '<li><a href="{}">Archived order #{}</a> by {} ({}, distance {})</li>', (
+                (reverse('admin:orders_archivedorder_change', args=[order.pk]), order.pk, order.user, order.payment_status, distance)
+                for order, distance in archived
+            )),
+        )
+    screenshot_matches.short_description = 'Matching screenshots'
+
     def screenshot_preview(self, obj):
         if obj.screenshot:
             return format_html(
@@ -0,0 +1,105 @@
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from orders.models import ArchivedOrder
+from payments.models import Payment
+from payments.phash import CHUNK_FIELDS, chunks, dhash_file, hamming, hash_fields, max_distance
+
+
+def _source(name):
+    """A filesystem path the pool can open itself, or else the file's bytes."""
+    try:
+        return default_storage.path(name)
+    except NotImplementedError:
+        with default_storage.open(name, 'rb') as f:
+            return io.BytesIO(f.read())
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute perceptual hashes for payment screenshots (including archived orders\') in a process pool, '
+        'then re-flag reused screenshots.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Hashing processes (default: CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Payments hashed and saved per batch')
+        parser.add_argument('--rehash', action='store_true', help='Recompute hashes that already exist')
+
+    def handle(self, *args, **options):
+        payments = Payment.objects.exclude(screenshot='').order_by('pk')
+        # Orders archived before their payment's hashes were kept; their screenshot files remain
+        archived = ArchivedOrder.objects.exclude(payment_screenshot='').order_by('pk')
+        if not options['rehash']:
+            payments = payments.filter(screenshot_dhash='')
+            archived = archived.filter(screenshot_dhash='')
+
+        self.hashed = self.unreadable = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            self.hash_rows(pool, payments, 'screenshot', lambda payment: payment.screenshot.name, options['chunk_size'])
+            self.hash_rows(pool, archived, 'payment_screenshot', lambda order: order.payment_screenshot, options['chunk_size'])
+
+        reused = self.reflag_reuse()
+        self.stdout.write(self.style.SUCCESS(
+            f'Hashed {self.hashed} screenshot(s), {self.unreadable} unreadable; {reused} payment(s) flagged as reused.'
+        ))
+
+    def hash_rows(self, pool, queryset, file_field, file_name, chunk_size):
+        model_name = queryset.model._meta.verbose_name
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).only('pk', file_field)[:chunk_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            sources = []
+            for row in batch:
+                try:
+                    sources.append(_source(file_name(row)))
+                except OSError:
+                    sources.append(None)
+            values = pool.map(dhash_file, sources, chunksize=16)
+            for row, value in zip(batch, values):
+                for field, field_value in hash_fields(value).items():
+                    setattr(row, field, field_value)
+                if value is None:
+                    self.unreadable += 1
+                else:
+                    self.hashed += 1
+            queryset.model.objects.bulk_update(batch, list(hash_fields(0)))
+            self.stdout.write(f'Hashed up to {model_name} #{last_pk}')
+
+    def reflag_reuse(self):
+        """
+        Recompute screenshot_reused for every hashed payment with an in-memory chunk
+        index. Archived orders' screenshots are indexed too, so reusing one counts.
+        """
+        values = {}
+        for kind, model in (('payment', Payment), ('archived', ArchivedOrder)):
+            for pk, hex_value in model.objects.exclude(screenshot_dhash='').values_list('pk', 'screenshot_dhash'):
+                values[kind, pk] = int(hex_value, 16)
+        index = [{} for _ in CHUNK_FIELDS]
+        for key, value in values.items():
+            for position, chunk in enumerate(chunks(value)):
+                index[position].setdefault(chunk, []).append(key)
+
+        limit = max_distance()
+        reused = set()
+        for key, value in values.items():
+            if key in reused:
+                continue
+            candidates = {other for position, chunk in enumerate(chunks(value)) for other in index[position][chunk]}
+            candidates.discard(key)
+            matched = [other for other in candidates if hamming(value, values[other]) <= limit]
+            if matched:
+                reused.add(key)
+                reused.update(matched)
+        # Archived orders are frozen; only live payments carry the flag
+        reused = {pk for kind, pk in reused if kind == 'payment'}
+
+        Payment.objects.filter(pk__in=reused).update(screenshot_reused=True)
+        Payment.objects.exclude(pk__in=reused).filter(screenshot_reused=True).update(screenshot_reused=False)
+        return len(reused)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from jobs.queue import enqueue
+from payments.models import Payment
+
+
+class Command(BaseCommand):
+    help = 'Queue recompression and thumbnails for payment screenshots that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--include-invalid', action='store_true', help='Also retry screenshots marked invalid')
+
+    def handle(self, *args, **options):
+        payments = Payment.objects.exclude(screenshot='').filter(screenshot_thumbnail='')
+        if not options['include_invalid']:
+            payments = payments.exclude(screenshot_status='invalid')
+        queued = 0
+        for payment_id in payments.values_list('pk', flat=True).iterator(chunk_size=500):
+            enqueue('payments.process_screenshot', {'payment_id': payment_id})
+            queued += 1
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} screenshot(s); run `manage.py run_worker` to process them.'))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        # Existing screenshots count as ready; `manage.py process_screenshots` adds their thumbnails
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('invalid', 'Invalid')], default='ready', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='screenshot_status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('invalid', 'Invalid')], default='processing', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_thumbnail',
+            field=models.ImageField(blank=True, upload_to='payments/thumbs/'),
+        ),
+    ]
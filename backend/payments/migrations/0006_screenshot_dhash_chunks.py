@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:48
+
+from django.db import migrations, models
+
+CHUNK_WIDTHS = (6,) * 9 + (5,) * 2
+
+
+def rechunk_hashes(apps, schema_editor):
+    # The stored hex hash is complete, so the new chunk layout needs no image reads
+    Payment = apps.get_model('payments', 'Payment')
+    fields = [f'screenshot_dhash_{i}' for i in range(len(CHUNK_WIDTHS))]
+    last_pk = 0
+    while True:
+        chunk = list(
+            Payment.objects.exclude(screenshot_dhash='').filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'screenshot_dhash')[:500]
+        )
+        if not chunk:
+            break
+        for payment in chunk:
+            value, shift = int(payment.screenshot_dhash, 16), 64
+            for field, width in zip(fields, CHUNK_WIDTHS):
+                shift -= width
+                setattr(payment, field, (value >> shift) & ((1 << width) - 1))
+        Payment.objects.bulk_update(chunk, fields)
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_review_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_dhash_10',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_dhash_4',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_dhash_5',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_dhash_6',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_dhash_7',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_dhash_8',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='screenshot_dhash_9',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(rechunk_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:00
+
+from django.db import migrations
+
+CHUNK_WIDTHS = (16,) * 4
+
+
+def rechunk_hashes(apps, schema_editor):
+    # Back to four 16-bit chunks; the stored hex hash is complete, so no image reads
+    Payment = apps.get_model('payments', 'Payment')
+    fields = [f'screenshot_dhash_{i}' for i in range(len(CHUNK_WIDTHS))]
+    last_pk = 0
+    while True:
+        chunk = list(
+            Payment.objects.exclude(screenshot_dhash='').filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'screenshot_dhash')[:500]
+        )
+        if not chunk:
+            break
+        for payment in chunk:
+            value, shift = int(payment.screenshot_dhash, 16), 64
+            for field, width in zip(fields, CHUNK_WIDTHS):
+                shift -= width
+                setattr(payment, field, (value >> shift) & ((1 << width) - 1))
+        Payment.objects.bulk_update(chunk, fields)
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_screenshot_dhash_chunks'),
+    ]
+
+    operations = [
+        migrations.RunPython(rechunk_hashes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='payment',
+            name='screenshot_dhash_10',
+        ),
+        migrations.RemoveField(
+            model_name='payment',
+            name='screenshot_dhash_4',
+        ),
+        migrations.RemoveField(
+            model_name='payment',
+            name='screenshot_dhash_5',
+        ),
+        migrations.RemoveField(
+            model_name='payment',
+            name='screenshot_dhash_6',
+        ),
+        migrations.RemoveField(
+            model_name='payment',
+            name='screenshot_dhash_7',
+        ),
+        migrations.RemoveField(
+            model_name='payment',
+            name='screenshot_dhash_8',
+        ),
+        migrations.RemoveField(
+            model_name='payment',
+            name='screenshot_dhash_9',
+        ),
+    ]
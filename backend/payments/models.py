@@ -3,6 +3,12 @@ from django.conf import settings
 
 
 class Payment(models.Model):
+    SCREENSHOT_STATUS_CHOICES = (
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('invalid', 'Invalid'),
+    )
+
     order = models.OneToOneField(
         'orders.Order',
         on_delete=models.CASCADE,
@@ -10,8 +16,35 @@ class Payment(models.Model):
     )
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     screenshot = models.ImageField(upload_to='payments/')
+    # Filled in by payments.screenshots.process_screenshot() in the job worker
+    screenshot_thumbnail = models.ImageField(upload_to='payments/thumbs/', blank=True)
+    screenshot_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    screenshot_status = models.CharField(max_length=20, choices=SCREENSHOT_STATUS_CHOICES, default='processing')
+    screenshot_error = models.CharField(max_length=255, blank=True)
+    # Perceptual hash (payments.phash): full value in hex, plus its four 16-bit
+    # chunks, each indexed, for near-duplicate lookups
+    screenshot_dhash = models.CharField(max_length=16, blank=True, db_index=True)
+    screenshot_dhash_0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    screenshot_dhash_1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    screenshot_dhash_2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    screenshot_dhash_3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    # Set when another payment has a matching screenshot
+    screenshot_reused = models.BooleanField(default=False, db_index=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default='pending')
+    # Review queue claim (payments.queue); a claim older than PAYMENT_CLAIM_TTL lapses
+    claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['uploaded_at', 'id'], name='payment_review_queue_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
 
     def __str__(self):
         return f"Payment for Order {self.order.id} - {self.status}"
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.db.models import Q
+from PIL import Image
+
+HASH_BITS = 64
+# Four 16-bit chunks: each indexed equality matches ~1/65536 of random hashes, so
+# the candidate set stays tiny, at the price of capping max_distance() at 3.
+# More, narrower chunks raise the cap but match so many rows that the lookup
+# degrades into a scan; a larger threshold needs a different index (e.g. a BK-tree).
+CHUNKS = 4
+CHUNK_WIDTHS = tuple(HASH_BITS // CHUNKS + (i < HASH_BITS % CHUNKS) for i in range(CHUNKS))
+CHUNK_FIELDS = tuple(f'screenshot_dhash_{i}' for i in range(CHUNKS))
+
+
+def max_distance():
+    """
+    Hamming distance up to which two screenshots count as the same image. Must stay
+    below CHUNKS: the chunk lookup in find_similar() only guarantees to find every
+    hash that differs in fewer bits than there are chunks.
+    """
+    return min(getattr(settings, 'PAYMENT_SCREENSHOT_DUPLICATE_DISTANCE', 3), CHUNKS - 1)
+
+
+def dhash(image):
+    """64-bit difference hash: is each pixel brighter than its right neighbour on a 9x8 grayscale thumbnail."""
+    small = image.convert('L').resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def dhash_file(path_or_file):
+    """dhash() of an image file; None if it cannot be read. Top-level so a process pool can run it."""
+    try:
+        with Image.open(path_or_file) as image:
+            image.draft('L', (64, 64))  # JPEGs decode at reduced size, which is all a 9x8 hash needs
+            return dhash(image)
+    except Exception:
+        return None
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def to_hex(value):
+    return f'{value:016x}'
+
+
+def chunks(value):
+    """Split a hash into CHUNKS integers of CHUNK_WIDTHS bits, most significant first."""
+    result = []
+    shift = HASH_BITS
+    for width in CHUNK_WIDTHS:
+        shift -= width
+        result.append((value >> shift) & ((1 << width) - 1))
+    return result
+
+
+def hash_fields(value):
+    """Model field values for a hash (or None to clear it)."""
+    if value is None:
+        return {'screenshot_dhash': '', **{field: None for field in CHUNK_FIELDS}}
+    return {'screenshot_dhash': to_hex(value), **dict(zip(CHUNK_FIELDS, chunks(value)))}
+
+
+def find_similar(queryset, value, exclude_pk=None):
+    """
+    Rows of `queryset` whose screenshot hash is within max_distance() of `value`,
+    as [(payment, distance)] closest first.
+
+    Multi-index hashing: a hash that differs in at most CHUNKS-1 bits must match
+    at least one of its chunks exactly (pigeonhole), so one indexed
+    OR-of-equalities query returns a small candidate set that is then checked
+    exactly, instead of comparing against every stored hash.
+    """
+    condition = Q()
+    for field, chunk in zip(CHUNK_FIELDS, chunks(value)):
+        condition |= Q(**{field: chunk})
+    candidates = queryset.filter(condition)
+    if exclude_pk is not None:
+        candidates = candidates.exclude(pk=exclude_pk)
+    limit = max_distance()
+    matches = []
+    for payment in candidates:
+        distance = hamming(value, int(payment.screenshot_dhash, 16))
+        if distance <= limit:
+            matches.append((payment, distance))
+    matches.sort(key=lambda match: (match[1], match[0].pk))
+    return matches
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Payment
+from .phash import CHUNK_FIELDS
+
+QUEUE_ORDERING = ('uploaded_at', 'id')
+
+
+class ClaimConflict(Exception):
+    """Raised (before anything changes) for payment ids the reviewer may not act on."""
+
+    def __init__(self, payment_ids, message):
+        super().__init__(message)
+        self.payment_ids = sorted(payment_ids)
+        self.message = message
+
+
+def claim_ttl():
+    return getattr(settings, 'PAYMENT_CLAIM_TTL', timedelta(minutes=15))
+
+
+def claim_is_open():
+    """Q for payments nobody holds a live claim on."""
+    return Q(claimed_by__isnull=True) | Q(claimed_at__lt=timezone.now() - claim_ttl())
+
+
+def held_by_others(payments, reviewer):
+    """Ids among `payments` under another reviewer's live claim."""
+    expired = timezone.now() - claim_ttl()
+    return [
+        payment.pk for payment in payments
+        if payment.claimed_by_id not in (None, reviewer.pk) and payment.claimed_at >= expired
+    ]
+
+
+def review_queue():
+    """
+    Pending payments with everything a queue row shows, in one query: the order
+    and customer via joins, copied onto the row as annotations.
+    """
+    return (
+        Payment.objects.filter(status='pending')
+        .select_related('claimed_by')
+        .annotate(
+            order_total=F('order__total_amount'),
+            item_count=F('order__item_count'),
+            customer_email=F('user__email'),
+        )
+        .defer('screenshot_hash', 'screenshot_error', 'screenshot_dhash', *CHUNK_FIELDS)
+    )
+
+
+def claim_payments(reviewer, count):
+    """
+    Claim up to `count` of the oldest unclaimed pending payments for `reviewer`.
+    SKIP LOCKED means two reviewers claiming at once get different payments
+    rather than waiting on (or double-claiming) the same rows. Returns their ids.
+    """
+    with transaction.atomic():
+        ids = list(
+            Payment.objects.select_for_update(skip_locked=True)
+            .filter(claim_is_open(), status='pending')
+            .order_by(*QUEUE_ORDERING)
+            .values_list('pk', flat=True)[:count]
+        )
+        if ids:
+            # Re-checking the claim condition keeps this safe on backends without row locks
+            claimed = Payment.objects.filter(claim_is_open(), pk__in=ids, status='pending')
+            claimed.update(claimed_by=reviewer, claimed_at=timezone.now())
+    return list(Payment.objects.filter(pk__in=ids, claimed_by=reviewer).values_list('pk', flat=True))
+
+
+def release_payments(reviewer, payment_ids=None):
+    """
+    Give back the reviewer's claims (all of them, or just `payment_ids`). Returns
+    the number released. Raises ClaimConflict, releasing nothing, if any of
+    `payment_ids` is not claimed by `reviewer`.
+    """
+    with transaction.atomic():
+        claims = Payment.objects.select_for_update().filter(claimed_by=reviewer)
+        if payment_ids is not None:
+            claims = claims.filter(pk__in=payment_ids)
+            not_held = set(payment_ids) - set(claims.values_list('pk', flat=True))
+            if not_held:
+                raise ClaimConflict(not_held, 'You do not hold a claim on these payments.')
+        return claims.update(claimed_by=None, claimed_at=None)
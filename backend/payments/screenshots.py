@@ -0,0 +1,157 @@
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Payment
+from .phash import dhash_file, find_similar, hash_fields
+from orders.models import ArchivedOrder
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF', 'BMP')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def max_upload_bytes():
+    return _setting('PAYMENT_SCREENSHOT_MAX_BYTES', 10 * 1024 * 1024)
+
+
+class SizeCappedUploadHandler(FileUploadHandler):
+    """
+    Counts uploaded bytes as they stream in and stops the upload once it passes
+    PAYMENT_SCREENSHOT_MAX_BYTES, before the rest is written anywhere. Install it
+    ahead of TemporaryFileUploadHandler so accepted files go straight to disk.
+    The view checks request.upload_too_large afterwards.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > max_upload_bytes():
+            self.request.upload_too_large = True
+            raise StopUpload(connection_reset=False)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class InvalidScreenshot(Exception):
+    pass
+
+
+def recompress(data):
+    """
+    Verify `data` as an image and return (image_bytes, thumbnail_bytes), both
+    JPEG. The image is bounded to PAYMENT_SCREENSHOT_MAX_DIMENSION on its long
+    side; EXIF and other metadata are dropped (orientation is applied first).
+    Raises InvalidScreenshot.
+    """
+    max_pixels = _setting('PAYMENT_SCREENSHOT_MAX_PIXELS', 40_000_000)
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            if probe.format not in ALLOWED_FORMATS:
+                raise InvalidScreenshot(f'Unsupported image format: {probe.format}.')
+            if probe.width * probe.height > max_pixels:
+                raise InvalidScreenshot('Image dimensions are too large.')
+            probe.verify()
+        # verify() leaves the image unusable, so decode from a fresh handle
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGB')
+    except InvalidScreenshot:
+        raise
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise InvalidScreenshot(f'Not a valid image: {e}')
+
+    size = _setting('PAYMENT_SCREENSHOT_MAX_DIMENSION', 1600)
+    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    # A new image from raw pixels carries no metadata, so nothing from the upload survives
+    clean = Image.new('RGB', image.size)
+    clean.paste(image)
+
+    out = io.BytesIO()
+    clean.save(out, 'JPEG', quality=_setting('PAYMENT_SCREENSHOT_QUALITY', 82), optimize=True)
+
+    thumb_size = _setting('PAYMENT_SCREENSHOT_THUMBNAIL', 240)
+    clean.thumbnail((thumb_size, thumb_size), Image.Resampling.LANCZOS)
+    thumb = io.BytesIO()
+    clean.save(thumb, 'JPEG', quality=75, optimize=True)
+    return out.getvalue(), thumb.getvalue()
+
+
+def _store(name, content):
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    return name
+
+
+def process_screenshot(payment_id):
+    """
+    Replace a payment's uploaded screenshot with its recompressed version stored
+    as payments/<sha256>.jpg, plus payments/thumbs/<sha256>.jpg. Identical images
+    share one file. An unreadable upload is marked 'invalid' and kept for review.
+    """
+    payment = Payment.objects.get(pk=payment_id)
+    if payment.screenshot_status == 'ready' and payment.screenshot_thumbnail:
+        return payment
+
+    original = payment.screenshot.name
+    try:
+        with payment.screenshot.open('rb') as upload:
+            data = upload.read(max_upload_bytes() + 1)
+        if len(data) > max_upload_bytes():
+            raise InvalidScreenshot('Screenshot is too large.')
+        image_bytes, thumb_bytes = recompress(data)
+    except (InvalidScreenshot, FileNotFoundError) as e:
+        logger.warning('Payment %s screenshot rejected: %s', payment_id, e)
+        Payment.objects.filter(pk=payment_id).update(screenshot_status='invalid', screenshot_error=str(e)[:255])
+        return payment
+
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    payment.screenshot.name = _store(f'payments/{digest}.jpg', image_bytes)
+    payment.screenshot_thumbnail.name = _store(f'payments/thumbs/{digest}.jpg', thumb_bytes)
+    payment.screenshot_hash = digest
+    payment.screenshot_status = 'ready'
+    payment.screenshot_error = ''
+    perceptual = dhash_file(io.BytesIO(image_bytes))
+    for field, value in hash_fields(perceptual).items():
+        setattr(payment, field, value)
+    payment.save(update_fields=[
+        'screenshot', 'screenshot_thumbnail', 'screenshot_hash', 'screenshot_status', 'screenshot_error',
+        *hash_fields(perceptual),
+    ])
+    if original != payment.screenshot.name:
+        # Only once the new name is committed; a rolled-back job still needs the original
+        transaction.on_commit(lambda: default_storage.delete(original))
+    if perceptual is not None:
+        flag_reuse(payment, perceptual)
+    return payment
+
+
+def flag_reuse(payment, perceptual):
+    """
+    Mark `payment` and every earlier payment with a near-identical screenshot as
+    reused. Archived orders keep their payment's hashes, so a screenshot already
+    used on an archived order counts too. Returns the (payment or archived
+    order, distance) matches.
+    """
+    matches = find_similar(Payment.objects.only('pk', 'screenshot_dhash'), perceptual, exclude_pk=payment.pk)
+    archived = find_similar(ArchivedOrder.objects.only('pk', 'screenshot_dhash'), perceptual)
+    if matches or archived:
+        Payment.objects.filter(pk__in=[payment.pk] + [match.pk for match, _ in matches]).update(screenshot_reused=True)
+        payment.screenshot_reused = True
+    return matches + archived
@@ -3,7 +3,31 @@ from rest_framework import serializers
 from .models import Payment
 
 class PaymentSerializer(serializers.ModelSerializer):
+    # A plain file here: the image is verified and recompressed by the worker
+    # (payments.screenshots), not decoded inside the request
+    screenshot = serializers.FileField()
+
     class Meta:
         model = Payment
-        fields = ['id', 'order', 'user', 'screenshot', 'uploaded_at', 'status']
-        read_only_fields = ('id', 'user', 'uploaded_at')
+        fields = ['id', 'order', 'user', 'screenshot', 'screenshot_thumbnail', 'screenshot_status', 'uploaded_at', 'status']
+        read_only_fields = ('id', 'user', 'uploaded_at', 'screenshot_thumbnail', 'screenshot_status')
+
+
+class PaymentQueueSerializer(serializers.ModelSerializer):
+    """A review queue row; expects the annotations added by payments.queue.review_queue()."""
+    order_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    item_count = serializers.IntegerField(read_only=True)
+    customer_email = serializers.EmailField(read_only=True)
+    claimed_by = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Payment
+        fields = [
+            'id', 'order', 'customer_email', 'order_total', 'item_count', 'uploaded_at',
+            'screenshot', 'screenshot_thumbnail', 'screenshot_status', 'screenshot_reused',
+            'claimed_by', 'claimed_at',
+        ]
+        read_only_fields = fields
+
+    def get_claimed_by(self, obj):
+        return obj.claimed_by.email if obj.claimed_by else None
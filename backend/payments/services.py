@@ -0,0 +1,105 @@
+from django.db import transaction
+
+from .models import Payment
+from .queue import ClaimConflict, held_by_others
+from mailer.sending import queue_emails
+from orders.models import Order
+from orders.services import (
+    ORDER_TRANSITIONS, RESTOCKING_STATUSES, InvalidTransition, record_order_events, restore_stock,
+)
+from orders.tracking import invalidate_tracking
+
+# Payment decision -> (order status, order track status)
+PAYMENT_DECISIONS = {
+    'approved': ('paid', 'shipping'),
+    'rejected': ('cancelled', '-'),
+}
+
+
+def review_payments(payment_ids, decision, actor=None):
+    """
+    Approve or reject many payments in one transaction: one UPDATE for their
+    orders' status and track status, one UPDATE for the payments, plus bulk
+    order events, a stock restore for rejected (cancelled) orders and the
+    customers' status emails.
+
+    Payments and then orders are locked in primary-key order. A payment is
+    skipped when its order cannot make the move (e.g. approving a payment for a
+    cancelled order); an order already in the target status only gets its track
+    status set, like transition_order().
+
+    Returns (reviewed_ids, skipped) where skipped maps payment id -> current
+    order status.
+
+    With an `actor`, review claims (payments.queue) are enforced: if any of the
+    payments is under another reviewer's live claim, ClaimConflict is raised
+    and nothing changes. Unclaimed payments and lapsed claims are open to all.
+    """
+    order_status, track_status = PAYMENT_DECISIONS[decision]
+    with transaction.atomic():
+        payments = list(
+            Payment.objects.select_for_update().filter(pk__in=payment_ids)
+            .select_related('user').order_by('pk')
+        )
+        if actor is not None:
+            held = held_by_others(payments, actor)
+            if held:
+                raise ClaimConflict(held, 'These payments are claimed by another reviewer.')
+        orders = {
+            order.pk: order
+            for order in Order.objects.select_for_update()
+            .filter(pk__in={payment.order_id for payment in payments}).order_by('pk')
+        }
+
+        reviewed, skipped = [], {}
+        for payment in payments:
+            order = orders[payment.order_id]
+            if order.status == order_status or order_status in ORDER_TRANSITIONS.get(order.status, ()):
+                reviewed.append(payment)
+            else:
+                skipped[payment.pk] = order.status
+        if not reviewed:
+            return [], skipped
+
+        reviewed_orders = {payment.order_id: orders[payment.order_id] for payment in reviewed}
+        changed = [(order, order.status) for order in reviewed_orders.values() if order.status != order_status]
+        Order.objects.filter(pk__in=list(reviewed_orders)).update(
+            status=order_status, track_order_status=track_status
+        )
+        Payment.objects.filter(pk__in=[payment.pk for payment in reviewed]).update(status=decision)
+        invalidate_tracking(list(reviewed_orders))
+
+        for order in reviewed_orders.values():
+            order.track_order_status = track_status
+        if changed:
+            if order_status in RESTOCKING_STATUSES:
+                restore_stock([order.pk for order, _ in changed])
+            record_order_events(changed, order_status, actor=actor, note=f'Payment {decision}')
+            for order, _ in changed:
+                order.status = order_status
+
+        # Sent by the mail worker after commit; nothing is queued if the review rolls back
+        queue_emails('payment_status', [
+            (payment.user.email, {
+                'order_id': payment.order_id,
+                'username': payment.user.username,
+                'decision': decision,
+            })
+            for payment in reviewed
+        ])
+    return [payment.pk for payment in reviewed], skipped
+
+
+def review_payment(payment, decision, actor=None):
+    """
+    Approve or reject one payment through review_payments().
+    Raises orders.services.InvalidTransition (and changes nothing) if the order
+    cannot make that move, e.g. approving a payment for a cancelled order.
+    """
+    reviewed, skipped = review_payments([payment.pk], decision, actor=actor)
+    if not reviewed:
+        if payment.pk not in skipped:
+            raise Payment.DoesNotExist(f'Payment {payment.pk} does not exist.')
+        raise InvalidTransition(skipped[payment.pk], PAYMENT_DECISIONS[decision][0])
+    payment.refresh_from_db(fields=['status'])
+    return payment
@@ -0,0 +1,8 @@
+from jobs.queue import task
+
+from .screenshots import process_screenshot
+
+
+@task('payments.process_screenshot')
+def process_screenshot_task(payment_id):
+    process_screenshot(payment_id)
@@ -1,3 +1,363 @@
-from django.test import TestCase
+import io
+import random
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .models import Payment
+from .phash import CHUNK_WIDTHS, find_similar, hash_fields, max_distance
+from .screenshots import process_screenshot
+from .services import review_payments
+from mailer.models import OutgoingEmail
+from orders.archive import archive_batch
+from orders.models import ArchivedOrder, Invoice, Order, OrderEvent
+from orders.outbox import process_batch
+from orders.services import cancel_orders, place_order_items
+from product.models import ClothingProduct
+
+User = get_user_model()
+
+
+def make_order(user, price='250.00'):
+    product = ClothingProduct.objects.create(name='Shirt', description='-', price=price, stock=10, category='shirt')
+    return place_order_items(user, [(product.id, 1)])
+
+
+@override_settings(JOBS_RUN_EAGERLY=True)
+class PaymentReviewTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass1234', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.order = make_order(self.buyer)
+        self.payment = Payment.objects.create(order=self.order, user=self.buyer, screenshot='payments/proof.png')
+
+    def test_approve_marks_order_paid_and_queues_invoice(self):
+        response = self.client.post(f'/api/payments/{self.payment.id}/approve/')
+        self.assertEqual(response.status_code, 200)
+
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.track_order_status), ('paid', 'shipping'))
+        self.assertFalse(Invoice.objects.exists())
+
+        process_batch()
+        self.assertTrue(Invoice.objects.filter(order=self.order).exists())
+
+    def test_reject_cancels_order_with_a_valid_status(self):
+        self.client.post(f'/api/payments/{self.payment.id}/reject/')
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.track_order_status), ('cancelled', '-'))
+        self.assertEqual(ClothingProduct.objects.get().stock, 10)
+
+        # A cancelled order cannot be approved afterwards
+        response = self.client.post(f'/api/payments/{self.payment.id}/approve/')
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkPaymentReviewTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass1234')
+        self.payments = []
+        for _ in range(4):
+            order = make_order(self.buyer)
+            self.payments.append(Payment.objects.create(order=order, user=self.buyer, screenshot='payments/proof.png'))
+
+    def order_states(self):
+        return list(Order.objects.order_by('pk').values_list('status', 'track_order_status'))
+
+    def test_bulk_approve_is_set_based(self):
+        payment_ids = [payment.pk for payment in self.payments]
+        # savepoint, lock payments, lock orders, order UPDATE, payment UPDATE, event + outbox INSERTs,
+        # loyalty ledger SELECT + INSERT + balance UPDATE, email INSERT, send-job check + INSERT, release
+        with self.assertNumQueries(14):
+            reviewed, skipped = review_payments(payment_ids, 'approved', actor=self.admin)
+        self.assertEqual((sorted(reviewed), skipped), (payment_ids, {}))
+        self.assertEqual(self.order_states(), [('paid', 'shipping')] * 4)
+        self.assertEqual(set(Payment.objects.values_list('status', flat=True)), {'approved'})
+        self.assertEqual(OrderEvent.objects.filter(to_status='paid', actor=self.admin).count(), 4)
+        self.assertEqual(OutgoingEmail.objects.filter(template='payment_status').count(), 4)
+
+    def test_api_rejects_and_reports_skipped(self):
+        cancel_orders([self.payments[0].order_id])
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post('/api/payments/bulk-review/', {
+            'payment_ids': [payment.pk for payment in self.payments[:3]], 'decision': 'rejected',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        # The already-cancelled order is a no-op move, so its stock is not restored twice
+        self.assertEqual(response.json()['reviewed'], [payment.pk for payment in self.payments[:3]])
+        self.assertEqual(self.order_states(), [('cancelled', '-')] * 3 + [('pending', '-')])
+        self.assertEqual(list(ClothingProduct.objects.values_list('stock', flat=True)), [10, 10, 10, 9])
+
+        response = client.post('/api/payments/bulk-review/', {
+            'payment_ids': [self.payments[0].pk, self.payments[3].pk], 'decision': 'approved',
+        }, format='json')
+        self.assertEqual(response.json(), {
+            'reviewed': [self.payments[3].pk],
+            'skipped': [{'id': self.payments[0].pk, 'order_status': 'cancelled'}],
+        })
+
+        response = client.post('/api/payments/bulk-review/', {'payment_ids': [1], 'decision': 'maybe'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_action_uses_the_same_service(self):
+        self.client.force_login(self.admin)
+        self.client.post('/admin/payments/payment/', {
+            'action': 'approve_payment', '_selected_action': [self.payments[0].pk],
+        })
+        self.assertEqual(self.order_states()[0], ('paid', 'shipping'))
+
+
+def make_image(size=(3000, 2000), fmt='JPEG', seed=1, quality=90):
+    """A blocky random pattern (so perceptual hashes differ by seed) with EXIF metadata."""
+    rng = random.Random(seed)
+    pattern = Image.new('RGB', (16, 12))
+    pattern.putdata([tuple(rng.randrange(256) for _ in range(3)) for _ in range(16 * 12)])
+    image = pattern.resize(size, Image.Resampling.NEAREST)
+    out = io.BytesIO()
+    if fmt == 'JPEG':
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'  # Make
+        image.save(out, fmt, exif=exif, quality=quality)
+    else:
+        image.save(out, fmt)
+    return out.getvalue()
+
+
+@override_settings(JOBS_RUN_EAGERLY=True)
+class ScreenshotIngestionTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+        self.order = make_order(self.buyer)
+
+    def upload(self, data, name='proof.jpg'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/payments/create/', {
+                'order': self.order.id,
+                'screenshot': SimpleUploadedFile(name, data, content_type='image/jpeg'),
+            }, format='multipart')
+
+    def test_upload_is_recompressed_with_thumbnail(self):
+        response = self.upload(make_image())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['screenshot_status'], 'processing')
+
+        payment = Payment.objects.get()
+        self.assertEqual(payment.screenshot_status, 'ready')
+        self.assertEqual(payment.screenshot.name, f'payments/{payment.screenshot_hash}.jpg')
+        with Image.open(payment.screenshot.path) as image:
+            self.assertEqual(max(image.size), 1600)
+            self.assertEqual(dict(image.getexif()), {})
+        with Image.open(payment.screenshot_thumbnail.path) as thumb:
+            self.assertLessEqual(max(thumb.size), 240)
+
+    def test_original_is_deleted_only_after_commit(self):
+        name = default_storage.save('payments/raw.jpg', ContentFile(make_image(size=(800, 600))))
+        payment = Payment.objects.create(order=self.order, user=self.buyer, screenshot=name)
+        with self.captureOnCommitCallbacks() as callbacks:
+            process_screenshot(payment.pk)
+        self.assertTrue(default_storage.exists(name))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(default_storage.exists(name))
+
+    def test_identical_images_share_one_file(self):
+        data = make_image(size=(800, 600), fmt='PNG')
+        self.upload(data, name='a.png')
+        self.order = make_order(self.buyer)
+        self.upload(data, name='b.png')
+        self.assertEqual(len(set(Payment.objects.values_list('screenshot', flat=True))), 1)
+
+    @override_settings(PAYMENT_SCREENSHOT_MAX_BYTES=150 * 1024)
+    def test_oversized_upload_is_refused(self):
+        # Within the Content-Length allowance, so the streaming cap has to catch it
+        response = self.upload(b'\xff' * (200 * 1024))
+        self.assertEqual(response.status_code, 413)
+        # Far over the cap: refused from Content-Length before reading the body
+        response = self.upload(b'\xff' * (1024 * 1024))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Payment.objects.exists())
+
+    def upload_for_new_order(self, data, name='proof.jpg'):
+        self.order = make_order(self.buyer)
+        return self.upload(data, name=name)
+
+    def test_reused_screenshot_is_flagged(self):
+        self.upload(make_image(size=(1200, 900)))
+        first = Payment.objects.get()
+        self.assertFalse(first.screenshot_reused)
+        self.assertEqual(len(first.screenshot_dhash), 16)
+
+        self.upload_for_new_order(make_image(size=(1200, 900), seed=2, fmt='PNG'), name='other.png')
+        # The same picture at another size and quality still matches
+        self.upload_for_new_order(make_image(size=(900, 675), quality=60), name='again.jpg')
+
+        flags = dict(Payment.objects.order_by('pk').values_list('pk', 'screenshot_reused'))
+        self.assertEqual(list(flags.values()), [True, False, True])
+
+        admin = User.objects.create_superuser(username='root', email='root@example.com', password='pass1234')
+        self.client.force_login(admin)
+        page = self.client.get(f'/admin/payments/payment/{first.pk}/change/').content.decode()
+        self.assertIn(f'Payment #{first.pk + 2}', page)
+
+    def test_screenshot_of_an_archived_order_still_counts(self):
+        self.upload(make_image(size=(1200, 900)))
+        archived_id = self.order.pk
+        Order.objects.filter(pk=archived_id).update(status='cancelled')
+        self.assertEqual(archive_batch(timezone.now() + timedelta(days=1)), 1)
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(len(ArchivedOrder.objects.get().screenshot_dhash), 16)
+
+        self.upload_for_new_order(make_image(size=(900, 675), quality=60), name='again.jpg')
+        self.assertTrue(Payment.objects.get().screenshot_reused)
+        admin = User.objects.create_superuser(username='root', email='root@example.com', password='pass1234')
+        self.client.force_login(admin)
+        page = self.client.get(f'/admin/payments/payment/{Payment.objects.get().pk}/change/').content.decode()
+        self.assertIn(f'Archived order #{archived_id}', page)
+
+        Payment.objects.update(screenshot_reused=False)
+        out = StringIO()
+        call_command('hash_screenshots', '--workers', '1', stdout=out)
+        self.assertIn('1 payment(s) flagged as reused.', out.getvalue())
+
+    def test_backfill_hashes_and_flags(self):
+        self.upload(make_image(size=(600, 450)))
+        self.upload_for_new_order(make_image(size=(800, 600)))
+        Payment.objects.update(screenshot_dhash='', screenshot_dhash_0=None, screenshot_reused=False)
+
+        out = StringIO()
+        call_command('hash_screenshots', '--workers', '1', stdout=out)
+        self.assertIn('Hashed 2 screenshot(s), 0 unreadable; 2 payment(s) flagged as reused.', out.getvalue())
+        self.assertEqual(Payment.objects.filter(screenshot_reused=True).exclude(screenshot_dhash='').count(), 2)
+
+    def test_non_image_is_marked_invalid(self):
+        self.assertEqual(self.upload(b'not an image at all').status_code, 201)
+        payment = Payment.objects.get()
+        self.assertEqual(payment.screenshot_status, 'invalid')
+        self.assertIn('Not a valid image', payment.screenshot_error)
+
+
+class PerceptualHashLookupTests(TestCase):
+    def test_chunks_cover_the_hash(self):
+        self.assertEqual(sum(CHUNK_WIDTHS), 64)
+
+    @override_settings(PAYMENT_SCREENSHOT_DUPLICATE_DISTANCE=10)
+    def test_distance_is_capped_below_the_chunk_count(self):
+        self.assertEqual(max_distance(), 3)
+        buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        value = random.Random(3).getrandbits(64)
+        payments = []
+        # One flipped bit per 16-bit chunk: three leave a chunk intact, four do not
+        for bits in ((0, 16, 32), (0, 16, 32, 48)):
+            other = value
+            for bit in bits:
+                other ^= 1 << bit
+            payments.append(Payment.objects.create(
+                order=make_order(buyer), user=buyer, screenshot='payments/proof.jpg', **hash_fields(other)
+            ))
+
+        matches = find_similar(Payment.objects.all(), value)
+        self.assertEqual([(payment.pk, distance) for payment, distance in matches], [(payments[0].pk, 3)])
+
+
+class PaymentReviewQueueTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass1234')
+        self.other = User.objects.create_superuser(username='other', email='other@example.com', password='pass1234')
+        self.payments = [
+            Payment.objects.create(order=make_order(self.buyer), user=self.buyer, screenshot='payments/proof.png')
+            for _ in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_queue_pages_in_one_query_each(self):
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            with self.assertNumQueries(1):
+                body = self.client.get('/api/payments/queue/', params).json()
+            seen += [row['id'] for row in body['results']]
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, [payment.pk for payment in self.payments])
+
+        row = self.client.get('/api/payments/queue/').json()['results'][0]
+        self.assertEqual(row['customer_email'], 'buyer@example.com')
+        self.assertEqual((row['order_total'], row['item_count'], row['claimed_by']), ('250.00', 1, None))
+
+        self.assertEqual(self.client.get('/api/payments/queue/', {'cursor': 'junk'}).status_code, 400)
+
+    def test_reviewers_claim_disjoint_payments(self):
+        mine = self.client.post('/api/payments/queue/claim/', {'count': 3}, format='json').json()['results']
+        other_client = APIClient()
+        other_client.force_authenticate(self.other)
+        theirs = other_client.post('/api/payments/queue/claim/', {'count': 3}, format='json').json()['results']
+
+        self.assertEqual([row['id'] for row in mine], [payment.pk for payment in self.payments[:3]])
+        self.assertEqual([row['id'] for row in theirs], [payment.pk for payment in self.payments[3:]])
+        self.assertEqual({row['claimed_by'] for row in mine}, {'admin@example.com'})
+
+        body = self.client.get('/api/payments/queue/', {'claimed': 'mine'}).json()
+        self.assertEqual(len(body['results']), 3)
+
+        released = self.client.post('/api/payments/queue/release/', {'payment_ids': [mine[0]['id']]}, format='json')
+        self.assertEqual(released.json(), {'released': 1})
+        body = other_client.get('/api/payments/queue/', {'claimed': 'open'}).json()
+        self.assertEqual([row['id'] for row in body['results']], [mine[0]['id']])
+
+    def test_expired_claims_can_be_taken_over(self):
+        self.client.post('/api/payments/queue/claim/', {'count': 5}, format='json')
+        other_client = APIClient()
+        other_client.force_authenticate(self.other)
+        self.assertEqual(other_client.post('/api/payments/queue/claim/', format='json').json()['results'], [])
+
+        with override_settings(PAYMENT_CLAIM_TTL=timedelta(0)):
+            taken = other_client.post('/api/payments/queue/claim/', {'count': 2}, format='json').json()['results']
+        self.assertEqual([row['claimed_by'] for row in taken], ['other@example.com'] * 2)
+
+    def test_claims_are_enforced_on_review_and_release(self):
+        claimed = self.client.post('/api/payments/queue/claim/', {'count': 2}, format='json').json()['results']
+        mine = [row['id'] for row in claimed]
+        other_client = APIClient()
+        other_client.force_authenticate(self.other)
+
+        body = {'payment_ids': [mine[0], self.payments[4].pk], 'decision': 'approved'}
+        response = other_client.post('/api/payments/bulk-review/', body, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['payment_ids'], [mine[0]])
+        self.assertFalse(Payment.objects.exclude(status='pending').exists())
+        self.assertEqual(other_client.post(f'/api/payments/{mine[1]}/reject/').status_code, 409)
+
+        response = other_client.post('/api/payments/queue/release/', {'payment_ids': mine}, format='json')
+        self.assertEqual((response.status_code, response.json()['payment_ids']), (409, mine))
+        self.assertEqual(Payment.objects.filter(claimed_by=self.admin).count(), 2)
+        response = self.client.post('/api/payments/queue/release/', {'payment_ids': ['x']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # The claim holder can review, and so can anyone once the claim lapses
+        self.assertEqual(self.client.post(f'/api/payments/{mine[0]}/approve/').status_code, 200)
+        with override_settings(PAYMENT_CLAIM_TTL=timedelta(0)):
+            self.assertEqual(other_client.post(f'/api/payments/{mine[1]}/approve/').status_code, 200)
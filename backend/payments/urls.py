@@ -1,10 +1,17 @@
 # payments/urls.py
 from django.urls import path
-from .views import CreatePaymentView, PaymentDetailView, approve_payment, reject_payment
+from .views import (
+    CreatePaymentView, PaymentDetailView, approve_payment, bulk_review_payments, claim_queue_payments,
+    payment_queue, reject_payment, release_queue_payments,
+)
 
 urlpatterns = [
     path('create/', CreatePaymentView.as_view(), name='payment-create'),
     path('<int:id>/', PaymentDetailView.as_view(), name='payment-detail'),
     path('<int:payment_id>/approve/', approve_payment, name='payment-approve'),
     path('<int:payment_id>/reject/', reject_payment, name='payment-reject'),
+    path('bulk-review/', bulk_review_payments, name='payment-bulk-review'),
+    path('queue/', payment_queue, name='payment-queue'),
+    path('queue/claim/', claim_queue_payments, name='payment-queue-claim'),
+    path('queue/release/', release_queue_payments, name='payment-queue-release'),
 ]
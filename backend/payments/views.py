@@ -4,18 +4,58 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
 from .models import Payment
-from .serializers import PaymentSerializer
+from .serializers import PaymentQueueSerializer, PaymentSerializer
 from orders.models import Order
+from orders.idempotency import run_idempotent
+from orders.pagination import InvalidCursor, keyset_paginate
+from orders.services import InvalidTransition
+from orders.tracking import invalidate_tracking
+from .queue import QUEUE_ORDERING, ClaimConflict, claim_is_open, claim_payments, release_payments, review_queue
+from .screenshots import SizeCappedUploadHandler, max_upload_bytes
+from .services import PAYMENT_DECISIONS, review_payment, review_payments
+from jobs.queue import enqueue
 
 class CreatePaymentView(generics.CreateAPIView):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Stream the upload to a temp file, counting bytes; nothing is buffered in memory
+        django_request = request._request
+        django_request.upload_handlers = [
+            SizeCappedUploadHandler(django_request),
+            TemporaryFileUploadHandler(django_request),
+        ]
+
+    def create(self, request, *args, **kwargs):
+        too_large = Response(
+            {'error': f'Screenshot must be at most {max_upload_bytes() // (1024 * 1024)} MB.'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        # Refuse obviously oversized bodies before reading any of them
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > max_upload_bytes() + 64 * 1024:
+            return too_large
+        request.data  # parse now so a capped upload can be reported as such
+        if getattr(request._request, 'upload_too_large', False):
+            return too_large
+        # Honour Idempotency-Key so a retried upload returns the original payment
+        return run_idempotent(request, 'payments.create', lambda: super(CreatePaymentView, self).create(request, *args, **kwargs))
+
     def perform_create(self, serializer):
         # auto-set user to current user
-        serializer.save(user=self.request.user)
+        payment = serializer.save(user=self.request.user, screenshot_status='processing')
+        # Verification, recompression and the thumbnail happen in the job worker
+        enqueue('payments.process_screenshot', {'payment_id': payment.id})
+        # Tracking now shows the payment as pending review
+        invalidate_tracking([payment.order_id])
 
 class PaymentDetailView(generics.RetrieveAPIView):
     queryset = Payment.objects.all()
@@ -29,18 +69,12 @@ class PaymentDetailView(generics.RetrieveAPIView):
 def approve_payment(request, payment_id):
     """
     POST /api/payments/<payment_id>/approve/
-    Admin approves a payment and updates the associated order status to 'paid'
+    Admin approves a payment and moves the associated order to 'paid' (track status 'shipping')
     """
     try:
-        payment = Payment.objects.get(id=payment_id)
-        payment.status = 'approved'
-        payment.save()
-
-        # Update associated order: set track status to 'shipping' and mirror status
-        order = payment.order
-        order.track_order_status = 'shipping'
-        order.status = 'shipping'
-        order.save(update_fields=['track_order_status', 'status'])
+        payment = Payment.objects.select_related('order').get(id=payment_id)
+        # Marks the order paid and sets its track status to 'shipping'
+        review_payment(payment, 'approved', actor=request.user)
 
         serializer = PaymentSerializer(payment)
         return Response(
@@ -52,6 +86,16 @@ def approve_payment(request, payment_id):
             {'error': 'Payment not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+    except InvalidTransition as e:
+        return Response(
+            {'error': e.message},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except ClaimConflict as e:
+        return Response(
+            {'error': e.message, 'payment_ids': e.payment_ids},
+            status=status.HTTP_409_CONFLICT
+        )
     except Exception as e:
         return Response(
             {'error': 'Failed to approve payment', 'detail': str(e)},
@@ -67,15 +111,9 @@ def reject_payment(request, payment_id):
     Admin rejects a payment and updates the associated order status to 'cancelled'
     """
     try:
-        payment = Payment.objects.get(id=payment_id)
-        payment.status = 'rejected'
-        payment.save()
-
-        # Update associated order: set track status to '-' and mirror rejected status
-        order = payment.order
-        order.track_order_status = '-'
-        order.status = 'rejected'
-        order.save(update_fields=['track_order_status', 'status'])
+        payment = Payment.objects.select_related('order').get(id=payment_id)
+        # Cancels the order and resets its track status to '-'
+        review_payment(payment, 'rejected', actor=request.user)
 
         serializer = PaymentSerializer(payment)
         return Response(
@@ -87,8 +125,155 @@ def reject_payment(request, payment_id):
             {'error': 'Payment not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+    except InvalidTransition as e:
+        return Response(
+            {'error': e.message},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except ClaimConflict as e:
+        return Response(
+            {'error': e.message, 'payment_ids': e.payment_ids},
+            status=status.HTTP_409_CONFLICT
+        )
     except Exception as e:
         return Response(
             {'error': 'Failed to reject payment', 'detail': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_review_payments(request):
+    """
+    POST /api/payments/bulk-review/
+    Approve or reject many payments in one transaction (payments.services.review_payments).
+
+    Body:
+    {
+      "payment_ids": [1, 2, 3],
+      "decision": "approved|rejected"
+    }
+
+    Response: { "reviewed": [ids], "skipped": [{"id": .., "order_status": ..}, ...] }
+    409 with "payment_ids" (and nothing reviewed) if any are claimed by another reviewer.
+    """
+    try:
+        decision = request.data.get('decision', '')
+        if decision not in PAYMENT_DECISIONS:
+            return Response(
+                {'error': f'decision must be one of: {", ".join(PAYMENT_DECISIONS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        payment_ids = request.data.get('payment_ids')
+        if not isinstance(payment_ids, list) or not payment_ids:
+            return Response({'error': 'payment_ids must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            payment_ids = [int(payment_id) for payment_id in payment_ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'payment_ids must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        reviewed, skipped = review_payments(payment_ids, decision, actor=request.user)
+        return Response({
+            'reviewed': reviewed,
+            'skipped': [{'id': pk, 'order_status': order_status} for pk, order_status in sorted(skipped.items())],
+        }, status=status.HTTP_200_OK)
+    except ClaimConflict as e:
+        return Response({'error': e.message, 'payment_ids': e.payment_ids}, status=status.HTTP_409_CONFLICT)
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to review payments', 'detail': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def payment_queue(request):
+    """
+    GET /api/payments/queue/
+    Pending payments to review, oldest first, one page at a time. Every row
+    (order total, item count, customer email, thumbnail, claim) comes from a
+    single query.
+
+    Query params:
+      cursor     - `next_cursor` from the previous page
+      page_size  - payments per page (default 20, max 100)
+      claimed    - "mine" for payments claimed by you, "open" for unclaimed ones
+
+    Response: { "results": [...], "next_cursor": "..." | null }
+    """
+    try:
+        payments = review_queue()
+        claimed = request.query_params.get('claimed')
+        if claimed == 'mine':
+            payments = payments.filter(claimed_by=request.user)
+        elif claimed == 'open':
+            payments = payments.filter(claim_is_open())
+        page, next_cursor = keyset_paginate(payments, request, ordering=QUEUE_ORDERING)
+        serializer = PaymentQueueSerializer(page, many=True, context={'request': request})
+        return Response({'results': serializer.data, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to load the payment queue', 'detail': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def claim_queue_payments(request):
+    """
+    POST /api/payments/queue/claim/
+    Claim the oldest unclaimed pending payments so no other reviewer gets them.
+    Claims lapse after PAYMENT_CLAIM_TTL.
+
+    Body: { "count": 10 }   (default 10, max 100)
+    Response: { "results": [...claimed queue rows] }
+    """
+    try:
+        try:
+            count = max(1, min(int(request.data.get('count', 10)), 100))
+        except (TypeError, ValueError):
+            return Response({'error': 'count must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        claimed_ids = claim_payments(request.user, count)
+        payments = review_queue().filter(pk__in=claimed_ids).order_by(*QUEUE_ORDERING)
+        serializer = PaymentQueueSerializer(payments, many=True, context={'request': request})
+        return Response({'results': serializer.data}, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to claim payments', 'detail': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def release_queue_payments(request):
+    """
+    POST /api/payments/queue/release/
+    Give back claimed payments.
+
+    Body: { "payment_ids": [1, 2] }   (omit to release all of your claims)
+    409 with "payment_ids" (and nothing released) for ids you hold no claim on.
+    """
+    try:
+        payment_ids = request.data.get('payment_ids')
+        if payment_ids is not None:
+            if not isinstance(payment_ids, list):
+                return Response({'error': 'payment_ids must be a list.'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                payment_ids = [int(payment_id) for payment_id in payment_ids]
+            except (TypeError, ValueError):
+                return Response({'error': 'payment_ids must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        released = release_payments(request.user, payment_ids)
+        return Response({'released': released}, status=status.HTTP_200_OK)
+    except ClaimConflict as e:
+        return Response({'error': e.message, 'payment_ids': e.payment_ids}, status=status.HTTP_409_CONFLICT)
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to release payments', 'detail': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
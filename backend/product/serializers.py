@@ -12,6 +12,39 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'user_email', 'product_type', 'product_id', 'rating', 'comment', 'created_at']
         read_only_fields = ['user']
 
+def reviews_by_product(product_ids):
+    """
+    Load reviews for many products in one query, keyed by product id.
+    Pass the result as context['reviews_by_product'] to skip the per-product lookup.
+    """
+    grouped = {product_id: [] for product_id in product_ids}
+    reviews = Review.objects.filter(product_type='clothing', product_id__in=grouped).select_related('user')
+    for review in reviews:
+        grouped[review.product_id].append(review)
+    return grouped
+
+
+def product_image_url(obj, context):
+    """Absolute URL of the product image, using the request when there is one, else SITE_URL."""
+    request = context.get('request') if isinstance(context, dict) else None
+    if not obj.image or not hasattr(obj.image, 'url'):
+        return None
+    
+    if request is not None:
+        try:
+            return request.build_absolute_uri(obj.image.url)
+        except Exception:
+            pass
+    
+    site_url = getattr(settings, 'SITE_URL', None) or os.getenv('SITE_URL') or os.getenv('VITE_API_BASE')
+    if site_url:
+        site = site_url.rstrip('/')
+        path = obj.image.url if obj.image.url.startswith('/') else f'/{obj.image.url}'
+        return f"{site}{path}"
+    
+    return obj.image.url
+
+
 # Clothing Product Serializer
 class ClothingProductSerializer(serializers.ModelSerializer):
     reviews = serializers.SerializerMethodField()
@@ -22,27 +55,28 @@ class ClothingProductSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'price', 'stock', 'category', 'image', 'image_url', 'reviews']
 
     def get_reviews(self, obj):
-        reviews = Review.objects.filter(product_type='clothing', product_id=obj.id)
+        prefetched = self.context.get('reviews_by_product') if isinstance(self.context, dict) else None
+        if prefetched is not None and obj.id in prefetched:
+            reviews = prefetched[obj.id]
+        else:
+            reviews = Review.objects.filter(product_type='clothing', product_id=obj.id)
         return ReviewSerializer(reviews, many=True, context=self.context).data
 
     def get_image_url(self, obj):
-        request = self.context.get('request') if isinstance(self.context, dict) else None
-        if not obj.image or not hasattr(obj.image, 'url'):
-            return None
-        
-        if request is not None:
-            try:
-                return request.build_absolute_uri(obj.image.url)
-            except Exception:
-                pass
-        
-        site_url = getattr(settings, 'SITE_URL', None) or os.getenv('SITE_URL') or os.getenv('VITE_API_BASE')
-        if site_url:
-            site = site_url.rstrip('/')
-            path = obj.image.url if obj.image.url.startswith('/') else f'/{obj.image.url}'
-            return f"{site}{path}"
-        
-        return obj.image.url
+        return product_image_url(obj, self.context)
+
+
+class ProductCardSerializer(serializers.ModelSerializer):
+    """Compact product for lists (wishlist): no description and no reviews, so no extra queries."""
+    image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ClothingProduct
+        fields = ['id', 'name', 'price', 'stock', 'category', 'image_url']
+        read_only_fields = fields
+
+    def get_image_url(self, obj):
+        return product_image_url(obj, self.context)
 
 # Alias for backwards compatibility with other apps
 ProductSerializer = ClothingProductSerializer
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import DailySalesRollup
+
+
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'category', 'status', 'orders', 'units', 'revenue', 'refunds', 'loyalty_points')
+    list_filter = ('status', 'category')
+    date_hierarchy = 'date'
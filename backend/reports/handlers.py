@@ -0,0 +1,10 @@
+from orders.outbox import register
+
+from .rollups import apply_order_event
+
+
+@register('order.placed')
+@register('order.status_changed')
+def update_sales_rollups(message):
+    payload = message.payload
+    apply_order_event(payload['order_id'], payload['from_status'], payload['to_status'])
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from orders.models import ArchivedOrder, Order
+from reports.rollups import rebuild_range
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild daily sales rollups from the live and archived order tables, a few days per query. '
+        'Drain the outbox first (manage.py process_outbox) so events are not counted twice.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day, YYYY-MM-DD (default: first order)')
+        parser.add_argument('--to', dest='date_to', help='Last day, YYYY-MM-DD (default: today)')
+        parser.add_argument('--chunk-days', type=int, default=7, help='Days aggregated per query')
+
+    def handle(self, *args, **options):
+        if options['date_from']:
+            date_from = parse_date(options['date_from'])
+        else:
+            firsts = [
+                model.objects.order_by('order_date').values_list('order_date', flat=True).first()
+                for model in (ArchivedOrder, Order)
+            ]
+            firsts = [first for first in firsts if first is not None]
+            if not firsts:
+                self.stdout.write('No orders to roll up.')
+                return
+            date_from = timezone.localdate(min(firsts))
+        date_to = parse_date(options['date_to']) if options['date_to'] else timezone.localdate()
+        if date_from is None or date_to is None:
+            raise CommandError('--from and --to must be dates in YYYY-MM-DD format.')
+
+        rebuild_range(date_from, date_to, chunk_days=max(1, options['chunk_days']), stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Sales rollups rebuilt for {date_from} .. {date_to}.'))
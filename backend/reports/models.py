@@ -0,0 +1,29 @@
+from django.db import models
+
+# Category value used for whole-order totals (orders and loyalty points are only counted there)
+ALL_CATEGORIES = ''
+
+
+class DailySalesRollup(models.Model):
+    """
+    Pre-aggregated sales per order date, product category and current order status.
+
+    Rows with category '' hold whole-order totals; per-category rows count an order
+    once in every category it contains, so their `orders` values do not add up to
+    the total. Maintained from order events by reports.handlers and rebuilt by
+    `manage.py backfill_sales_rollups`.
+    """
+    date = models.DateField()
+    category = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=20)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunds = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    loyalty_points = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'category', 'status')
+
+    def __str__(self):
+        return f"{self.date} {self.category or 'all'} {self.status}"
@@ -0,0 +1,140 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ALL_CATEGORIES, DailySalesRollup
+from orders.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+UNKNOWN_CATEGORY = 'unknown'
+
+LINE_REVENUE = ExpressionWrapper(
+    F('price_at_purchase') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2)
+)
+
+
+def _with_category(items):
+    # The category snapshotted at placement, so a reversal removes exactly what
+    # was added even after the product is recategorised or deleted
+    return items.annotate(category=F('product_category'))
+
+
+def order_contributions(order_id):
+    """
+    What one order adds to the rollups: (date, {category: counters}) where the
+    ALL_CATEGORIES entry carries the whole-order totals. None if the order is gone.
+    """
+    order = Order.objects.filter(pk=order_id).values('order_date', 'loyalty_points_earned').first()
+    if order is None:
+        return None
+    lines = (
+        _with_category(OrderItem.objects.filter(order_id=order_id))
+        .values('category')
+        .annotate(units=Sum('quantity'), revenue=Sum(LINE_REVENUE))
+    )
+    rows = {}
+    total_units, total_revenue = 0, Decimal('0')
+    for line in lines:
+        rows[line['category'] or UNKNOWN_CATEGORY] = {
+            'orders': 1, 'units': line['units'], 'revenue': line['revenue'], 'loyalty_points': 0,
+        }
+        total_units += line['units']
+        total_revenue += line['revenue']
+    rows[ALL_CATEGORIES] = {
+        'orders': 1, 'units': total_units, 'revenue': total_revenue,
+        'loyalty_points': order['loyalty_points_earned'],
+    }
+    return timezone.localdate(order['order_date']), rows
+
+
+def apply_contributions(day, order_status, rows, sign):
+    """Add (sign=1) or remove (sign=-1) an order's counters in the (day, *, status) buckets."""
+    for category, counters in rows.items():
+        rollup, _ = DailySalesRollup.objects.get_or_create(date=day, category=category, status=order_status)
+        updates = {name: F(name) + sign * value for name, value in counters.items()}
+        if order_status == 'refunded':
+            updates['refunds'] = F('refunds') + sign * counters['revenue']
+        DailySalesRollup.objects.filter(pk=rollup.pk).update(**updates)
+
+
+def apply_order_event(order_id, from_status, to_status):
+    """Move one order's contribution from its old status bucket to the new one."""
+    contributions = order_contributions(order_id)
+    if contributions is None:
+        return
+    day, rows = contributions
+    with transaction.atomic():
+        if from_status:
+            apply_contributions(day, from_status, rows, -1)
+        apply_contributions(day, to_status, rows, 1)
+
+
+def rebuild_range(date_from, date_to, chunk_days=7, stdout=None):
+    """
+    Recompute rollups for [date_from, date_to] from the order tables, `chunk_days`
+    at a time so each aggregate query and transaction stays small. Existing rows
+    in each chunk are replaced. Archived orders are counted alongside live ones,
+    so archiving never changes the rebuilt history.
+    """
+    day = date_from
+    while day <= date_to:
+        chunk_end = min(day + timedelta(days=chunk_days - 1), date_to)
+        _rebuild_chunk(day, chunk_end)
+        if stdout is not None:
+            stdout.write(f'Rebuilt {day} .. {chunk_end}')
+        day = chunk_end + timedelta(days=1)
+
+
+def _rebuild_chunk(day_from, day_to):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day_from, time.min), tz)
+    end = timezone.make_aware(datetime.combine(day_to + timedelta(days=1), time.min), tz)
+
+    buckets = {}
+
+    def bucket(date, category, order_status):
+        key = (date, category, order_status)
+        if key not in buckets:
+            buckets[key] = DailySalesRollup(date=date, category=category, status=order_status)
+        return buckets[key]
+
+    # archive_batch() moves an order in one transaction, so each order is in exactly one pair
+    for order_model, item_model in ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem)):
+        orders = order_model.objects.filter(order_date__gte=start, order_date__lt=end)
+        totals = (
+            orders.annotate(day=TruncDate('order_date', tzinfo=tz))
+            .values('day', 'status')
+            .annotate(count=Count('id'), loyalty=Sum('loyalty_points_earned'))
+        )
+        for row in totals:
+            rollup = bucket(row['day'], ALL_CATEGORIES, row['status'])
+            rollup.orders += row['count']
+            rollup.loyalty_points += row['loyalty'] or 0
+
+        lines = (
+            _with_category(item_model.objects.filter(order__in=orders))
+            .annotate(day=TruncDate('order__order_date', tzinfo=tz))
+            .values('day', 'order__status', 'category')
+            .annotate(units=Sum('quantity'), revenue=Sum(LINE_REVENUE), orders=Count('order_id', distinct=True))
+        )
+        for row in lines:
+            category = row['category'] or UNKNOWN_CATEGORY
+            order_status = row['order__status']
+            rollup = bucket(row['day'], category, order_status)
+            rollup.units += row['units']
+            rollup.revenue += row['revenue']
+            rollup.orders += row['orders']
+            total = bucket(row['day'], ALL_CATEGORIES, order_status)
+            total.units += row['units']
+            total.revenue += row['revenue']
+
+    for rollup in buckets.values():
+        if rollup.status == 'refunded':
+            rollup.refunds = rollup.revenue
+
+    with transaction.atomic():
+        DailySalesRollup.objects.filter(date__gte=day_from, date__lte=day_to).delete()
+        DailySalesRollup.objects.bulk_create(buckets.values(), batch_size=500)
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import ALL_CATEGORIES, DailySalesRollup
+from .rollups import rebuild_range
+from orders.archive import archive_batch
+from orders.models import Order
+from orders.outbox import process_batch
+from orders.services import place_order_items, transition_order
+from product.models import ClothingProduct
+
+User = get_user_model()
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.shirt = ClothingProduct.objects.create(name='Shirt', description='-', price='100.00', stock=50, category='shirt')
+        self.pant = ClothingProduct.objects.create(name='Pant', description='-', price='250.00', stock=50, category='pents')
+
+    def snapshot(self):
+        return sorted(
+            DailySalesRollup.objects.exclude(orders=0, units=0)
+            .values_list('date', 'category', 'status', 'orders', 'units', 'revenue', 'refunds', 'loyalty_points')
+        )
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        first = place_order_items(self.user, [(self.shirt.id, 2), (self.pant.id, 1)])
+        place_order_items(self.user, [(self.shirt.id, 1)])
+        transition_order(first, 'paid')
+        process_batch()
+
+        today = timezone.localdate()
+        total = DailySalesRollup.objects.get(date=today, category=ALL_CATEGORIES, status='paid')
+        self.assertEqual((total.orders, total.units, total.revenue, total.loyalty_points), (1, 3, 450, 45))
+        pending = DailySalesRollup.objects.get(date=today, category=ALL_CATEGORIES, status='pending')
+        self.assertEqual((pending.orders, pending.revenue), (1, 100))
+
+        incremental = self.snapshot()
+        rebuild_range(today, today)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_reversal_uses_category_at_placement(self):
+        order = place_order_items(self.user, [(self.shirt.id, 2), (self.pant.id, 1)])
+        process_batch()
+        ClothingProduct.objects.filter(pk=self.shirt.pk).update(category='pents')
+        self.pant.delete()
+        transition_order(order, 'paid')
+        process_batch()
+
+        # The pending buckets are emptied exactly, not pushed negative or left over
+        self.assertFalse(DailySalesRollup.objects.filter(status='pending').exclude(orders=0, units=0, revenue=0).exists())
+        paid = dict(
+            DailySalesRollup.objects.filter(status='paid').exclude(category=ALL_CATEGORIES)
+            .values_list('category', 'units')
+        )
+        self.assertEqual(paid, {'shirt': 2, 'pents': 1})
+
+        incremental = self.snapshot()
+        today = timezone.localdate()
+        rebuild_range(today, today)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_backfill_after_archiving_keeps_history(self):
+        delivered = place_order_items(self.user, [(self.shirt.id, 2), (self.pant.id, 1)])
+        for status in ('paid', 'shipped', 'delivered'):
+            transition_order(delivered, status)
+        place_order_items(self.user, [(self.shirt.id, 1)])
+        process_batch()
+        before = self.snapshot()
+
+        self.assertEqual(archive_batch(timezone.now() + timedelta(days=1)), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        today = timezone.localdate()
+        rebuild_range(today, today)
+        self.assertEqual(self.snapshot(), before)
+
+    def test_sales_report_sums_rollups(self):
+        place_order_items(self.user, [(self.shirt.id, 2), (self.pant.id, 1)])
+        process_batch()
+
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass1234', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        today = timezone.localdate().isoformat()
+        body = client.get('/api/reports/sales/', {'date_from': today, 'date_to': today, 'group_by': 'category'}).json()
+
+        self.assertEqual(body['totals']['orders'], 1)
+        self.assertEqual(float(body['totals']['revenue']), 450.0)
+        self.assertEqual({row['category']: row['units'] for row in body['rows']}, {'pents': 1, 'shirt': 2})
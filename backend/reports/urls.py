@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('sales/', views.sales_report, name='sales-report'),
+]
@@ -0,0 +1,66 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework import status
+from django.db.models import Sum
+from django.utils.dateparse import parse_date
+
+from .models import ALL_CATEGORIES, DailySalesRollup
+
+COUNTERS = ('orders', 'units', 'revenue', 'refunds', 'loyalty_points')
+GROUPINGS = {'day': 'date', 'status': 'status', 'category': 'category'}
+
+
+def _sum_counters(rollups):
+    totals = rollups.aggregate(**{name: Sum(name) for name in COUNTERS})
+    return {name: totals[name] or 0 for name in COUNTERS}
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sales_report(request):
+    """
+    GET /api/reports/sales/
+    Admin sales report summed from the daily rollups, so the cost depends on the
+    number of days requested rather than the number of orders.
+
+    Query params:
+      date_from, date_to  - required, YYYY-MM-DD (inclusive)
+      group_by            - day (default) | status | category
+      status              - only count orders currently in this status
+    """
+    date_from = parse_date(request.query_params.get('date_from', '') or '')
+    date_to = parse_date(request.query_params.get('date_to', '') or '')
+    if date_from is None or date_to is None:
+        return Response(
+            {'error': 'date_from and date_to are required, in YYYY-MM-DD format.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    group_by = request.query_params.get('group_by', 'day')
+    if group_by not in GROUPINGS:
+        return Response(
+            {'error': f'group_by must be one of: {", ".join(GROUPINGS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    rollups = DailySalesRollup.objects.filter(date__gte=date_from, date__lte=date_to)
+    order_status = request.query_params.get('status')
+    if order_status:
+        rollups = rollups.filter(status=order_status)
+
+    totals = rollups.filter(category=ALL_CATEGORIES)
+    grouped = totals if group_by != 'category' else rollups.exclude(category=ALL_CATEGORIES)
+    field = GROUPINGS[group_by]
+    rows = (
+        grouped.values(field)
+        .annotate(**{name: Sum(name) for name in COUNTERS})
+        .order_by(field)
+    )
+
+    return Response({
+        'date_from': date_from,
+        'date_to': date_to,
+        'group_by': group_by,
+        'totals': _sum_counters(totals),
+        'rows': [{group_by: row[field], **{name: row[name] for name in COUNTERS}} for row in rows],
+    }, status=status.HTTP_200_OK)
@@ -1,10 +1,29 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from .models import LoyaltyLedgerEntry, User
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
-    list_display = ('email', 'username', 'user_type', 'is_staff', 'is_active')
+    list_display = ('email', 'username', 'user_type', 'loyalty_balance', 'is_staff', 'is_active')
     list_filter = ('user_type', 'is_staff', 'is_active')
     fieldsets = UserAdmin.fieldsets + (
-        ('Additional Info', {'fields': ('user_type', 'phone', 'address')}),
-    )
\ No newline at end of file
+        ('Additional Info', {'fields': ('user_type', 'phone', 'address', 'loyalty_balance')}),
+    )
+    readonly_fields = ('loyalty_balance',)
+
+
+@admin.register(LoyaltyLedgerEntry)
+class LoyaltyLedgerEntryAdmin(admin.ModelAdmin):
+    """Append-only: entries are written by users.loyalty, never edited by hand."""
+    list_display = ('id', 'user', 'kind', 'points', 'order_id', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('user__email', 'order_id')
+    list_select_related = ('user',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
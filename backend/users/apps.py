@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        # Drop cached authentication users when they change
+        from . import signals  # noqa: F401
+        # Refuse a token cache that is not shared between workers
+        from . import checks  # noqa: F401
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import User
+from .revocation import revoked_key, token_cache
+
+
+# The user fields authentication and permission checks read; the rest of the
+# row (password hash, profile, loyalty balance) is never cached
+CACHED_USER_FIELDS = ('id', 'username', 'email', 'is_active', 'is_staff', 'is_superuser', 'user_type')
+
+
+def user_cache_key(user_id):
+    return f'users:auth:{user_id}'
+
+
+def invalidate_cached_user(user_ids):
+    """
+    Drop cached users now and again once the current transaction commits, so a
+    request that reads the old row in between cannot re-cache it for a full TTL.
+    """
+    keys = [user_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        token_cache().delete_many(keys)
+        transaction.on_commit(lambda: token_cache().delete_many(keys))
+
+
+def _cache_entry(user):
+    entry = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+    # Enough to notice a password change without keeping the hash itself
+    entry['password_stamp'] = get_md5_hash_password(user.password)
+    return entry
+
+
+def _user_from_entry(entry):
+    """A User with the cached fields loaded and every other field deferred."""
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in entry]
+    return User.from_db(None, names, [entry[name] for name in names])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps a few fields of the token's user (CACHED_USER_FIELDS)
+    in the shared AUTH_TOKEN_CACHE for AUTH_USER_CACHE_TTL seconds instead of
+    loading the row on every request. request.user then has only those fields
+    loaded; anything else is fetched from the database on first access, and
+    save() writes only the loaded fields. Views that need the whole profile
+    load the row themselves.
+
+    The revocation entry (users.revocation) is read in the same cache round
+    trip, and revoked tokens are rejected.
+
+    Saving or deleting a user (profile updates, deactivation, password changes)
+    drops the entry (users.signals). Since the cache is shared by all workers,
+    a deactivated user is refused on every worker once the change commits, and
+    the active and password-change checks still run on every request.
+
+    The saving is only real with Redis behind AUTH_TOKEN_CACHE. On the
+    DatabaseCache fallback each request still does one SELECT, against the
+    cache table instead of the users table.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        key = user_cache_key(user_id)
+        revoked = revoked_key(validated_token.get(api_settings.JTI_CLAIM))
+        found = token_cache().get_many([key, revoked])
+        if revoked in found:
+            raise InvalidToken(_('Token has been revoked'))
+
+        entry = found.get(key)
+        if entry is None:
+            user = super().get_user(validated_token)
+            token_cache().set(key, _cache_entry(user), getattr(settings, 'AUTH_USER_CACHE_TTL', 60))
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not entry['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entry['password_stamp']:
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return _user_from_entry(entry)
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+UserModel = get_user_model()
+
+
+def find_login_user(identifier, request=None):
+    """
+    The account `identifier` names, by username or email, or None. One query;
+    the result is remembered on `request`, so the login throttle
+    (users.throttling) and authenticate() share the lookup.
+    """
+    memo = getattr(request, '_login_lookup', None)
+    if memo is not None and memo[0] == identifier:
+        return memo[1]
+    # A username may look like someone else's email; the username match wins
+    candidates = list(UserModel._default_manager.filter(Q(username=identifier) | Q(email=identifier))[:2])
+    user = next((candidate for candidate in candidates if candidate.username == identifier), None)
+    if user is None and candidates:
+        user = candidates[0]
+    if request is not None:
+        request._login_lookup = (identifier, user)
+    return user
+
+
+class UsernameOrEmailBackend(ModelBackend):
+    """
+    Log in with either the username or the email address.
+
+    Both columns are unique and indexed, so one query finds the account, and
+    the password is hashed exactly once per attempt: against the account's
+    hash, or, when no account matches, against a throwaway hash so a miss
+    takes as long as a wrong password (no timing hint about which exists).
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        user = find_login_user(username, request)
+        if user is None:
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
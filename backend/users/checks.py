@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends that keep entries inside one process, so other workers never see them
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_token_cache(app_configs, **kwargs):
+    """Token revocation and rotation are only safe on a cache every worker shares."""
+    alias = getattr(settings, 'AUTH_TOKEN_CACHE', 'tokens')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend is None:
+        return [Error(f"CACHES has no '{alias}' alias for AUTH_TOKEN_CACHE.", id='users.E001')]
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [Error(
+            f"AUTH_TOKEN_CACHE ('{alias}') uses {backend}, which is not shared between processes.",
+            hint='Use Redis or django.core.cache.backends.db.DatabaseCache so revoked tokens are seen by every worker.',
+            id='users.E002',
+        )]
+    return []
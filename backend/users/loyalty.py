@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import LoyaltyLedgerEntry, User
+
+# Order status that credits the points an order earns. Not placement: points
+# from an order that is never paid could otherwise be redeemed first
+EARNING_STATUS = 'paid'
+# Order statuses that take back the points the order earned
+REVOKING_STATUSES = ('cancelled', 'refunded')
+
+
+class InsufficientPoints(Exception):
+    pass
+
+
+def _apply_balance_deltas(deltas):
+    """Add {user_id: delta} to each user's loyalty_balance in one UPDATE."""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    User.objects.filter(pk__in=deltas).update(
+        loyalty_balance=F('loyalty_balance') + Case(
+            *[When(pk=user_id, then=Value(delta)) for user_id, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def post_order_entries(kind, orders, note=''):
+    """
+    Append one `kind` ('earn' or 'revoke') entry per order and move the owners'
+    balances, with one SELECT, one INSERT and one UPDATE. `orders` are objects
+    with id, user_id and loyalty_points_earned. An order earns once, and is
+    revoked only if it earned (an order cancelled before payment never did).
+    Must run inside the transaction that changed the orders so balance and
+    ledger commit together.
+    """
+    orders = [order for order in orders if order.loyalty_points_earned]
+    if not orders:
+        return []
+    posted = set(
+        LoyaltyLedgerEntry.objects.filter(order_id__in=[order.id for order in orders], kind__in=('earn', 'revoke'))
+        .values_list('order_id', 'kind')
+    )
+    if kind == 'earn':
+        orders = [order for order in orders if (order.id, 'earn') not in posted]
+    else:
+        orders = [order for order in orders if (order.id, 'earn') in posted and (order.id, 'revoke') not in posted]
+    sign = 1 if kind == 'earn' else -1
+    entries = [
+        LoyaltyLedgerEntry(
+            user_id=order.user_id, kind=kind, points=sign * order.loyalty_points_earned,
+            order_id=order.id, note=note,
+        )
+        for order in orders
+    ]
+    if not entries:
+        return []
+    deltas = {}
+    for entry in entries:
+        deltas[entry.user_id] = deltas.get(entry.user_id, 0) + entry.points
+    LoyaltyLedgerEntry.objects.bulk_create(entries)
+    _apply_balance_deltas(deltas)
+    return entries
+
+
+def redeem_points(user, points, note=''):
+    """
+    Spend `points` from the user's balance. The balance check and the decrement
+    are one conditional UPDATE, so concurrent redemptions cannot overdraw it.
+    Raises InsufficientPoints.
+    """
+    if points <= 0:
+        raise ValueError('points must be positive')
+    with transaction.atomic():
+        updated = User.objects.filter(pk=user.pk, loyalty_balance__gte=points).update(
+            loyalty_balance=F('loyalty_balance') - points
+        )
+        if not updated:
+            raise InsufficientPoints('Not enough loyalty points.')
+        entry = LoyaltyLedgerEntry.objects.create(user=user, kind='redeem', points=-points, note=note)
+    user.loyalty_balance -= points
+    return entry
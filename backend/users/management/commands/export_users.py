@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from users.models import User
+from users.transfer import FORMATS, detect_format, export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream customer profiles to CSV or JSON Lines, in the format import_users reads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help="File to write, or '-' for stdout")
+        parser.add_argument('--format', choices=FORMATS, help='Output format (default: from the file extension, else csv)')
+        parser.add_argument('--all', action='store_true', help='Include admin accounts, not just customers')
+        parser.add_argument(
+            '--with-password-hashes', action='store_true',
+            help='Include password hashes so users can log in after import_users elsewhere',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all() if options['all'] else User.objects.filter(user_type='customer', is_staff=False)
+        fmt = detect_format(options['output'], options['format'])
+        rows = export_rows(users, include_passwords=options['with_password_hashes'])
+
+        if options['output'] == '-':
+            count = write_rows(rows, self.stdout, fmt, options['with_password_hashes'])
+        else:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as stream:
+                count = write_rows(rows, stream, fmt, options['with_password_hashes'])
+        self.stderr.write(f'Exported {count} user(s).')
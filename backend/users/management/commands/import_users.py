@@ -0,0 +1,50 @@
+import sys
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.transfer import FORMATS, detect_format, import_users, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Create customers in bulk from a CSV or JSON Lines file (columns: email, username, password, '
+        'first_name, last_name, phone, address, date_joined, is_active). Passwords are expected as '
+        'Django password hashes and stored without re-hashing.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--format', choices=FORMATS, help='Input format (default: from the file extension, else csv)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users inserted per bulk_create')
+        parser.add_argument(
+            '--plaintext-passwords', action='store_true',
+            help='Hash passwords that are not in a known hash format (slow: one full hash per row)',
+        )
+        parser.add_argument('--quiet', action='store_true', help='Do not list skipped rows')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+
+        def on_skip(line_number, reason):
+            if not options['quiet']:
+                self.stderr.write(f'Line {line_number}: skipped, {reason}')
+
+        started = time.monotonic()
+        try:
+            stream = nullcontext(sys.stdin) if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+        with stream:
+            created, duplicates, invalid = import_users(
+                read_rows(stream, fmt),
+                batch_size=max(1, options['batch_size']),
+                allow_plaintext=options['plaintext_passwords'],
+                on_skip=on_skip,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} user(s) in {time.monotonic() - started:.1f}s; '
+            f'skipped {duplicates} duplicate(s) and {invalid} invalid row(s).'
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from users.models import LoyaltyLedgerEntry, User
+
+
+class Command(BaseCommand):
+    help = 'Check every cached loyalty_balance against the sum of its ledger entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Reset mismatched balances to the ledger sum')
+
+    def handle(self, *args, **options):
+        total = (
+            LoyaltyLedgerEntry.objects.filter(user_id=OuterRef('pk'))
+            .values('user_id').annotate(total=Sum('points')).values('total')
+        )
+        ledger_sum = Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+        mismatched = (
+            User.objects.annotate(ledger_sum=ledger_sum)
+            .exclude(loyalty_balance=F('ledger_sum'))
+            .order_by('pk')
+            .values_list('pk', 'email', 'loyalty_balance', 'ledger_sum')
+        )
+
+        user_ids = []
+        for pk, email, balance, expected in mismatched.iterator(chunk_size=500):
+            user_ids.append(pk)
+            self.stdout.write(f'User {pk} <{email}>: balance {balance}, ledger {expected}')
+        if not user_ids:
+            self.stdout.write(self.style.SUCCESS('All loyalty balances match the ledger.'))
+            return
+
+        if options['fix']:
+            # Re-evaluated in the UPDATE, so entries written since the scan are included
+            fixed = User.objects.filter(pk__in=user_ids).update(loyalty_balance=ledger_sum)
+            self.stdout.write(self.style.SUCCESS(f'Reset {fixed} balance(s) to the ledger sum.'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(user_ids)} balance(s) differ from the ledger; rerun with --fix to reset them.'))
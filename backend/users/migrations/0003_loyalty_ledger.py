@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_user_address_alter_user_phone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='loyalty_balance',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='LoyaltyLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('earn', 'Earn'), ('revoke', 'Revoke'), ('redeem', 'Redeem')], max_length=10)),
+                ('points', models.IntegerField()),
+                ('order_id', models.BigIntegerField(blank=True, null=True)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='loyalty_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at', '-id'], name='loyalty_user_created_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('kind__in', ['earn', 'revoke'])), fields=('order_id', 'kind'), name='loyalty_once_per_order')],
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+from django.db import migrations
+from django.db.models import Exists, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Statuses an order can only reach through 'paid'; points are earned on payment (users.loyalty)
+PAID_STATUSES = ('paid', 'processing', 'shipped', 'delivered', 'refunded')
+
+
+def _was_paid(order):
+    """Whether a pre-ledger order ever reached 'paid', from its status, payment or event history."""
+    if order['status'] in PAID_STATUSES:
+        return True
+    if order.get('paid_event') or order.get('approved_payment') or order.get('payment_status') == 'approved':
+        return True
+    return any(event.get('to_status') == 'paid' for event in order.get('history') or ())
+
+
+def backfill_loyalty_ledger(apps, schema_editor):
+    """
+    Ledger entries for paid orders placed before the ledger existed, then balances
+    from their sums. Orders that never reached 'paid' earned nothing; paid orders
+    later cancelled or refunded earn and are revoked.
+    """
+    LoyaltyLedgerEntry = apps.get_model('users', 'LoyaltyLedgerEntry')
+    User = apps.get_model('users', 'User')
+    OrderEvent = apps.get_model('orders', 'OrderEvent')
+    Payment = apps.get_model('payments', 'Payment')
+    for model_name in ('Order', 'ArchivedOrder'):
+        model = apps.get_model('orders', model_name)
+        orders = model.objects.filter(loyalty_points_earned__gt=0).order_by('pk')
+        fields = ['pk', 'user_id', 'status', 'loyalty_points_earned']
+        if model_name == 'Order':
+            orders = orders.annotate(
+                paid_event=Exists(OrderEvent.objects.filter(order=OuterRef('pk'), to_status='paid')),
+                approved_payment=Exists(Payment.objects.filter(order=OuterRef('pk'), status='approved')),
+            )
+            fields += ['paid_event', 'approved_payment']
+        else:
+            fields += ['payment_status', 'history']
+        last_pk = 0
+        while True:
+            chunk = list(orders.filter(pk__gt=last_pk).values(*fields)[:500])
+            if not chunk:
+                break
+            entries = []
+            for order in chunk:
+                if not _was_paid(order):
+                    continue
+                points = order['loyalty_points_earned']
+                entries.append(LoyaltyLedgerEntry(
+                    user_id=order['user_id'], kind='earn', points=points, order_id=order['pk'],
+                ))
+                if order['status'] in ('cancelled', 'refunded'):
+                    entries.append(LoyaltyLedgerEntry(
+                        user_id=order['user_id'], kind='revoke', points=-points, order_id=order['pk'],
+                        note=f"Order {order['status']}",
+                    ))
+            LoyaltyLedgerEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            last_pk = chunk[-1]['pk']
+
+    total = (
+        LoyaltyLedgerEntry.objects.filter(user_id=OuterRef('pk'))
+        .values('user_id').annotate(total=Sum('points')).values('total')
+    )
+    User.objects.update(
+        loyalty_balance=Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_loyalty_ledger'),
+        ('orders', '0010_archived_orders'),
+        ('payments', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_loyalty_ledger, migrations.RunPython.noop),
+    ]
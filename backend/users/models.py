@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 
 class User(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -13,6 +14,49 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     email = models.EmailField(unique=True)
+    # Running total of LoyaltyLedgerEntry.points, kept in step by users.loyalty
+    loyalty_balance = models.IntegerField(default=0)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Case-insensitive email lookups (users.transfer import dedupe)
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+        ]
 
     def __str__(self):
         return self.email
+
+
+class LoyaltyLedgerEntry(models.Model):
+    """
+    Append-only loyalty history. Points are signed: earn entries are positive,
+    revoke and redeem entries negative, and their sum per user is loyalty_balance.
+    """
+    KIND_CHOICES = (
+        ('earn', 'Earn'),
+        ('revoke', 'Revoke'),
+        ('redeem', 'Redeem'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='loyalty_entries')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    points = models.IntegerField()
+    # Plain id rather than a ForeignKey so entries survive order archiving
+    order_id = models.BigIntegerField(null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='loyalty_user_created_idx'),
+        ]
+        constraints = [
+            # An order earns once and is revoked at most once
+            models.UniqueConstraint(
+                fields=['order_id', 'kind'], condition=models.Q(kind__in=['earn', 'revoke']),
+                name='loyalty_once_per_order',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.kind} {self.points:+d}"
@@ -0,0 +1,43 @@
+"""
+Revoked JWT ids, kept in the AUTH_TOKEN_CACHE cache alias rather than a model.
+
+Each entry expires when its token would have expired anyway, so the store only
+ever holds tokens that are revoked *and* still otherwise valid, and needs no
+cleanup job. The alias must be shared by every worker (Redis, or the database
+cache table): a local-memory cache is refused, since a token revoked in one
+process could still be replayed in another.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework_simplejwt.settings import api_settings
+
+from .checks import LOCAL_CACHE_BACKENDS
+
+
+def token_cache():
+    alias = getattr(settings, 'AUTH_TOKEN_CACHE', 'tokens')
+    if settings.CACHES.get(alias, {}).get('BACKEND') in LOCAL_CACHE_BACKENDS:
+        raise ImproperlyConfigured(f"AUTH_TOKEN_CACHE ('{alias}') must be a cache shared by all processes.")
+    return caches[alias]
+
+
+def revoked_key(jti):
+    return f'users:revoked:{jti}'
+
+
+def revoke_token(token):
+    """
+    Revoke `token` until it expires. Returns False if it was already revoked;
+    the check and the write are one atomic cache.add() (a unique-key insert on
+    the database cache), so of two requests rotating the same refresh token,
+    in any process, only one wins.
+    """
+    ttl = max(int(token['exp'] - time.time()), 1)
+    return token_cache().add(revoked_key(token[api_settings.JTI_CLAIM]), True, ttl)
+
+
+def is_revoked(token):
+    return token_cache().get(revoked_key(token[api_settings.JTI_CLAIM])) is not None
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import User
+from .models import LoyaltyLedgerEntry, User
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
@@ -49,16 +49,8 @@ class UserLoginSerializer(serializers.Serializer):
         password = data.get('password')
 
         if username_or_email and password:
-            # Try to authenticate with username
-            user = authenticate(username=username_or_email, password=password)
-            
-            # If that fails, try with email
-            if user is None:
-                try:
-                    user_obj = User.objects.get(email=username_or_email)
-                    user = authenticate(username=user_obj.username, password=password)
-                except User.DoesNotExist:
-                    user = None
+            # users.backends.UsernameOrEmailBackend matches either field in one query
+            user = authenticate(self.context.get('request'), username=username_or_email, password=password)
 
             if user:
                 if user.is_active:
@@ -76,5 +68,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = User
-        fields = ['id', 'email', 'username', 'first_name', 'last_name', 'phone', 'address', 'user_type', 'date_joined']
-        read_only_fields = ['id', 'date_joined', 'user_type']
+        fields = ['id', 'email', 'username', 'first_name', 'last_name', 'phone', 'address', 'user_type', 'date_joined', 'loyalty_balance']
+        read_only_fields = ['id', 'date_joined', 'user_type', 'loyalty_balance']
+
+
+class LoyaltyLedgerEntrySerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = LoyaltyLedgerEntry
+        fields = ['id', 'kind', 'points', 'order_id', 'note', 'created_at']
+        read_only_fields = fields
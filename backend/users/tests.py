@@ -1,3 +1,374 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
+from django.apps import apps
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
 
+from .authentication import CACHED_USER_FIELDS, CachedJWTAuthentication, user_cache_key
+from .checks import check_token_cache
+from .loyalty import InsufficientPoints, redeem_points
+from .models import LoyaltyLedgerEntry, User
+from .revocation import token_cache
+from orders.services import cancel_orders, place_order_items, transition_order
+from product.models import ClothingProduct
+
+
+class LoyaltyLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.product = ClothingProduct.objects.create(
+            name='Shirt', description='-', price='250.00', stock=10, category='shirt'
+        )
+
+    def place(self, quantity=1, paid=True):
+        order = place_order_items(self.user, [(self.product.id, quantity)])
+        if paid:
+            transition_order(order, 'paid')
+        return order
+
+    def balance(self):
+        return User.objects.values_list('loyalty_balance', flat=True).get(pk=self.user.pk)
+
+    def test_paying_earns_and_cancelling_revokes(self):
+        first = self.place(2)   # 500 -> 50 points
+        self.place(1)           # 250 -> 25 points
+        self.assertEqual(self.balance(), 75)
+
+        cancel_orders([first.id])
+        self.assertEqual(self.balance(), 25)
+        self.assertEqual(
+            list(LoyaltyLedgerEntry.objects.filter(order_id=first.id).order_by('id').values_list('kind', 'points')),
+            [('earn', 50), ('revoke', -50)],
+        )
+
+    def test_unpaid_orders_earn_nothing_to_redeem(self):
+        order = self.place(4, paid=False)
+        self.assertEqual(self.balance(), 0)
+        with self.assertRaises(InsufficientPoints):
+            redeem_points(self.user, 100)
+        cancel_orders([order.id])
+        self.assertEqual(self.balance(), 0)
+        self.assertFalse(LoyaltyLedgerEntry.objects.filter(order_id=order.id).exists())
+
+    def test_backfill_migration_only_credits_paid_orders(self):
+        backfill = import_module('users.migrations.0004_backfill_loyalty_ledger').backfill_loyalty_ledger
+        pending = self.place(2, paid=False)                    # never paid: nothing
+        cancelled_unpaid = self.place(1, paid=False)           # cancelled before payment: nothing
+        cancel_orders([cancelled_unpaid.id])
+        delivered = self.place(2)                              # 50 earned
+        for next_status in ('shipped', 'delivered'):
+            transition_order(delivered, next_status)
+        cancelled_paid = self.place(1)                         # 25 earned, then revoked
+        cancel_orders([cancelled_paid.id])
+        # As before the ledger existed
+        LoyaltyLedgerEntry.objects.all().delete()
+        User.objects.update(loyalty_balance=0)
+
+        backfill(apps, None)
+
+        self.assertEqual(self.balance(), 50)
+        self.assertFalse(LoyaltyLedgerEntry.objects.filter(order_id__in=[pending.id, cancelled_unpaid.id]).exists())
+        self.assertEqual(
+            list(LoyaltyLedgerEntry.objects.filter(order_id=cancelled_paid.id).order_by('id').values_list('kind', 'points')),
+            [('earn', 25), ('revoke', -25)],
+        )
+
+    def test_refund_revokes_once(self):
+        order = self.place(4)
+        transition_order(order, 'refunded')
+        transition_order(order, 'refunded')
+        self.assertEqual(self.balance(), 0)
+        self.assertEqual(LoyaltyLedgerEntry.objects.filter(order_id=order.id, kind='revoke').count(), 1)
+
+    def test_redeem_cannot_overdraw(self):
+        self.place(4)
+        redeem_points(self.user, 60)
+        with self.assertRaises(InsufficientPoints):
+            redeem_points(self.user, 50)
+        self.assertEqual(self.balance(), 40)
+
+    def test_endpoint_reads_stored_balance(self):
+        self.place(2)
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(1):
+            body = client.get('/api/auth/loyalty/').json()
+        self.assertEqual(body['balance'], 50)
+        self.assertEqual([entry['kind'] for entry in body['entries']], ['earn'])
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.place(2)
+        User.objects.filter(pk=self.user.pk).update(loyalty_balance=999)
+
+        out = StringIO()
+        call_command('reconcile_loyalty', stdout=out)
+        self.assertIn('balance 999, ledger 50', out.getvalue())
+        self.assertEqual(self.balance(), 999)
+
+        call_command('reconcile_loyalty', '--fix', stdout=StringIO())
+        self.assertEqual(self.balance(), 50)
+
+
+LOGIN_RATES = {'order_tracking': '60/min', 'login_ip': '5/min', 'login_account': '3/min'}
+
+
+@override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': LOGIN_RATES, 'NUM_PROXIES': 0})
+class LoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.client = APIClient()
+
+    def login(self, username_or_email, password='pass1234', ip='10.0.0.1'):
+        return self.client.post('/api/auth/login/', {
+            'username_or_email': username_or_email, 'password': password,
+        }, format='json', REMOTE_ADDR=ip)
+
+    def count_hashes(self):
+        hasher = type(get_hasher())
+        return mock.patch.object(hasher, 'encode', autospec=True, side_effect=hasher.encode)
+
+    def test_username_or_email_in_one_query_and_one_hash(self):
+        for identifier in ('buyer', 'buyer@example.com'):
+            with self.assertNumQueries(1), self.count_hashes() as encode:
+                response = self.login(identifier)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['user']['id'], self.user.id)
+            self.assertEqual(encode.call_count, 1)
+
+    def test_misses_cost_one_query_and_one_hash(self):
+        for identifier, password in (('buyer', 'wrong'), ('nobody@example.com', 'pass1234')):
+            with self.assertNumQueries(1), self.count_hashes() as encode:
+                response = self.login(identifier, password)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(encode.call_count, 1)
+
+    def test_account_is_throttled_after_failures(self):
+        for i in range(3):
+            self.assertEqual(self.login('buyer', 'wrong', ip=f'10.0.0.{i}').status_code, 400)
+        # Blocked from any IP, even with the right password
+        response = self.login('buyer@example.com', ip='10.0.0.9')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.login('someone-else', 'wrong').status_code, 400)
+
+    def test_username_and_email_share_the_account_budget(self):
+        self.login('buyer', 'wrong', ip='10.0.0.1')
+        self.login('buyer@example.com', 'wrong', ip='10.0.0.2')
+        self.login('Buyer', 'wrong', ip='10.0.0.3')  # no such username; counted on its own
+        self.login('buyer', 'wrong', ip='10.0.0.4')
+        self.assertEqual(self.login('buyer@example.com', ip='10.0.0.5').status_code, 429)
+
+    def test_forwarded_for_header_does_not_reset_the_ip_budget(self):
+        for i in range(5):
+            self.client.post('/api/auth/login/', {'username_or_email': f'user{i}', 'password': 'x'},
+                             format='json', HTTP_X_FORWARDED_FOR=f'192.0.2.{i}')
+        response = self.client.post('/api/auth/login/', {'username_or_email': 'buyer', 'password': 'pass1234'},
+                                    format='json', HTTP_X_FORWARDED_FOR='192.0.2.99')
+        self.assertEqual(response.status_code, 429)
+
+    def test_ip_is_throttled_and_success_resets_the_account(self):
+        self.login('buyer', 'wrong')
+        self.login('buyer', 'wrong')
+        self.assertEqual(self.login('buyer').status_code, 200)
+        self.assertEqual(self.login('buyer', 'wrong').status_code, 400)  # account window was reset
+
+        for name in ('a', 'b'):
+            self.login(name, 'wrong')
+        self.assertEqual(self.login('buyer').status_code, 429)  # 5 failures from this IP
+        self.assertEqual(self.login('buyer', ip='10.0.0.2').status_code, 200)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_user_row_is_read_once(self):
+        self.authenticate()
+        # Afterwards: one token cache read (user entry + revocation), no user row
+        with CaptureQueriesContext(connection) as queries:
+            user = self.authenticate()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('users_user', queries[0]['sql'])
+        self.assertEqual((user.pk, user.email, user.is_staff), (self.user.pk, 'buyer@example.com', False))
+
+    def test_cache_holds_no_password_hash(self):
+        self.authenticate()
+        entry = token_cache().get(user_cache_key(self.user.pk))
+        self.assertEqual(set(entry), set(CACHED_USER_FIELDS) | {'password_stamp'})
+        self.assertNotIn(self.user.password, entry.values())
+        # Fields outside the cache load on access, and saving writes only what was loaded
+        user = self.authenticate()
+        self.assertEqual(user.loyalty_balance, 0)
+        user.first_name = 'Changed'
+        user.save()
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('pass1234'))
+
+    def test_profile_update_is_seen_next_request(self):
+        self.client.get('/api/auth/profile/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put('/api/auth/profile/update/', {'first_name': 'Ali'}, format='json')
+        self.assertEqual(self.client.get('/api/auth/profile/').json()['first_name'], 'Ali')
+
+    def test_deactivation_locks_out_immediately(self):
+        self.client.get('/api/auth/profile/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+    def test_loyalty_balance_is_never_stale(self):
+        self.client.get('/api/auth/profile/')
+        product = ClothingProduct.objects.create(name='Shirt', description='-', price='250.00', stock=10, category='shirt')
+        order = place_order_items(User.objects.get(pk=self.user.pk), [(product.id, 2)])
+        transition_order(order, 'paid')
+        self.assertEqual(self.client.get('/api/auth/loyalty/').json()['balance'], 50)
+
+
+class TokenLifecycleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.client = APIClient()
+        self.tokens = self.client.post('/api/auth/login/', {
+            'username_or_email': 'buyer', 'password': 'pass1234',
+        }, format='json').json()['tokens']
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': token}, format='json')
+
+    def test_refresh_rotates_and_old_token_is_single_use(self):
+        response = self.refresh(self.tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        new = response.json()['tokens']
+        self.assertNotEqual(new['refresh'], self.tokens['refresh'])
+
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(new['refresh']).status_code, 200)
+        self.assertEqual(self.refresh(new['access']).status_code, 401)  # Not a refresh token
+
+    def test_logout_revokes_both_tokens(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+
+        response = self.client.post('/api/auth/logout/', {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.json(), {'message': 'Logged out', 'revoked': 2})
+        # Rejected on the revocation entry alone, before any user lookup
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+        self.assertFalse([q for q in queries.captured_queries if 'users_user' in q['sql']])
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'tokens': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    })
+    def test_process_local_token_cache_is_refused(self):
+        self.assertEqual([error.id for error in check_token_cache(None)], ['users.E002'])
+        with self.assertRaises(ImproperlyConfigured):
+            self.refresh(self.tokens['refresh'])
+
+    def test_deactivated_user_cannot_refresh(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+
+class UserImportExportTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(username='taken', email='existing@example.com', password='pass1234')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', newline='') as f:
+            f.write(text)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_users', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_dedupes_and_keeps_hashes(self):
+        hashed = make_password('secret99')
+        path = self.write('users.csv', (
+            'email,username,password,first_name\n'
+            f'ali@example.com,ali,{hashed},Ali\n'
+            f'ALI@example.com,ali2,{hashed},Dup\n'      # same email as line 2
+            f'EXISTING@example.com,new,{hashed},Old\n'  # already registered, in another case
+            f'sara@example.com,Taken,{hashed},Sara\n'   # usernames are case-sensitive, so not 'taken'
+            'bad-email,x,,X\n'
+            'zoe@example.com,zoe,plaintext,Zoe\n'
+            'nopass@example.com,,,No\n'
+        ))
+        with CaptureQueriesContext(connection) as queries:
+            out, err = self.run_import(path, '--batch-size', '2')
+        self.assertIn('Imported 3 user(s)', out)
+        self.assertIn('skipped 2 duplicate(s) and 2 invalid row(s)', out)
+        self.assertIn('Line 3: skipped, duplicate of an earlier row', err)
+        self.assertIn('Line 4: skipped, already registered', err)
+        self.assertIn('Line 7: skipped, password is not a known hash format', err)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)  # one per batch, no per-row create_user
+
+        self.assertTrue(User.objects.get(username='ali').check_password('secret99'))
+        self.assertFalse(User.objects.get(email='nopass@example.com').has_usable_password())
+        self.assertEqual(User.objects.get(email='nopass@example.com').username, 'nopass@example.com')
+
+    def test_concurrent_signup_skips_only_the_clashing_row(self):
+        path = self.write('users.csv', 'email,username\nali@example.com,ali\nzoe@example.com,zoe\n')
+        bulk_create = User.objects.bulk_create
+
+        def signup_first(objs, *args, **kwargs):
+            # A signup commits between the duplicate lookup and the insert
+            if not User.objects.filter(username='racer').exists():
+                User.objects.create_user(username='racer', email='ali@example.com', password='pass1234')
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(User.objects, 'bulk_create', side_effect=signup_first):
+            out, err = self.run_import(path)
+        self.assertIn('Imported 1 user(s)', out)
+        self.assertIn('Line 2: skipped, already registered', err)
+        self.assertTrue(User.objects.filter(username='zoe').exists())
+
+    def test_export_round_trips_through_import(self):
+        User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234', phone='0300')
+        User.objects.create_superuser(username='root', email='root@example.com', password='pass1234', user_type='admin')
+        path = os.path.join(self.dir, 'export.jsonl')
+        err = StringIO()
+        call_command('export_users', '--output', path, '--with-password-hashes', stdout=StringIO(), stderr=err)
+        self.assertIn('Exported 2 user(s).', err.getvalue())
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['username'] for row in rows], ['taken', 'buyer'])
+
+        User.objects.filter(user_type='customer').delete()
+        out, _ = self.run_import(path)
+        self.assertIn('Imported 2 user(s)', out)
+        buyer = User.objects.get(username='buyer')
+        self.assertEqual(buyer.phone, '0300')
+        self.assertTrue(buyer.check_password('pass1234'))
+
+        out = StringIO()
+        call_command('export_users', '--format', 'csv', stdout=out, stderr=StringIO())
+        self.assertTrue(out.getvalue().startswith('username,email,first_name'))
@@ -0,0 +1,67 @@
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from .backends import find_login_user
+
+
+class FailedLoginThrottle(SimpleRateThrottle):
+    """
+    Sliding window over failed logins only, kept in the cache.
+
+    allow_request() checks the window without counting the attempt; the view
+    calls failure() when the credentials are wrong and reset() when they are
+    right, so successful logins never use up the allowance.
+    """
+
+    def get_rate(self):
+        # Read at call time (not import time) so override_settings applies
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.history = self.cache.get(self.key, [])
+        self.now = self.timer()
+        while self.history and self.history[-1] <= self.now - self.duration:
+            self.history.pop()
+        return len(self.history) < self.num_requests
+
+    def failure(self):
+        if self.rate is not None and self.key is not None:
+            self.history.insert(0, self.now)
+            self.cache.set(self.key, self.history, self.duration)
+
+    def reset(self):
+        if self.rate is not None and self.key is not None:
+            self.cache.delete(self.key)
+
+
+class LoginIPThrottle(FailedLoginThrottle):
+    """
+    Failed logins per client IP (REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['login_ip']).
+    X-Forwarded-For is only trusted as far as REST_FRAMEWORK['NUM_PROXIES'] allows.
+    """
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginAccountThrottle(FailedLoginThrottle):
+    """
+    Failed logins per account, from any IP (rate 'login_account'). Keyed on the
+    resolved user id, so alternating username and email shares one budget;
+    identifiers that match no account are keyed on their lowercased text.
+    """
+    scope = 'login_account'
+
+    def get_cache_key(self, request, view):
+        identifier = str(request.data.get('username_or_email') or '').strip()
+        if not identifier:
+            return None
+        user = find_login_user(identifier, request)
+        ident = f'user:{user.pk}' if user is not None else f'name:{identifier.lower()}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
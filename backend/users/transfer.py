@@ -0,0 +1,223 @@
+"""
+Bulk customer import and export (manage.py import_users / export_users).
+
+Rows are plain dicts with the EXPORT_FIELDS keys, read from and written to CSV
+or JSON Lines one line at a time, so neither side holds the whole file.
+"""
+import csv
+import json
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import User
+
+EXPORT_FIELDS = [
+    'username', 'email', 'first_name', 'last_name', 'phone', 'address', 'date_joined', 'is_active',
+]
+FORMATS = ('csv', 'jsonl')
+
+
+class InvalidRow(Exception):
+    pass
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict) from an open text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else {'_error': 'Not a JSON object'}
+
+
+def _text(row, field):
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+
+def _password(value, allow_plaintext):
+    """
+    A stored password: a hash in a format one of PASSWORD_HASHERS can verify is
+    kept as it is (no hashing cost); empty means an unusable password.
+    Anything else is plaintext, hashed only if `allow_plaintext`.
+    """
+    if not value:
+        return make_password(None)
+    if value.startswith('!'):
+        return value  # Already unusable
+    try:
+        identify_hasher(value)
+        return value
+    except ValueError:
+        if not allow_plaintext:
+            raise InvalidRow('password is not a known hash format (use --plaintext-passwords to hash it)')
+        return make_password(value)
+
+
+def _truthy(value, default=True):
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def build_user(row, allow_plaintext=False):
+    """Turn one input row into an unsaved User. Raises InvalidRow."""
+    if '_error' in row:
+        raise InvalidRow(row['_error'])
+    email = User.objects.normalize_email(_text(row, 'email'))
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise InvalidRow(f'invalid email {email!r}')
+    # Without a username, the (unique) email doubles as one
+    username = _text(row, 'username') or email
+    if len(username) > 150:
+        raise InvalidRow('username is longer than 150 characters')
+
+    date_joined = timezone.now()
+    if _text(row, 'date_joined'):
+        date_joined = parse_datetime(_text(row, 'date_joined'))
+        if date_joined is None:
+            raise InvalidRow(f"invalid date_joined {row['date_joined']!r}")
+        if timezone.is_naive(date_joined):
+            date_joined = timezone.make_aware(date_joined)
+
+    return User(
+        username=username,
+        email=email,
+        password=_password(_text(row, 'password'), allow_plaintext),
+        first_name=_text(row, 'first_name')[:150],
+        last_name=_text(row, 'last_name')[:150],
+        phone=_text(row, 'phone')[:20] or None,
+        address=_text(row, 'address')[:500] or None,
+        date_joined=date_joined,
+        is_active=_truthy(row.get('is_active')),
+        user_type='customer',
+    )
+
+
+def _insert_batch(batch):
+    """
+    bulk_create the new users in `batch` ([(line number, User)]). Emails
+    (case-insensitively) and usernames already in the database are looked up
+    with two indexed IN queries for the whole batch. Returns the (line number,
+    User) pairs skipped as duplicates.
+    """
+    emails = {user.email.lower() for _, user in batch}
+    usernames = {user.username for _, user in batch}
+    taken_emails = set(
+        User.objects.annotate(email_key=Lower('email')).filter(email_key__in=emails)
+        .values_list('email_key', flat=True)
+    )
+    taken_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+    new, duplicates = [], []
+    for line_number, user in batch:
+        if user.email.lower() in taken_emails or user.username in taken_usernames:
+            duplicates.append((line_number, user))
+        else:
+            new.append((line_number, user))
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([user for _, user in new])
+    except IntegrityError:
+        # Someone signed up with one of these emails or usernames since the
+        # lookup; insert the batch row by row and skip the ones that clash
+        for line_number, user in new:
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create([user])
+            except IntegrityError:
+                duplicates.append((line_number, user))
+    return duplicates
+
+
+def import_users(rows, batch_size=1000, allow_plaintext=False, on_skip=None):
+    """
+    Create users from (line number, row) pairs, batch_size at a time. Rows
+    repeating an email or username (case-insensitively) seen earlier in the
+    input, or already in the database, are skipped, as are invalid rows;
+    on_skip(line_number, reason) is called for each.
+
+    Returns (created, duplicates, invalid) counts.
+    """
+    on_skip = on_skip or (lambda line_number, reason: None)
+    seen_emails, seen_usernames = set(), set()
+    counts = {'created': 0, 'duplicates': 0, 'invalid': 0}
+    batch = []
+
+    def flush():
+        skipped = _insert_batch(batch)
+        for line_number, user in skipped:
+            on_skip(line_number, f'already registered ({user.email} / {user.username})')
+        counts['duplicates'] += len(skipped)
+        counts['created'] += len(batch) - len(skipped)
+        batch.clear()
+
+    for line_number, row in rows:
+        try:
+            user = build_user(row, allow_plaintext)
+        except InvalidRow as e:
+            counts['invalid'] += 1
+            on_skip(line_number, str(e))
+            continue
+        email_key, username_key = user.email.lower(), user.username.lower()
+        if email_key in seen_emails or username_key in seen_usernames:
+            counts['duplicates'] += 1
+            on_skip(line_number, f'duplicate of an earlier row ({user.email})')
+            continue
+        seen_emails.add(email_key)
+        seen_usernames.add(username_key)
+        batch.append((line_number, user))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return counts['created'], counts['duplicates'], counts['invalid']
+
+
+def export_rows(users, include_passwords=False):
+    """Yield one dict per user, streamed from the database with .iterator()."""
+    fields = EXPORT_FIELDS + (['password'] if include_passwords else [])
+    for values in users.order_by('pk').values_list(*fields).iterator(chunk_size=2000):
+        yield dict(zip(fields, values))
+
+
+def write_rows(rows, stream, fmt, include_passwords=False):
+    """Write rows from export_rows() to `stream`; returns the number written."""
+    fields = EXPORT_FIELDS + (['password'] if include_passwords else [])
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, 'date_joined': row['date_joined'].isoformat()})
+            count += 1
+        return count
+    for row in rows:
+        stream.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        count += 1
+    return count
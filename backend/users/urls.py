@@ -5,8 +5,11 @@ from . import views
 urlpatterns = [
     path('register/',views.register_user,name='register'),
     path('login/',views.login_user,name='login'),
+    path('logout/',views.logout_user,name='logout'),
+    path('token/refresh/',views.refresh_token,name='token-refresh'),
     path('profile/',views.profile_user,name='profile'),
     path('profile/update/',views.update_profile,name='profile-update'),
+    path('loyalty/',views.loyalty_balance,name='loyalty'),
 ]
 
 
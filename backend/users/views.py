@@ -1,12 +1,18 @@
+import math
+
 from django.shortcuts import render
 from rest_framework import status
-from rest_framework.decorators import api_view,permission_classes
+from rest_framework.decorators import api_view,authentication_classes,permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from django.contrib.auth import login
-from .models import User
-from .serializers import UserRegistrationSerializer,UserLoginSerializer,UserProfileSerializer
+from .models import LoyaltyLedgerEntry, User
+from .serializers import UserRegistrationSerializer,UserLoginSerializer,UserProfileSerializer,LoyaltyLedgerEntrySerializer
+from .authentication import CachedJWTAuthentication
+from .revocation import revoke_token
+from .throttling import LoginAccountThrottle, LoginIPThrottle
 
 @api_view(['GET','POST'])
 def register_user(request):
@@ -44,9 +50,22 @@ def login_user(request):
    
     
     if request.method == 'POST':
-        serializer = UserLoginSerializer(data=request.data)
+        # Failed attempts are limited per client IP and per account (users.throttling)
+        throttles = [LoginIPThrottle(), LoginAccountThrottle()]
+        blocked = [throttle for throttle in throttles if not throttle.allow_request(request, None)]
+        if blocked:
+            wait = max(throttle.wait() or 0 for throttle in blocked)
+            response = Response({
+                'error': 'Too many failed login attempts',
+                'detail': f'Try again in {math.ceil(wait)} seconds.',
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+
+        serializer = UserLoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = serializer.validated_data['user']
+            throttles[1].reset()
             
         
             refresh = RefreshToken.for_user(user)
@@ -65,6 +84,8 @@ def login_user(request):
                 }
             }, status=status.HTTP_200_OK)
         
+        for throttle in throttles:
+            throttle.failure()
         return Response({
             'error': 'Login failed',
             'details': serializer.errors
@@ -79,13 +100,14 @@ def login_user(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def profile_user(request):
-    serializer = UserProfileSerializer(request.user)
+    # request.user only carries the cached auth fields; load the whole profile
+    serializer = UserProfileSerializer(User.objects.get(pk=request.user.pk))
     return Response(serializer.data)
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_profile(request):
-    user = request.user
+    user = User.objects.get(pk=request.user.pk)
     serializer = UserProfileSerializer(user, data=request.data, partial=True)
     if serializer.is_valid():
         serializer.save()
@@ -94,3 +116,92 @@ def update_profile(request):
             'user': serializer.data
         }, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def loyalty_balance(request):
+    """
+    GET /api/auth/loyalty/
+    The user's loyalty point balance and their most recent ledger entries.
+    The balance is a stored column on the user row, so it costs no aggregation;
+    the entries come from one indexed read (user, -created_at).
+
+    Query params:
+      entries - number of recent entries to include (default 10, max 100, 0 for none)
+    """
+    try:
+        limit = max(0, min(int(request.query_params.get('entries', 10)), 100))
+    except (TypeError, ValueError):
+        limit = 10
+    entries = []
+    if limit:
+        recent = LoyaltyLedgerEntry.objects.filter(user=request.user).order_by('-created_at', '-id')[:limit]
+        entries = LoyaltyLedgerEntrySerializer(recent, many=True).data
+    return Response({
+        'balance': request.user.loyalty_balance,
+        'entries': entries,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@authentication_classes([])  # An expired access token must not block getting a new one
+def refresh_token(request):
+    """
+    POST /api/auth/token/refresh/
+    Swap a refresh token for a new access token and a new refresh token. The old
+    refresh token is revoked (rotation), so each one can be used only once.
+
+    Body: { "refresh": "<refresh token>" }
+    Response: { "tokens": { "access": "...", "refresh": "..." } }
+    """
+    raw_token = request.data.get('refresh')
+    if not raw_token:
+        return Response({'error': 'refresh is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        old = RefreshToken(raw_token)
+        # Rejects revoked tokens and deleted or deactivated users
+        user = CachedJWTAuthentication().get_user(old)
+    except (TokenError, InvalidToken, AuthenticationFailed) as e:
+        return Response({'error': 'Invalid refresh token', 'detail': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+    if not revoke_token(old):
+        return Response({'error': 'Invalid refresh token', 'detail': 'Token has been revoked'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    refresh = RefreshToken.for_user(user)
+    return Response({
+        'tokens': {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@authentication_classes([])  # Logging out with an expired access token still revokes the refresh token
+def logout_user(request):
+    """
+    POST /api/auth/logout/
+    Revoke the refresh token in the body and the access token in the
+    Authorization header (either may be left out). Tokens that are already
+    invalid or expired are skipped.
+
+    Body: { "refresh": "<refresh token>" }
+    Response: { "message": "Logged out", "revoked": <number of tokens revoked> }
+    """
+    auth = CachedJWTAuthentication()
+    header = auth.get_header(request)
+    candidates = [
+        (RefreshToken, request.data.get('refresh')),
+        (AccessToken, auth.get_raw_token(header) if header else None),
+    ]
+    if not any(raw_token for _, raw_token in candidates):
+        return Response({'error': 'No token to revoke.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    revoked = 0
+    for token_class, raw_token in candidates:
+        if not raw_token:
+            continue
+        try:
+            revoked += revoke_token(token_class(raw_token))
+        except TokenError:
+            continue
+    return Response({'message': 'Logged out', 'revoked': revoked}, status=status.HTTP_200_OK)
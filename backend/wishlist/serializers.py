@@ -1,20 +1,14 @@
 from rest_framework import serializers
-from .models import Wishlist, WishlistItem
-from product.serializers import ClothingProductSerializer
+from .models import WishlistItem
+from product.serializers import ProductCardSerializer
 
-class WishlistItemSerializer(serializers.ModelSerializer):
-    product = serializers.SerializerMethodField()
+class WishlistCardSerializer(serializers.ModelSerializer):
+    """
+    Wishlist item with a compact product card. Expects `product` to have been
+    loaded with prefetch_related('product') (one query per product type).
+    """
+    product = ProductCardSerializer(read_only=True)
 
     class Meta:
         model = WishlistItem
         fields = ['id', 'product']
-
-    def get_product(self, obj):
-        return ClothingProductSerializer(obj.product, context=self.context).data
-
-class WishlistSerializer(serializers.ModelSerializer):
-    items = WishlistItemSerializer(many=True, read_only=True)
-
-    class Meta:
-        model = Wishlist
-        fields = ['id', 'user', 'items']
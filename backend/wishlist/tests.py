@@ -1,3 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import Wishlist, WishlistItem
+from product.models import ClothingProduct, Review
+
+User = get_user_model()
+
+
+class WishlistReadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_products(self, count):
+        products = []
+        for i in range(count):
+            product = ClothingProduct.objects.create(
+                name=f'Product {i}', description='-', price='100.00', stock=5, category='shirt'
+            )
+            Review.objects.create(product_type='clothing', product_id=product.id, user=self.user, rating=5, comment='ok')
+            self.client.post('/api/wishlist/add/', {'product_id': product.id}, format='json')
+            products.append(product)
+        return products
+
+    def test_query_count_does_not_grow_with_the_wishlist(self):
+        self.add_products(3)
+        # wishlist, items, products
+        with self.assertNumQueries(3):
+            small = self.client.get('/api/wishlist/').json()
+        self.add_products(12)
+        with self.assertNumQueries(3):
+            large = self.client.get('/api/wishlist/').json()
+        self.assertEqual((len(small['items']), len(large['items'])), (3, 15))
+        self.assertEqual(set(large['items'][0]['product']), {'id', 'name', 'price', 'stock', 'category', 'image_url'})
+
+    def test_pages_walk_every_item_and_skip_deleted_products(self):
+        products = self.add_products(5)
+        products[1].delete()
+
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get('/api/wishlist/', params).json()
+            seen += [item['product']['id'] for item in body['items']]
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+            # Deleted products are skipped before paging, not after
+            self.assertEqual(len(body['items']), 2)
+        self.assertEqual(seen, [product.id for product in products if product.pk is not None])
+
+        self.assertEqual(self.client.get('/api/wishlist/', {'cursor': 'junk'}).status_code, 400)
+
+    def test_unpaged_request_returns_the_whole_wishlist(self):
+        products = [
+            ClothingProduct.objects.create(name=f'Product {i}', description='-', price='100.00', stock=5, category='shirt')
+            for i in range(60)
+        ]
+        content_type = ContentType.objects.get_for_model(ClothingProduct)
+        wishlist = Wishlist.objects.create(user=self.user)
+        WishlistItem.objects.bulk_create([
+            WishlistItem(wishlist=wishlist, content_type=content_type, object_id=product.id) for product in products
+        ])
+        body = self.client.get('/api/wishlist/').json()
+        self.assertEqual((len(body['items']), body['next_cursor']), (60, None))
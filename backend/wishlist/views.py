@@ -5,6 +5,8 @@ from rest_framework import status
 from django.contrib.contenttypes.models import ContentType
 
 from .models import Wishlist, WishlistItem
+from .serializers import WishlistCardSerializer
+from orders.pagination import InvalidCursor, keyset_paginate
 from product.models import ClothingProduct
 
 def get_user_wishlist(user):
@@ -14,10 +16,48 @@ def get_user_wishlist(user):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def view_wishlist(request):
-    wishlist = get_user_wishlist(request.user)
-    from .serializers import WishlistSerializer
-    serializer = WishlistSerializer(wishlist, context={'request': request})
-    return Response(serializer.data)
+    """
+    GET /api/wishlist/
+    The user's wishlist items, oldest first, each with a compact product card.
+    Items are one query and their products one query per product type, however
+    long the wishlist; items whose product has been deleted are left out.
+
+    The whole wishlist is returned unless `page_size` or `cursor` is given, in
+    which case it comes one page at a time.
+
+    Query params:
+      cursor     - `next_cursor` from the previous page
+      page_size  - items per page (default 50, max 100)
+
+    Response: { "id": ..., "user": ..., "items": [...], "next_cursor": "..." | null }
+    """
+    try:
+        wishlist = get_user_wishlist(request.user)
+        content_type = ContentType.objects.get_for_model(ClothingProduct)
+        # Deleted products are filtered in the query, so every page is full but the last
+        items = WishlistItem.objects.filter(
+            wishlist=wishlist, content_type=content_type, object_id__in=ClothingProduct.objects.values('pk')
+        ).prefetch_related('product')
+        if 'page_size' in request.query_params or 'cursor' in request.query_params:
+            page, next_cursor = keyset_paginate(items, request, ordering=('id',), default_page_size=50)
+        else:
+            page, next_cursor = list(items.order_by('id')), None
+        # A product deleted between the two queries prefetches as None
+        page = [item for item in page if item.product is not None]
+        serializer = WishlistCardSerializer(page, many=True, context={'request': request})
+        return Response({
+            'id': wishlist.id,
+            'user': wishlist.user_id,
+            'items': serializer.data,
+            'next_cursor': next_cursor,
+        }, status=status.HTTP_200_OK)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to load wishlist', 'detail': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -13,3 +13,6 @@ python manage.py collectstatic --no-input
 
 # Apply migrations
 python manage.py migrate
+
+# Table for the shared token cache (CACHES['tokens'] when REDIS_URL is unset)
+python manage.py createcachetable
@@ -54,6 +54,19 @@ function Profile() {
   }
 
   const handleLogout = () => {
+    // Revoke the tokens server-side too; the local session ends either way
+    const token = localStorage.getItem('token')
+    const refresh = localStorage.getItem('refresh_token')
+    if (token || refresh) {
+      fetch('http://localhost:8000/api/auth/logout/', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
+        },
+        body: JSON.stringify(refresh ? { refresh } : {}),
+      }).catch(() => {})
+    }
     localStorage.removeItem('token')
     localStorage.removeItem('refresh_token')
     localStorage.removeItem('user')
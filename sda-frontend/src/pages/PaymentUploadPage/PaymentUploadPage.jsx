@@ -1,9 +1,17 @@
-import React, { useState } from 'react'
+import React, { useEffect, useState } from 'react'
 import { useLocation, useNavigate } from 'react-router-dom'
 import { apiClient } from '../../services/api'
 import { orderApi } from '../../services/orderApi'
 import './PaymentUploadPage.css'
 
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://127.0.0.1:8000'
+
+const PAYMENT_STATUS_MESSAGES = {
+  pending: 'Waiting for an admin to verify your payment...',
+  approved: 'Payment approved! Your order is being prepared for shipping.',
+  rejected: 'Payment could not be verified and the order was cancelled.',
+}
+
 function PaymentUploadPage() {
   const location = useLocation()
   const navigate = useNavigate()
@@ -14,6 +22,45 @@ function PaymentUploadPage() {
   const [uploading, setUploading] = useState(false)
   const [error, setError] = useState(null)
   const [success, setSuccess] = useState(null)
+  const [placedOrderId, setPlacedOrderId] = useState(null)
+  const [paymentStatus, setPaymentStatus] = useState(null)
+
+  // Live payment review result for the order just placed (server-sent events).
+  // EventSource cannot send an Authorization header, so each connection opens
+  // with a single-use ticket; a dropped stream reconnects with a fresh one.
+  useEffect(() => {
+    if (!placedOrderId || !localStorage.getItem('token') || typeof EventSource === 'undefined') return undefined
+    let source = null
+    let retryTimer = null
+    let stopped = false
+    const retry = () => {
+      if (!stopped) retryTimer = setTimeout(connect, 5000)
+    }
+    const connect = async () => {
+      try {
+        const { ticket } = await orderApi.fetchEventsTicket()
+        if (stopped) return
+        source = new EventSource(`${API_BASE_URL}/api/orders/events/?ticket=${encodeURIComponent(ticket)}`)
+        source.addEventListener('order', (event) => {
+          const update = JSON.parse(event.data)
+          if (update.id === placedOrderId) setPaymentStatus(update.payment_status)
+        })
+        source.onerror = () => {
+          // The ticket is spent, so the browser's own reconnect would be refused
+          source.close()
+          retry()
+        }
+      } catch {
+        retry()
+      }
+    }
+    connect()
+    return () => {
+      stopped = true
+      clearTimeout(retryTimer)
+      if (source) source.close()
+    }
+  }, [placedOrderId])
 
   const handleFiles = (e) => {
     setFiles(Array.from(e.target.files))
@@ -52,7 +99,6 @@ function PaymentUploadPage() {
       // Payment model expects: order (FK to Order), screenshot (ImageField)
       // NOTE: Payment uses OneToOneField, so only ONE payment per order
       // Use fetch directly for FormData to avoid JSON stringification
-      const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://127.0.0.1:8000'
       const token = localStorage.getItem('token')
 
       // Only upload the first file since Payment is OneToOne with Order
@@ -94,8 +140,8 @@ function PaymentUploadPage() {
 
       setSuccess('Order placed! Payment screenshots uploaded. Admin will verify your payment shortly.')
       setFiles([])
-      // Navigate back to cart to show order status
-      setTimeout(() => navigate('/cart', { state: { orderId } }), 2000)
+      setPlacedOrderId(orderId)
+      setPaymentStatus(paymentData.status || 'pending')
     } catch (err) {
       console.error('Error:', err)
       const errorMsg = err.message || 'Failed to process order and payment'
@@ -117,6 +163,11 @@ function PaymentUploadPage() {
 
         {error && <div className="error-box">{error}</div>}
         {success && <div className="success-box">{success}</div>}
+        {paymentStatus && (
+          <div className={paymentStatus === 'rejected' ? 'error-box' : 'success-box'}>
+            {PAYMENT_STATUS_MESSAGES[paymentStatus] || `Payment status: ${paymentStatus}`}
+          </div>
+        )}
 
         <form className="upload-form" onSubmit={handleSubmit}>
           <label className="file-input-label">
@@ -132,7 +183,11 @@ function PaymentUploadPage() {
 
           <div className="actions">
             <button type="submit" className="btn-upload" disabled={uploading}>{uploading ? 'Uploading...' : 'Upload & Place Order'}</button>
-            <button type="button" className="btn-cancel" onClick={() => navigate(-1)}>Go Back</button>
+            {placedOrderId ? (
+              <button type="button" className="btn-cancel" onClick={() => navigate('/cart', { state: { orderId: placedOrderId } })}>Back to Cart</button>
+            ) : (
+              <button type="button" className="btn-cancel" onClick={() => navigate(-1)}>Go Back</button>
+            )}
           </div>
         </form>
       </div>
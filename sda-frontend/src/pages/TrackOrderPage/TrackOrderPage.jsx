@@ -1,4 +1,4 @@
-import React, { useState } from 'react'
+import React, { useEffect, useState } from 'react'
 import './TrackOrderPage.css'
 
 function TrackOrderPage() {
@@ -6,6 +6,21 @@ function TrackOrderPage() {
   const [orderData, setOrderData] = useState(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
+  const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://127.0.0.1:8000'
+  const trackedId = orderData?.id
+
+  // Live status pushes for the order on screen (server-sent events), instead of re-fetching it
+  useEffect(() => {
+    if (!trackedId || typeof EventSource === 'undefined') return undefined
+    const source = new EventSource(`${API_BASE_URL}/api/orders/${trackedId}/events/`)
+    source.addEventListener('order', (event) => {
+      const update = JSON.parse(event.data)
+      setOrderData((prev) => prev && prev.id === update.id
+        ? { ...prev, status: update.status, track_order_status: update.track_order_status }
+        : prev)
+    })
+    return () => source.close()
+  }, [trackedId, API_BASE_URL])
 
   const handleSearch = async (e) => {
     e.preventDefault()
@@ -19,8 +34,7 @@ function TrackOrderPage() {
 
     try {
       setLoading(true)
-      const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://127.0.0.1:8000'
-      
+
       const response = await fetch(`${API_BASE_URL}/api/orders/${orderId}/`, {
         method: 'GET',
         headers: {
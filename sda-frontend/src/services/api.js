@@ -6,6 +6,7 @@ export const API_ENDPOINTS = {
     LOGIN: `${API_BASE}/api/auth/login/`,
     REGISTER: `${API_BASE}/api/auth/register/`,
     LOGOUT: `${API_BASE}/api/auth/logout/`,
+    REFRESH: `${API_BASE}/api/auth/token/refresh/`,
   },
   PRODUCTS: {
     LIST: `${API_BASE}/api/products/`,
@@ -46,6 +46,12 @@ export const orderApi = {
     const response = await axiosInstance.post(`/orders/${orderId}/refund/`)
     return response.data
   },
+
+  // Single-use ticket for opening the /orders/events/ stream without a token in the URL
+  fetchEventsTicket: async () => {
+    const response = await axiosInstance.post('/orders/events/ticket/')
+    return response.data
+  },
 }
 
 export default orderApi